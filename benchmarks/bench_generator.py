@@ -0,0 +1,45 @@
+"""
+Порівняння режимів побудови дерев ExpressionGenerator: "rejection" (як раніше), "constructive" і "ir".
+Для кожної клітинки (A, B, C) рахує частку прийнятих дерев, спроби на вираз і вирази/с.
+
+    python -m benchmarks.bench_generator --n 10
+"""
+import argparse
+import itertools
+import json
+import random
+import time
+from src.config import ComplexityConfig
+from src.generator import ExpressionGenerator
+
+def bench_cell(a, b, c, construction, n, seed):
+    gen = ExpressionGenerator(ComplexityConfig(a, b, c), rng=random.Random(f"{seed}/{a},{b},{c}"), construction=construction)
+    start = time.perf_counter()
+    for _ in range(n):
+        gen.generate()
+    elapsed = time.perf_counter() - start
+    stats = gen.acceptance_stats()
+    stats["exprs_per_s"] = n / elapsed if elapsed else float("inf")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=10, help="виразів на клітинку")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cells", default="all", help="'all' або список 'a,b,c;a,b,c'")
+    args = parser.parse_args()
+
+    if args.cells == "all":
+        cells = list(itertools.product(range(4), range(4), range(4)))
+    else:
+        cells = [tuple(int(v) for v in cell.split(",")) for cell in args.cells.split(";")]
+
+    report = {}
+    for cell in cells:
+        report[",".join(map(str, cell))] = {
+            mode: bench_cell(*cell, mode, args.n, args.seed) for mode in ("rejection", "constructive", "ir")
+        }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
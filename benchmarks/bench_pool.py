@@ -0,0 +1,58 @@
+"""
+Порівняння постійного WorkerPool з запуском окремого процесу на кожен виклик (run_with_timeout).
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_pool --n 40 --start-method spawn
+"""
+import argparse
+import json
+import time
+from src.sampler import _meta_task, _points_task
+from src.utils import run_with_timeout, WorkerPool
+
+CORPUS = ["x**3", "sin(x) + x", "1/(x - 1)", "exp(x)*cos(2*x)", "Abs(x) + x**2"]
+
+def _tasks(n):
+    for i in range(n):
+        expr_str = CORPUS[i % len(CORPUS)]
+        yield (_meta_task, (expr_str,)) if i % 2 == 0 else (_points_task, (expr_str, 25))
+
+def bench_per_call(n, start_method):
+    import multiprocessing
+    if start_method:
+        multiprocessing.set_start_method(start_method, force=True)
+    t0 = time.perf_counter()
+    ok = 0
+    for func, args in _tasks(n):
+        success, _ = run_with_timeout(func, args, timeout=10)
+        ok += success
+    return {"mode": "per_call", "tasks": n, "ok": ok, "startup_s": 0.0, "total_s": time.perf_counter() - t0}
+
+def bench_pool(n, start_method, size):
+    t0 = time.perf_counter()
+    pool = WorkerPool(size=size, start_method=start_method)
+    pool.wait_ready()
+    startup = time.perf_counter() - t0
+    ok = 0
+    for func, args in _tasks(n):
+        success, _ = pool.run(func, args, timeout=10)
+        ok += success
+    total = time.perf_counter() - t0
+    stats = dict(pool.stats)
+    pool.close()
+    return {"mode": "pool", "tasks": n, "ok": ok, "startup_s": startup, "total_s": total, "stats": stats}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=40)
+    parser.add_argument("--size", type=int, default=1)
+    parser.add_argument("--start-method", default=None, choices=[None, "fork", "spawn", "forkserver"])
+    args = parser.parse_args()
+
+    results = [bench_pool(args.n, args.start_method, args.size), bench_per_call(args.n, args.start_method)]
+    for r in results:
+        r["tasks_per_s"] = r["tasks"] / r["total_s"]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Відтворюваний набір бенчмарків продуктивності: фіксовані seed і фіксовані корпуси формул
+(вибірка з benchmark_tasks.jsonl + патологічні формули з hanging_functions.jsonl).
+
+Вимірює:
+  * generator/<mode>/<a,b,c> — вирази/с ExpressionGenerator.generate для клітинки в режимі побудови
+                         ir (як у generate_cell) і constructive (за замовчуванням класу);
+  * metadata, points   — латентність calculate_metadata_safe / calculate_points_safe (без кешу метаданих);
+  * validator          — вартість TopologyFilter.check з холодним кешем обчислювачів;
+  * analyzer           — рядків/с DatasetAnalyzer.run.
+
+Запуск з кореня репозиторію (офлайн, лише локальні файли):
+    python -m benchmarks.bench_suite --save benchmarks/baselines/reference.json
+    python -m benchmarks.bench_suite --check benchmarks/baselines/reference.json --threshold 0.3
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import numpy as np
+import sympy as sp
+from typing import Dict, List, Tuple
+from src.config import ComplexityConfig
+from src.generator import ExpressionGenerator
+from src.validator import TopologyFilter
+from src.sampler import DatasetSampler
+from src.evaluator import EvaluatorCache
+from src.analyzer import DatasetAnalyzer
+from src.utils import get_worker_pool, shutdown_worker_pool
+
+TASKS_FILE = "benchmark_tasks.jsonl"
+HANGING_FILE = "hanging_functions.jsonl"
+DEFAULT_CELLS = ["0,0,0", "1,1,0", "0,2,1", "2,0,2", "1,3,0", "3,3,3"]
+# Режими побудови генератора: "ir" — той, що в generate_cell
+CONSTRUCTIONS = ("ir", "constructive")
+
+# Напрям метрики за суфіксом: більше — краще (_per_s) або менше — краще (_ms)
+HIGHER_IS_BETTER = ("_per_s",)
+LOWER_IS_BETTER = ("_ms",)
+
+def load_corpus(path: str, n: int, seed: int) -> List[Tuple[str, Tuple[int, int, int]]]:
+    """Фіксована вибірка (формула, (a, b, c)) з JSONL: однаковий файл і seed дають однаковий корпус."""
+    if not os.path.exists(path):
+        return []
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            vector = record["complexity_vector"]
+            items.append((record["ground_truth"]["formula"], (vector["a"], vector["b"], vector["c"])))
+    return random.Random(seed).sample(items, min(n, len(items)))
+
+def _latency(values: List[float]) -> Dict[str, float]:
+    values = np.asarray(values) * 1000
+    return {"p50_ms": round(float(np.percentile(values, 50)), 3), "p95_ms": round(float(np.percentile(values, 95)), 3),
+            "mean_ms": round(float(values.mean()), 3)}
+
+def bench_generator(cells: List[str], n: int, seed: int) -> Dict[str, dict]:
+    results = {}
+    for construction in CONSTRUCTIONS:
+        for cell in cells:
+            a, b, c = (int(v) for v in cell.split(","))
+            gen = ExpressionGenerator(ComplexityConfig(a, b, c), rng=random.Random(f"{seed}/{cell}"),
+                                      construction=construction)
+            start = time.perf_counter()
+            for _ in range(n):
+                gen.generate()
+            elapsed = time.perf_counter() - start
+            results[f"generator/{construction}/{cell}"] = {"exprs_per_s": round(n / elapsed, 3)}
+    return results
+
+def bench_sampler(corpus, timeout: float) -> Dict[str, dict]:
+    """Латентність етапів метаданих і точок у пулі воркерів (кеш метаданих вимкнено)."""
+    DatasetSampler.metadata_cache = None
+    get_worker_pool().wait_ready()
+    x = sp.Symbol('x', real=True)
+    timings = {"metadata": [], "points": []}
+    failures = {"metadata": 0, "points": 0}
+    for formula, _ in corpus:
+        expr = sp.parse_expr(formula, local_dict={'x': x})
+        t0 = time.perf_counter()
+        ok, _, _ = DatasetSampler.calculate_metadata_safe(expr, timeout=timeout)
+        timings["metadata"].append(time.perf_counter() - t0)
+        failures["metadata"] += not ok
+        t0 = time.perf_counter()
+        ok, _, _ = DatasetSampler.calculate_points_safe(expr, timeout=timeout)
+        timings["points"].append(time.perf_counter() - t0)
+        failures["points"] += not ok
+    return {stage: dict(_latency(values), failures=failures[stage]) for stage, values in timings.items() if values}
+
+def bench_validator(corpus) -> Dict[str, dict]:
+    x = sp.Symbol('x', real=True)
+    timings = []
+    for formula, (a, b, c) in corpus:
+        expr = sp.parse_expr(formula, local_dict={'x': x})
+        validator = TopologyFilter(ComplexityConfig(a, b, c), cache=EvaluatorCache())
+        t0 = time.perf_counter()
+        validator.check(expr)
+        timings.append(time.perf_counter() - t0)
+    return {"validator": _latency(timings)} if timings else {}
+
+def bench_analyzer(corpus, rows: int) -> Dict[str, dict]:
+    """Рядків/с DatasetAnalyzer.run на синтетичному файлі з формул корпусу (rows рядків)."""
+    if not corpus:
+        return {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tasks = os.path.join(tmp, "tasks.jsonl")
+        with open(tasks, "w", encoding="utf-8") as f:
+            for i in range(rows):
+                formula, (a, b, c) = corpus[i % len(corpus)]
+                f.write(json.dumps({"task_id": f"B{i}", "complexity_vector": {"a": a, "b": b, "c": c},
+                                    "ground_truth": {"formula": formula, "properties": {"singularities": []}}}) + "\n")
+        failed = os.path.join(tmp, "failed.jsonl")
+        open(failed, "w").close()
+        analyzer = DatasetAnalyzer(tasks, failed)
+        t0 = time.perf_counter()
+        analyzer.run(os.path.join(tmp, "analysis.csv"))
+        elapsed = time.perf_counter() - t0
+    return {"analyzer": {"rows_per_s": round(rows / elapsed, 3)}}
+
+def run_suite(seed: int = 0, n_generate: int = 20, n_tasks: int = 12, n_hanging: int = 8, timeout: float = 2.0,
+              analyzer_rows: int = 2000, cells: List[str] = DEFAULT_CELLS) -> dict:
+    tasks = load_corpus(TASKS_FILE, n_tasks, seed)
+    hanging = load_corpus(HANGING_FILE, n_hanging, seed)
+    random.seed(seed)
+    results = {}
+    results.update(bench_generator(cells, n_generate, seed))
+    results.update(bench_sampler(tasks + hanging, timeout))
+    results.update(bench_validator(tasks + hanging))
+    results.update(bench_analyzer(tasks, analyzer_rows))
+    return {
+        "meta": {"seed": seed, "n_generate": n_generate, "corpus": {"tasks": len(tasks), "hanging": len(hanging)},
+                 "analyzer_rows": analyzer_rows, "python": platform.python_version(), "machine": platform.machine(),
+                 "sympy": sp.__version__, "numpy": np.__version__, "created": time.strftime("%Y-%m-%d %H:%M:%S")},
+        "results": results,
+    }
+
+def compare(baseline: dict, current: dict, threshold: float = 0.3) -> List[str]:
+    """
+    Регресії поточного запуску відносно базового: метрика гірша більш ніж на threshold (частка).
+    Метрики, яких немає в одному з файлів, пропускаються.
+    """
+    regressions = []
+    for bench, metrics in baseline.get("results", {}).items():
+        for name, base in metrics.items():
+            value = current.get("results", {}).get(bench, {}).get(name)
+            if value is None or not base:
+                continue
+            if name.endswith(HIGHER_IS_BETTER) and value < base * (1 - threshold):
+                regressions.append(f"{bench}.{name}: {value} < {base} (-{(1 - value / base):.0%})")
+            elif name.endswith(LOWER_IS_BETTER) and value > base * (1 + threshold):
+                regressions.append(f"{bench}.{name}: {value} > {base} (+{(value / base - 1):.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки продуктивності MCM-Gen з базовими JSON і перевіркою регресій")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--n-generate", type=int, default=20, help="виразів на клітинку для генератора")
+    parser.add_argument("--n-tasks", type=int, default=12, help="формул з benchmark_tasks.jsonl")
+    parser.add_argument("--n-hanging", type=int, default=8, help="формул з hanging_functions.jsonl")
+    parser.add_argument("--timeout", type=float, default=2.0, help="таймаут етапів семплера, с")
+    parser.add_argument("--cells", default=";".join(DEFAULT_CELLS), help="клітинки генератора 'a,b,c;a,b,c'")
+    parser.add_argument("--save", default=None, help="зберегти результат як базовий JSON")
+    parser.add_argument("--check", default=None, help="порівняти з базовим JSON; код виходу 1 при регресії")
+    parser.add_argument("--threshold", type=float, default=0.3, help="допустиме погіршення (частка)")
+    args = parser.parse_args()
+
+    try:
+        report = run_suite(args.seed, args.n_generate, args.n_tasks, args.n_hanging, args.timeout,
+                           cells=args.cells.split(";"))
+    finally:
+        shutdown_worker_pool()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.check:
+        with open(args.check, "r", encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"Без регресій (поріг {args.threshold:.0%}).")
+
+if __name__ == "__main__":
+    main()
@@ -1,123 +1,559 @@
+import os
 import time
+import random
+import socket
+import logging
+import collections
+import argparse
 import sympy as sp
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from src.config import ComplexityConfig
 from src.generator import ExpressionGenerator
 from src.validator import TopologyFilter
-from src.sampler import DatasetSampler, TaskExporter
-from src.utils import setup_logging, load_manual_formulas, load_seen_expressions, append_to_file
+from src.sampler import DatasetSampler, TaskExporter, BatchEvaluator
+from src.prescreen import NumericGate
+from src.dedup import expression_digest
+from src.failures import FailureKnowledge
+from src.pipeline import InFlightWindow
+from src.metacache import MetadataCache
+from src.storage import INDEX_FILE, JsonlTaskSink, BinaryTaskSink
+from src.writer import BufferedTaskWriter
+from src.budget import LatencyBudget, CircuitBreaker, load_history, failure_rate
+from src.metrics import PipelineMetrics, MetricsExporter, SamplingProfiler
+from src.workqueue import WorkQueue, LeaseKeeper, SharedOutput, merge_shards, shard_sink, SHARD_FAILED
+from src.utils import (setup_logging, load_manual_formulas, get_worker_pool, shutdown_worker_pool, time_limit,
+                       TimeLimitExceeded)
 import multiprocessing
 
 # --- CONFIGURATION ---
 OUTPUT_FILE = "benchmark_tasks.jsonl"
+OUTPUT_STORE = "benchmark_tasks.store"
 FAILED_FILE = "hanging_functions.jsonl"
 MANUAL_FILE = "manual_formulas.json"
-PLAN = np.full((4, 4, 4), 2) 
+METADATA_CACHE_FILE = "metadata_cache.sqlite"
+METRICS_FILE = "generation_metrics.json"
+SHARDS_DIR = "shards"
+PLAN = np.full((4, 4, 4), 2)
 PLAN[0, 0, 0] = 5
+# Частка невдач клітинки в попередніх запусках, з якої її задачі йдуть у кінець черги
+BREAKER_THRESHOLD = 0.8
 
-def generate_benchmark_suite():
+# Контекст процесу-генератора (заповнюється ініціалізатором, щоб не пересилати множини з кожною задачею)
+_CELL_CONTEXT = {}
+
+def _init_cell_worker(seen_expressions, failed_expressions, manual_formulas, metadata_cache_path=None,
+                      confirm_period=False, history=None, blacklist=None, in_flight=1):
+    # Під spawn процес стартує без хендлерів логера
+    if not logging.getLogger("MCM-Gen").hasHandlers():
+        setup_logging()
+    DatasetSampler.metadata_cache = MetadataCache(metadata_cache_path) if metadata_cache_path else None
+    DatasetSampler.confirm_period = confirm_period
+    _CELL_CONTEXT["seen"] = seen_expressions
+    _CELL_CONTEXT["failed"] = failed_expressions
+    _CELL_CONTEXT["manual"] = manual_formulas
+    _CELL_CONTEXT["history"] = history or {}
+    _CELL_CONTEXT["blacklist"] = blacklist
+    _CELL_CONTEXT["in_flight"] = in_flight
+    # Кожен кандидат у роботі займає двох воркерів одночасно: метадані й точки
+    get_worker_pool(size=2 * in_flight)
+
+def _cell_rng(seed, a, b, c, chunk, done=0):
+    """
+    Окремий потік RNG для кожної (клітинки, частини); не залежить від кількості воркерів.
+    done — скільки завдань клітинки вже є: продовження запуску не повторює кандидатів першого.
+    """
+    if seed is None:
+        return random.Random()
+    resume = f"+{done}" if done else ""
+    return random.Random(f"{seed}/{a},{b},{c}/{chunk}{resume}")
+
+def plan_jobs(plan, chunk_size=None, existing=None):
+    """
+    Розбиває PLAN на незалежні задачі (a, b, c, chunk, quota, done) у фіксованому порядку.
+    existing — Checkpoint (або None): генерується лише залишок квоти кожної клітинки.
+    Клітинки з нульовим залишком пропускаються.
+    Ручні формули обробляються лише в нульовій частині клітинки.
+    """
+    jobs = []
+    for a in range(plan.shape[0]):
+        for b in range(plan.shape[1]):
+            for c in range(plan.shape[2]):
+                done = existing.count(a, b, c) if existing is not None else 0
+                target = max(0, int(plan[a, b, c]) - done)
+                size = chunk_size or max(target, 1)
+                quotas = [min(size, target - start) for start in range(0, target, size)]
+                for chunk, quota in enumerate(quotas):
+                    jobs.append((a, b, c, chunk, quota, done))
+    return jobs
+
+def generate_cell(job, seed=None, metrics=None):
+    """
+    Генерує завдання для однієї частини клітинки (A, B, C).
+    Нічого не пише у файли: повертає список записів ("task" | "failed", digest, record, points) у порядку появи;
+    points = (x, y) для завдань і None для невдалих.
+    metrics — PipelineMetrics, куди пишуться латентності етапів, лічильники та причини відмов.
+    """
+    a, b, c, chunk, target_count, done = job
+    logger = logging.getLogger("MCM-Gen")
+
+    seen_expressions = _CELL_CONTEXT.get("seen", set())
+    failed_expressions = _CELL_CONTEXT.get("failed", set())
+    class_key = f"{a},{b},{c}"
+    metrics = metrics if metrics is not None else PipelineMetrics()
+    logger.info(f"Клас <{class_key}> (частина {chunk})...")
+
+    rng = _cell_rng(seed, a, b, c, chunk, done)
+    config = ComplexityConfig(a, b, c)
+    blacklist = _CELL_CONTEXT.get("blacklist")
+    gen = ExpressionGenerator(config, rng=rng, metrics=metrics, construction="ir", blacklist=blacklist)
+    validator = TopologyFilter(config, blacklist=blacklist)
+    gate = NumericGate()
+    batch = BatchEvaluator(gate.cache)
+
+    # Бюджети таймаутів клітинки: з тривалостей попередніх запусків, далі — з поточних спостережень
+    timeouts = LatencyBudget()
+    for stage, values in _CELL_CONTEXT.get("history", {}).get(class_key, {}).get("samples", {}).items():
+        timeouts.observe_many(stage, values)
+    breaker = CircuitBreaker()
+
+    manual_list = _CELL_CONTEXT.get("manual", {}).get(class_key, []) if chunk == 0 else []
+    collected_in_class = 0
+    local_seen = set()
+    records = []
+
+    def next_task_id():
+        return None if seed is None else f"{rng.getrandbits(32):08x}"
+
+    def fail(expr, digest, properties, durations):
+        metrics.count(class_key, "failed")
+        metrics.reject(class_key, f"{properties.get('stage')}:{properties.get('error')}")
+        if durations:
+            properties["stage_seconds"] = durations
+        failed_task = TaskExporter.create_task(expr, None, None, config, properties, task_id=next_task_id())
+        records.append(("failed", digest, failed_task, None))
+        local_seen.add(digest)
+        # Запобіжник рахує лише кандидатів, що дійшли до метаданих/точок (durations є лише в них)
+        if durations:
+            breaker.record(True)
+
+    # Кандидати, чиї метадані й точки рахуються у фоні (результати фіксуються в порядку появи)
+    window = InFlightWindow(_CELL_CONTEXT.get("in_flight", 1), wait_clock=get_worker_pool().waited)
+
+    def candidate_stream():
+        """
+        Спочатку ручні (рядки), потім авто (вирази) раундами розміром із залишок квоти
+        (без кандидатів, що вже в роботі). Кожен раунд обчислюється одним пакетом на сітках
+        семплювання/валідації, тож гейт, валідатор і семплер беруть значення з кешу обчислювачів.
+        """
+        yield from manual_list
+        budget = target_count + 10 # із запасом
+        while budget > 0 and collected_in_class < target_count:
+            size = min(budget, max(1, target_count - collected_in_class - window.in_flight))
+            budget -= size
+            round_exprs = []
+            for _ in range(size):
+                try:
+                    with metrics.timer(class_key, "generate"):
+                        round_exprs.append(gen.generate())
+                except Exception as e:
+                    logger.warning(f"Помилка генерації/парсингу: {e}")
+            # Передзаповнення — під тим самим захистом, що й гейт: завеликі вирази (too_large) не компілюються,
+            # а весь раунд обмежений guard_seconds на вираз; недораховане гейт дорахує сам під своїм дедлайном
+            prefill = [expr for expr in round_exprs if sp.count_ops(expr) <= gate.max_ops]
+            with metrics.timer(class_key, "prefill"):
+                try:
+                    with time_limit(gate.guard_seconds * len(prefill)):
+                        batch.evaluate(prefill, "sample")
+                        validator.prefill(prefill)
+                except TimeLimitExceeded:
+                    metrics.count(class_key, "prefill_timeout")
+            yield from round_exprs
+
+    def admit(item):
+        """Дедуплікація, пре-скринінг і валідація в головному потоці; етапи з воркерами — у вікно."""
+        metrics.count(class_key, "candidates")
+
+        # Отримання виразу
+        is_manual = isinstance(item, str)
+        if is_manual:
+            try:
+                expr = sp.parse_expr(item, local_dict={'x': config.x})
+            except Exception as e:
+                logger.warning(f"Помилка генерації/парсингу: {e}")
+                return
+        else:
+            expr = item
+
+        # ДЕДУПЛІКАЦІЯ за структурним 64-бітним ключем (generate() вже повертає спрощений вираз)
+        t0 = time.perf_counter()
+        digest = expression_digest(expr)
+        expr_str = str(expr)
+        duplicate = digest in seen_expressions or digest in failed_expressions or digest in local_seen
+        metrics.observe(class_key, "dedup", time.perf_counter() - t0)
+        # Наявна ручна формула вже врахована в лічильнику клітинки з чекпоінту — повторно не рахуємо
+        if duplicate:
+            metrics.reject(class_key, "duplicate")
+            return
+
+        # ПРЕ-СКРИНІНГ на сітці семплювання: відсіює неминучі "TIMEOUT Points" без жодного воркера
+        with metrics.timer(class_key, "prescreen"):
+            passed, reason = gate.screen(expr, config.x)
+        if not passed:
+            logger.debug(f"PRESCREEN {reason}: {expr_str}")
+            # Невдача фіксується на своєму місці в черзі, після кандидатів, що вже в роботі
+            local_seen.add(digest)
+            window.defer((expr, digest, expr_str, {"error": reason, "stage": "prescreen"}))
+            return
+
+        # ВАЛІДАЦІЯ (Тільки для авто)
+        if not is_manual:
+            with metrics.timer(class_key, "topology"):
+                valid = validator.check(expr)
+            if not valid:
+                metrics.reject(class_key, validator.last_rejection)
+                return
+
+        # --- БЕЗПЕЧНА ОБРОБКА: метадані й точки одночасно у фоні (TIMEOUTS з бюджету клітинки) ---
+        budgets = {"metadata": timeouts.timeout("metadata"), "points": timeouts.timeout("points")}
+        local_seen.add(digest)
+        window.submit((expr, digest, expr_str, budgets), {
+            "metadata": lambda: DatasetSampler.calculate_metadata_safe(expr, timeout=budgets["metadata"]),
+            "points": lambda: DatasetSampler.calculate_points_safe(expr, timeout=budgets["points"]),
+        })
+
+    def commit(item, results):
+        """Фіксує голову вікна: відмову пре-скринінгу, невдачу етапу або нове завдання."""
+        nonlocal collected_in_class
+        expr, digest, expr_str, info = item
+        if results is None:
+            fail(expr, digest, info, None)
+            return
+
+        # 1. Метадані
+        (meta_success, metadata, meta_err), meta_seconds = results["metadata"]
+        durations = {"metadata": round(meta_seconds, 4)}
+        timeouts.observe("metadata", durations["metadata"])
+        metrics.observe(class_key, "metadata", durations["metadata"])
+
+        if not meta_success:
+            logger.warning(f"TIMEOUT Metadata ({info['metadata']} с): {expr_str}")
+            fail(expr, digest, {"error": meta_err, "stage": "metadata", "timeout": info["metadata"]}, durations)
+            return # Метадані критичні: точки, пораховані паралельно, відкидаються
+
+        # 2. Точки
+        (points_success, (x_vals, y_vals), points_err), points_seconds = results["points"]
+        durations["points"] = round(points_seconds, 4)
+        timeouts.observe("points", durations["points"])
+        metrics.observe(class_key, "points", durations["points"])
+
+        if not points_success:
+            logger.warning(f"TIMEOUT Points ({info['points']} с): {expr_str}")
+            # Зберігаємо те, що встигли (метадані)
+            metadata["error"] = points_err
+            metadata["timeout"] = info["points"]
+            fail(expr, digest, metadata, durations)
+            return
+
+        # Успіх
+        # Точки йдуть окремо повними масивами: формат (JSONL / бінарний) обирає сховище при записі
+        metadata["stage_seconds"] = durations
+        with metrics.timer(class_key, "export"):
+            task = TaskExporter.create_task(expr, None, None, config, metadata, task_id=next_task_id())
+        records.append(("task", digest, task, (x_vals, y_vals)))
+        metrics.count(class_key, "tasks")
+        breaker.record(False)
+        collected_in_class += 1
+
+    def breaker_tripped():
+        if breaker.is_open:
+            logger.warning(f"Запобіжник <{class_key}>: частка невдач {breaker.failure_rate:.0%}, клітинку призупинено "
+                           f"({collected_in_class}/{target_count})")
+            metrics.count(class_key, "breaker_open")
+        return breaker.is_open
+
+    # --- Обробка (Manual + Auto) в одній черзі ---
+    # Генерація і перевірки йдуть далі, поки попередні кандидати у вікні чекають на воркери.
+    # Результати фіксуються строго в порядку кандидатів, а кандидати в роботі займають квоту:
+    # нові не беруться, поки зайняті місця покривають залишок (невдача звільняє місце).
+    stream = candidate_stream()
+    stopped = False
+    try:
+        while not stopped:
+            while window and (window.full or collected_in_class + window.in_flight >= target_count):
+                stopped = breaker_tripped()
+                if stopped:
+                    break
+                commit(*window.pop())
+            if stopped or collected_in_class >= target_count or breaker_tripped():
+                break
+            item = next(stream, None)
+            if item is None:
+                break
+            admit(item)
+        # Хвіст вікна: ті самі перевірки перед кожним кандидатом, що й для нових
+        while not stopped and window and collected_in_class < target_count:
+            stopped = breaker_tripped()
+            if not stopped:
+                commit(*window.pop())
+    finally:
+        window.close()
+
+    if gate.stats:
+        logger.info(f"Пре-скринінг <{class_key}>: {dict(gate.stats)}, кеш обчислювачів: {dict(gate.cache.stats)}")
+    if DatasetSampler.metadata_cache is not None:
+        logger.info(f"Кеш метаданих <{class_key}>: {DatasetSampler.metadata_cache.summary()}")
+    if gen.counters["attempts"]:
+        logger.info(f"Генератор <{class_key}>: {gen.acceptance_stats()}")
+    if gen.simplifier.stats:
+        tiers = {tier: f"{s['count']} за {s['seconds']:.2f} с" for tier, s in gen.simplifier.stats.items()}
+        logger.info(f"Спрощення <{class_key}>: {tiers}, кеш піддерев: {gen.simplifier.cache_hits} влучань")
+    if validator.detector.stats:
+        logger.info(f"Топологія <{class_key}>: {dict(validator.detector.stats)}")
+    if validator.periodicity.stats:
+        logger.info(f"Періодичність <{class_key}>: {dict(validator.periodicity.stats)}")
+    if validator.pole_paths:
+        logger.info(f"Пошук полюсів <{class_key}>: {dict(validator.pole_paths)}")
+    if gen.counters["blacklisted"] or validator.blacklist_hits:
+        logger.info(f"Чорний список <{class_key}>: генератор {gen.counters['blacklisted']}, "
+                    f"валідатор {dict(validator.blacklist_hits)}")
+    if window.stats:
+        logger.info(f"Вікно етапів <{class_key}>: {dict(window.stats)}")
+    if timeouts.samples:
+        logger.info(f"Бюджети таймаутів <{class_key}>: {timeouts.snapshot()}, частка невдач: {breaker.failure_rate:.0%}")
+    return records
+
+def _run_job(args):
+    """Задача процесу-генератора: записи клітинки і її метрики (включно з приростом лічильників пулу воркерів)."""
+    job, seed = args
+    metrics = PipelineMetrics()
+    pool_before = dict(get_worker_pool().stats)
+    records = generate_cell(job, seed, metrics)
+    metrics.add_worker_stats(pool_before, get_worker_pool().stats)
+    return records, metrics
+
+def _load_blacklist(tasks_path, logger):
+    """Чорний список піддерев з FAILED_FILE (контрприклади — хвіст tasks_path)."""
+    blacklist = FailureKnowledge.from_files(FAILED_FILE, tasks_path)
+    logger.info(f"Чорний список: {len(blacklist)} фатальних піддерев з {FAILED_FILE}.")
+    return blacklist
+
+def _blacklist_hits(metrics):
+    """Влучання чорного списку (генератор і валідатор) за причинами по всіх клітинках."""
+    hits = collections.Counter()
+    for reasons in metrics.rejections.values():
+        hits.update({reason: n for reason, n in reasons.items() if "blacklist:" in reason})
+    return dict(hits)
+
+def _write_records(writer, records, metrics):
+    """Пише записи клітинки (дублікати між клітинками відкидаються); повертає (нових завдань, дублікатів)."""
+    new = duplicates = 0
+    for kind, digest, record, points in records:
+        vector = record["complexity_vector"]
+        cell = f"{vector['a']},{vector['b']},{vector['c']}"
+        if digest in writer:
+            duplicates += 1
+            metrics.reject(cell, "duplicate_cross_cell")
+            continue
+        with metrics.timer(cell, "export"):
+            if kind == "task":
+                writer.write_task(digest, record, *points)
+            else:
+                writer.write_failed(digest, record)
+        new += kind == "task"
+    return new, duplicates
+
+def generate_benchmark_suite(workers=1, seed=None, chunk_size=None, plan=None, confirm_period=False, storage="jsonl",
+                             metrics_path=METRICS_FILE, metrics_interval=10.0, profile=None, in_flight=2):
+    """
+    Генерує бенчмарк за PLAN.
+    workers > 1 — клітинки (або частини квоти по chunk_size) розподіляються між процесами;
+    результати зливаються головним процесом у фіксованому порядку задач, тому з однаковим seed
+    вихід не залежить від кількості воркерів (за умови однакових результатів таймаутів).
+    confirm_period — підтверджувати числовий період символьним sympy.periodicity (повільніше).
+    storage — "jsonl" (OUTPUT_FILE) або "binary" (OUTPUT_STORE: точки float64 + індекс, див. src.storage).
+    metrics_path — файл метрик (.json або .prom), оновлюється кожні metrics_interval секунд; None — без файлу.
+    profile — шлях для collapsed stacks семплювального профайлера головного процесу (None — вимкнено).
+    in_flight — скільки кандидатів клітинки можуть одночасно чекати на метадані й точки, поки генерація
+    йде далі (src.pipeline.InFlightWindow); вихід залежить від in_flight, але не від порядку відповідей воркерів.
+    """
     logger = setup_logging()
-    logger.info(f"=== Початок генерації ===")
-    
-    # 1. Завантаження контексту
+    logger.info(f"=== Початок генерації (workers={workers}, seed={seed}) ===")
+    plan = PLAN if plan is None else plan
+
+    # 1. Завантаження контексту (обірвані хвости файлів відрізаються, лічильники клітинок — з чекпоінту)
     manual_formulas = load_manual_formulas(MANUAL_FILE)
-    seen_expressions = load_seen_expressions(OUTPUT_FILE)
-    failed_expressions = load_seen_expressions(FAILED_FILE) # Щоб не "зависати" на тих самих функціях знову
-    
+    sink = BinaryTaskSink(OUTPUT_STORE) if storage == "binary" else JsonlTaskSink(OUTPUT_FILE)
+    writer = BufferedTaskWriter(sink, FAILED_FILE)
+    seen_expressions = writer.seen
+    failed_expressions = writer.failed # Щоб не "зависати" на тих самих функціях знову
+
     logger.info(f"Завантажено {len(seen_expressions)} існуючих завдань.")
     logger.info(f"Завантажено {len(failed_expressions)} раніше невдалих функцій.")
 
+    # Тривалості етапів і частки невдач клітинок з попередніх запусків (хвости файлів)
+    history = load_history(sink.index_path, FAILED_FILE)
+    jobs = [(job, seed) for job in plan_jobs(plan, chunk_size, existing=writer.checkpoint)]
+    # Клітинки, що раніше переважно падали, — в кінець черги (стабільне сортування зберігає порядок решти)
+    jobs.sort(key=lambda item: failure_rate(history.get("{},{},{}".format(*item[0][:3]))) >= BREAKER_THRESHOLD)
+    logger.info(f"Залишок квоти: {sum(job[4] for job, _ in jobs)} завдань у {len(jobs)} задачах.")
+    # Знімок множин: клітинки бачать лише стан на початок запуску, незалежно від режиму
+    context = (frozenset(seen_expressions.digests), frozenset(failed_expressions.digests), manual_formulas, METADATA_CACHE_FILE,
+               confirm_period, history, _load_blacklist(sink.index_path, logger), in_flight)
+
     total_new = 0
+    duplicates = 0
+    start = time.perf_counter()
+    metrics = PipelineMetrics()
+    exporter = MetricsExporter(metrics_path, metrics_interval) if metrics_path else None
+    profiler = SamplingProfiler(profile) if profile else None
+    if profiler is not None:
+        profiler.start()
+
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_cell_worker, initargs=context)
+        results = executor.map(_run_job, jobs)
+    else:
+        executor = None
+        _init_cell_worker(*context)
+        # Пул воркерів прогрівається один раз на весь запуск
+        get_worker_pool().wait_ready()
+        results = map(_run_job, jobs)
+
+    try:
+        # map() віддає результати в порядку задач: пише лише головний процес, рядки не перемішуються
+        for records, job_metrics in results:
+            metrics.merge(job_metrics)
+            new, dups = _write_records(writer, records, metrics)
+            duplicates += dups
+            if (total_new + new) // 10 > total_new // 10:
+                logger.info(f"Згенеровано {total_new + new} нових завдань...")
+            total_new += new
+            if exporter is not None:
+                exporter.maybe_write(metrics)
+    finally:
+        writer.close()
+        if executor is not None:
+            executor.shutdown()
+        if profiler is not None:
+            logger.info(f"Профайлер: {profiler.stop()} семплів -> {profile}")
+        if exporter is not None:
+            exporter.write(metrics)
+
+    logger.info(f"Готово: {total_new} нових завдань за {time.perf_counter() - start:.1f} с, відкинуто дублікатів між клітинками: {duplicates}")
+    logger.info(f"Запис: {dict(writer.stats)}, клітинки: {dict(writer.checkpoint.cells)}")
+    logger.info(f"Чорний список, влучання: {_blacklist_hits(metrics)}")
+    if executor is None:
+        logger.info(f"Воркери: {get_worker_pool().stats}")
+        shutdown_worker_pool()
 
-    for a in range(4):
-        for b in range(4):
-            for c in range(4):
-                class_key = f"{a},{b},{c}"
-                target_count = PLAN[a, b, c]
-                
-                # Підрахунок вже наявних завдань цього класу можна зробити точнішим, 
-                # але для спрощення покладаємось на загальний seen_expressions
-                # (для повної точності треба було б парсити файл і рахувати по класах, 
-                # але ми будемо просто намагатися додати нові, доки не досягнемо target в цьому запуску 
-                # або можна просто ігнорувати вже наявні і додавати зверху)
-                
-                logger.info(f"Клас <{class_key}>...")
-                
-                config = ComplexityConfig(a, b, c)
-                gen = ExpressionGenerator(config)
-                validator = TopologyFilter(config)
-                
-                manual_list = manual_formulas.get(class_key, [])
-                collected_in_class = 0
-                
-                # --- Обробка (Manual + Auto) в одній черзі ---
-                # Спочатку ручні, потім авто
-                formula_source = manual_list + ["AUTO"] * (target_count + 10) # із запасом
-                
-                for item in formula_source:
-                    if collected_in_class >= target_count:
-                        break
-                        
-                    # Отримання виразу
-                    try:
-                        if item != "AUTO":
-                            expr = sp.parse_expr(item)
-                            is_manual = True
-                        else:
-                            expr = gen.generate()
-                            is_manual = False
-                    except Exception as e:
-                        logger.warning(f"Помилка генерації/парсингу: {e}")
-                        continue
-
-                    expr_str = str(sp.simplify(expr)) # Нормалізація рядка
-                    
-                    # ДЕДУПЛІКАЦІЯ
-                    if expr_str in seen_expressions or expr_str in failed_expressions:
-                        if is_manual: 
-                             # Якщо ручна формула вже є, рахуємо її як зроблену
-                             collected_in_class += 1 
-                        continue
-
-                    # ВАЛІДАЦІЯ (Тільки для авто)
-                    if not is_manual and not validator.check(expr):
-                        continue
-
-                    # --- БЕЗПЕЧНА ОБРОБКА (TIMEOUTS) ---
-                    
-                    # 1. Метадані
-                    meta_success, metadata, meta_err = DatasetSampler.calculate_metadata_safe(expr, timeout=5)
-                    
-                    if not meta_success:
-                        logger.warning(f"TIMEOUT Metadata: {expr_str}")
-                        failed_task = TaskExporter.create_task(expr, None, None, config, {"error": meta_err, "stage": "metadata"})
-                        append_to_file(FAILED_FILE, failed_task)
-                        failed_expressions.add(expr_str)
-                        continue # Переходимо до наступного, бо метадані критичні (залежить від ваших вимог)
-
-                    # 2. Точки
-                    points_success, (x_vals, y_vals), points_err = DatasetSampler.calculate_points_safe(expr, timeout=3)
-                    
-                    if not points_success:
-                        logger.warning(f"TIMEOUT Points: {expr_str}")
-                        # Зберігаємо те, що встигли (метадані)
-                        metadata["error"] = points_err
-                        failed_task = TaskExporter.create_task(expr, None, None, config, metadata)
-                        append_to_file(FAILED_FILE, failed_task)
-                        failed_expressions.add(expr_str)
-                        continue
-
-                    # Успіх
-                    task = TaskExporter.create_task(expr, x_vals, y_vals, config, metadata)
-                    append_to_file(OUTPUT_FILE, task)
-                    seen_expressions.add(expr_str)
-                    collected_in_class += 1
-                    total_new += 1
-                    
-                    if total_new % 10 == 0:
-                        logger.info(f"Згенеровано {total_new} нових завдань...")
+def generate_node(queue_path, shards_root=SHARDS_DIR, node_id=None, seed=None, chunk_size=None, plan=None,
+                  lease_ttl=60.0, confirm_period=False, storage="jsonl", metrics_path=None, in_flight=2):
+    """
+    Вузол розподіленої генерації: бере задачі з черги WorkQueue (файл SQLite, спільний для вузлів)
+    в оренду, поки вони не скінчаться, і пише результати у власний шард <shards_root>/<node_id>.
+    Перший вузол заповнює чергу залишком квоти PLAN відносно злитого виходу (повторне заповнення ігнорується).
+    Оренда продовжується у фоні; якщо вузол помер, задачу після lease_ttl забирає інший вузол.
+    Шарди зливаються в OUTPUT_FILE/OUTPUT_STORE окремо: merge_node_shards (ідемпотентно, за дайджестом формули).
+    """
+    logger = setup_logging()
+    node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+    plan = PLAN if plan is None else plan
+    merged_index = os.path.join(OUTPUT_STORE, INDEX_FILE) if storage == "binary" else OUTPUT_FILE
+    merged = SharedOutput(merged_index, FAILED_FILE)
+    queue = WorkQueue(queue_path)
+    added = queue.populate(plan_jobs(plan, chunk_size, existing=merged))
+    logger.info(f"=== Вузол {node_id}: черга {queue_path} (+{added} задач), стан {queue.summary()} ===")
+
+    shard_dir = os.path.join(shards_root, node_id)
+    writer = BufferedTaskWriter(shard_sink(shard_dir, storage), os.path.join(shard_dir, SHARD_FAILED))
+    # Вузол не бачить шардів інших вузлів: дублікати між ними відкидає злиття
+    context = (frozenset(merged.digests | writer.seen.digests), frozenset(merged.failed | writer.failed.digests),
+               load_manual_formulas(MANUAL_FILE), METADATA_CACHE_FILE, confirm_period,
+               load_history(merged_index, FAILED_FILE), _load_blacklist(merged_index, logger), in_flight)
+    _init_cell_worker(*context)
+    get_worker_pool().wait_ready()
+
+    total_new = duplicates = 0
+    metrics = PipelineMetrics()
+    try:
+        while True:
+            leased = queue.lease(node_id, lease_ttl)
+            if leased is None:
+                break
+            job_id, job = leased
+            cell = "{},{},{}".format(*job[:3])
+            try:
+                with LeaseKeeper(queue, job_id, node_id, lease_ttl) as keeper:
+                    records, job_metrics = _run_job((job, seed))
+            except BaseException:
+                queue.release(job_id, node_id)
+                raise
+            metrics.merge(job_metrics)
+            # Оренда перевіряється ще раз (і продовжується на повний lease_ttl) безпосередньо перед записом:
+            # між останнім продовженням LeaseKeeper і complete() задачу міг забрати інший вузол
+            if keeper.lost or not queue.renew(job_id, node_id, lease_ttl):
+                # Задачу вже забрав інший вузол (оренда не продовжилася вчасно) — результат його
+                logger.warning(f"Оренду задачі {cell}/{job[3]} втрачено, результат відкинуто.")
+                metrics.count(cell, "lease_lost")
+                continue
+            new, dups = _write_records(writer, records, metrics)
+            # Спочатку дані на диск, потім позначка виконання: обрив між ними лише повторить задачу
+            writer.flush()
+            if not queue.complete(job_id, node_id):
+                # Запис тривав довше за lease_ttl: частину клітинки має й інший вузол; злиття відкине
+                # лише однакові формули, тож без seed клітинка може перевищити квоту
+                logger.error(f"Оренда задачі {cell}/{job[3]} спливла під час запису: частина є і в іншого вузла.")
+                metrics.count(cell, "lease_lost_after_write")
+                continue
+            total_new += new
+            duplicates += dups
+    finally:
+        writer.close()
+        queue.close()
+        if metrics_path:
+            # Метрики кожного вузла — у його шарді
+            MetricsExporter(os.path.join(shard_dir, os.path.basename(metrics_path))).write(metrics)
+        shutdown_worker_pool()
+    logger.info(f"Вузол {node_id}: {total_new} нових завдань, дублікатів: {duplicates}, черга: {dict(queue.stats)}, "
+                f"чорний список: {_blacklist_hits(metrics)}")
+    return total_new
+
+def merge_node_shards(shards_root=SHARDS_DIR, storage="jsonl"):
+    """Зливає шарди вузлів у OUTPUT_FILE/OUTPUT_STORE і FAILED_FILE; повторний запуск нічого не дублює."""
+    logger = setup_logging()
+    sink = BinaryTaskSink(OUTPUT_STORE) if storage == "binary" else JsonlTaskSink(OUTPUT_FILE)
+    stats = merge_shards(shards_root, sink, FAILED_FILE)
+    logger.info(f"Злиття шардів {shards_root}: {dict(stats)}")
+    return stats
 
 if __name__ == "__main__":
     # Необхідно для multiprocessing на Windows
-    multiprocessing.freeze_support() 
-    generate_benchmark_suite()
\ No newline at end of file
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="MCM-Gen: генерація бенчмарку")
+    parser.add_argument("--workers", type=int, default=1, help="кількість процесів-генераторів")
+    parser.add_argument("--seed", type=int, default=None, help="seed для відтворюваної генерації")
+    parser.add_argument("--chunk-size", type=int, default=None, help="розмір частини квоти клітинки")
+    parser.add_argument("--confirm-period", action="store_true", help="символьне підтвердження періоду (sympy.periodicity)")
+    parser.add_argument("--storage", choices=["jsonl", "binary"], default="jsonl", help="формат збереження завдань")
+    parser.add_argument("--metrics", default=METRICS_FILE, help="файл метрик: .json або .prom (Prometheus textfile); '' — вимкнути")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="період оновлення файлу метрик, с")
+    parser.add_argument("--profile", default=None, help="записати collapsed stacks семплювального профайлера у файл")
+    parser.add_argument("--queue", default=None, help="режим вузла: файл спільної черги задач (SQLite)")
+    parser.add_argument("--node-id", default=None, help="ім'я вузла (шард <shards>/<node-id>); типово host-pid")
+    parser.add_argument("--lease-ttl", type=float, default=60.0, help="тривалість оренди задачі, с")
+    parser.add_argument("--shards", default=SHARDS_DIR, help="каталог шардів вузлів")
+    parser.add_argument("--merge", action="store_true", help="злити шарди вузлів у вихідні файли і вийти")
+    parser.add_argument("--in-flight", type=int, default=2, help="кандидатів клітинки, що одночасно чекають на метадані й точки")
+    args = parser.parse_args()
+    if args.merge:
+        merge_node_shards(args.shards, args.storage)
+    elif args.queue:
+        generate_node(args.queue, args.shards, node_id=args.node_id, seed=args.seed, chunk_size=args.chunk_size,
+                      lease_ttl=args.lease_ttl, confirm_period=args.confirm_period, storage=args.storage,
+                      metrics_path=args.metrics or None, in_flight=args.in_flight)
+    else:
+        generate_benchmark_suite(workers=args.workers, seed=args.seed, chunk_size=args.chunk_size,
+                                 confirm_period=args.confirm_period, storage=args.storage,
+                                 metrics_path=args.metrics or None, metrics_interval=args.metrics_interval,
+                                 profile=args.profile, in_flight=args.in_flight)
@@ -1,7 +1,16 @@
-from src.analyzer import DatasetAnalyzer
+from src.analyzer import DatasetAnalyzer, default_output
+from src.neardup import near_duplicate_report, save_clusters
 import os
+import argparse
 
 def main():
+    parser = argparse.ArgumentParser(description="MCM-Gen: аналіз датасету")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="кількість процесів аналізу")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="записів в одній частині")
+    parser.add_argument("--output", default=default_output(), help="результат: .parquet (потрібен pyarrow) або .csv")
+    parser.add_argument("--near-duplicates", default=None, help="знайти майже-дублікати (числові відбитки + LSH) і зберегти групи в JSON")
+    args = parser.parse_args()
+
     print("Запуск аналізу даних...")
     
     analyzer = DatasetAnalyzer(
@@ -9,22 +18,21 @@ def main():
         hanging_file="hanging_functions.jsonl"
     )
     
-    analyzer.load_data()
-    
-    if analyzer.df.empty:
-        print("Файли порожні або відсутні.")
-        return
-
+    # Потокова перевірка частинами в пулі процесів; детальна таблиця пишеться одразу у файл
     print("Виконання інтелектуальної перевірки...")
-    analyzer.analyze_compliance()
+    output = analyzer.run(output=args.output, workers=args.workers, chunk_size=args.chunk_size)
     
     print("Генерація звіту...")
     report = analyzer.get_statistics()
     print(report)
-    
-    # Збереження детальної таблиці (можна відкрити в Excel)
-    analyzer.export_csv("analysis_full.csv")
-    print("\nДетальний CSV звіт збережено як 'analysis_full.csv'")
+    print(f"\nДетальний звіт збережено як '{output}'")
+
+    if args.near_duplicates:
+        print("\nПошук майже-дублікатів...")
+        clusters = analyzer.find_near_duplicates(workers=args.workers, chunk_size=args.chunk_size)
+        print(near_duplicate_report(clusters))
+        save_clusters(args.near_duplicates, clusters)
+        print(f"Групи збережено як '{args.near_duplicates}'")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
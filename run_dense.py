@@ -0,0 +1,21 @@
+from src.dense import densify
+from src.utils import setup_logging
+import argparse
+
+def main():
+    parser = argparse.ArgumentParser(description="MCM-Gen: щільне семплювання завдань (10^5..10^7 точок)")
+    parser.add_argument("--input", default="benchmark_tasks.jsonl", help="JSONL або каталог бінарного сховища")
+    parser.add_argument("--output", default="benchmark_tasks.dense.store", help="каталог бінарного сховища результату")
+    parser.add_argument("--points", type=int, default=100_000, help="точок на завдання")
+    parser.add_argument("--chunk-size", type=int, default=1 << 16, help="точок в одній частині обчислення")
+    parser.add_argument("--refine-fraction", type=float, default=0.25, help="частка точок для уточнення біля особливостей")
+    parser.add_argument("--timeout", type=float, default=60.0, help="таймаут на завдання, с")
+    args = parser.parse_args()
+
+    logger = setup_logging()
+    stats = densify(args.input, args.output, args.points, timeout=args.timeout,
+                    chunk_size=args.chunk_size, refine_fraction=args.refine_fraction)
+    logger.info(f"Щільне семплювання -> {args.output}: {dict(stats)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,183 +1,313 @@
+import os
 import json
+import itertools
+import numpy as np
 import pandas as pd
 import sympy as sp
 import collections
-from typing import List, Dict, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from .config import OP_SETS
+from .neardup import PROBE_POINTS, NearDuplicateIndex, fingerprint
 
-class DatasetAnalyzer:
-    def __init__(self, benchmark_file: str, hanging_file: str):
-        self.benchmark_file = benchmark_file
-        self.hanging_file = hanging_file
-        self.df = pd.DataFrame()
-        self.stats = {}
+# Parquet — опційно (pyarrow); без нього результат пишеться у CSV частинами
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
 
-    def load_data(self):
-        """Завантажує дані з обох файлів у єдиний DataFrame."""
-        data = []
-        
-        # Завантаження успішних
-        try:
-            with open(self.benchmark_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    item = json.loads(line)
-                    item['status'] = 'success'
-                    data.append(item)
-        except FileNotFoundError:
-            print(f"File {self.benchmark_file} not found.")
-
-        # Завантаження невдалих
-        try:
-            with open(self.hanging_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    item = json.loads(line)
-                    item['status'] = 'failed'
-                    # У hanging файлах може не бути prompt_data, додамо заглушку
-                    if 'prompt_data' not in item: item['prompt_data'] = {}
-                    data.append(item)
-        except FileNotFoundError:
-            print(f"File {self.hanging_file} not found.")
-
-        self.df = pd.DataFrame(data)
-        print(f"Завантажено: {len(self.df)} записів.")
-        
-        # Розпаковка вектора складності
-        if not self.df.empty:
-            self.df['a'] = self.df['complexity_vector'].apply(lambda x: x['a'])
-            self.df['b'] = self.df['complexity_vector'].apply(lambda x: x['b'])
-            self.df['c'] = self.df['complexity_vector'].apply(lambda x: x['c'])
+# Простий підрахунок входжень назв функцій
+OPS_TO_TRACK = ['sin', 'cos', 'tan', 'exp', 'log', 'Abs', 'floor', 'Piecewise', 'factorial', 'besselj', 'gamma', 'erf', 'zeta']
 
-    def analyze_compliance(self):
-        """
-        Перевіряє, чи відповідає формула заявленому вектору складності.
-        Повертає DataFrame з результатами аналізу.
-        """
-        results = []
-        
-        for idx, row in self.df.iterrows():
-            formula_str = row['ground_truth']['formula']
-            target_b = row['b']
-            target_c = row['c']
-            
-            # 1. Парсинг формули
-            try:
-                # real=True важливо для коректного аналізу
-                x = sp.Symbol('x', real=True)
-                expr = sp.parse_expr(formula_str, local_dict={'x': x})
-            except Exception as e:
-                results.append({'parse_error': True})
-                continue
+# Колонки результату аналізу (легкі: без prompt_data і latex)
+RESULT_COLUMNS = ['task_id', 'status', 'a', 'b', 'c', 'formula', 'parse_error', 'max_op_level', 'illegal_ops',
+                  'has_illegal_ops', 'under_complex', 'topo_mismatch', 'operator_count']
 
-            # 2. Аналіз операторів (Axis B)
-            used_atoms = expr.atoms(sp.Function, sp.Pow, sp.Add, sp.Mul)
-            max_op_level = 0
-            illegal_ops = []
-            
-            # Визначаємо реальний рівень кожного використаного оператора
-            for atom in used_atoms:
-                # atom.func повертає клас функції (наприклад, sp.sin)
-                op_type = atom.func
-                
-                found_level = -1
-                for lvl, ops in OP_SETS.items():
-                    if op_type in ops:
-                        found_level = lvl
-                        break
-                
-                if found_level > -1:
-                    max_op_level = max(max_op_level, found_level)
-                    if found_level > target_b:
-                        illegal_ops.append(str(op_type))
-            
-            # Перевірка на недостатню складність (Under-complexity)
-            # Якщо B=3, але ми використали тільки +, -, *, це B=0
-            under_complex = (max_op_level < target_b) and (target_b > 0)
-
-            # 3. Аналіз топології (Axis C) - Евристика
-            # C=0 -> має бути EmptySet сингулярностей
-            # C=2 -> НЕ має бути EmptySet
-            meta_sings = row['ground_truth'].get('properties', {}).get('singularities', [])
-            topo_mismatch = False
-            
-            if target_c == 0:
-                # Очікуємо відсутність сингулярностей
-                if meta_sings and meta_sings != ["analysis_timeout"]:
-                    topo_mismatch = True
-            elif target_c == 2:
-                # Очікуємо наявність сингулярностей
-                if not meta_sings: 
-                    topo_mismatch = True
-
-            results.append({
-                'parse_error': False,
-                'max_op_level': max_op_level,
-                'illegal_ops': illegal_ops,
-                'has_illegal_ops': len(illegal_ops) > 0,
-                'under_complex': under_complex,
-                'topo_mismatch': topo_mismatch,
-                'operator_count': len(used_atoms) # Проксі для Axis A (структурна складність)
-            })
-            
-        # Об'єднуємо результати з основним DataFrame
-        analysis_df = pd.DataFrame(results)
-        self.df = pd.concat([self.df.reset_index(drop=True), analysis_df], axis=1)
+# --- WORKER FUNCTIONS ---
 
-    def get_statistics(self):
-        """Генерує текстовий звіт."""
-        if self.df.empty:
+def _compliance(formula_str: str, target_b: int, target_c: int, meta_sings: List[str]) -> Dict[str, Any]:
+    """Перевіряє, чи відповідає одна формула заявленому вектору складності."""
+    # 1. Парсинг формули
+    try:
+        # real=True важливо для коректного аналізу
+        x = sp.Symbol('x', real=True)
+        expr = sp.parse_expr(formula_str, local_dict={'x': x})
+    except Exception:
+        return {'parse_error': True}
+
+    # 2. Аналіз операторів (Axis B)
+    used_atoms = expr.atoms(sp.Function, sp.Pow, sp.Add, sp.Mul)
+    max_op_level = 0
+    illegal_ops = []
+
+    # Визначаємо реальний рівень кожного використаного оператора
+    for atom in used_atoms:
+        # atom.func повертає клас функції (наприклад, sp.sin)
+        op_type = atom.func
+        found_level = -1
+        for lvl, ops in OP_SETS.items():
+            if op_type in ops:
+                found_level = lvl
+                break
+
+        if found_level > -1:
+            max_op_level = max(max_op_level, found_level)
+            if found_level > target_b:
+                illegal_ops.append(str(op_type))
+
+    # Перевірка на недостатню складність (Under-complexity)
+    # Якщо B=3, але ми використали тільки +, -, *, це B=0
+    under_complex = (max_op_level < target_b) and (target_b > 0)
+
+    # 3. Аналіз топології (Axis C) - Евристика
+    # C=0 -> має бути EmptySet сингулярностей
+    # C=2 -> НЕ має бути EmptySet
+    topo_mismatch = False
+    if target_c == 0:
+        # Очікуємо відсутність сингулярностей
+        if meta_sings and meta_sings != ["analysis_timeout"]:
+            topo_mismatch = True
+    elif target_c == 2:
+        # Очікуємо наявність сингулярностей
+        if not meta_sings:
+            topo_mismatch = True
+
+    return {
+        'parse_error': False,
+        'max_op_level': max_op_level,
+        'illegal_ops': illegal_ops,
+        'has_illegal_ops': len(illegal_ops) > 0,
+        'under_complex': under_complex,
+        'topo_mismatch': topo_mismatch,
+        'operator_count': len(used_atoms) # Проксі для Axis A (структурна складність)
+    }
+
+def _light_record(item: Dict[str, Any], status: str) -> Tuple:
+    """Лише поля, потрібні для аналізу (точки й latex відкидаються одразу після читання рядка)."""
+    vector = item.get('complexity_vector', {})
+    truth = item.get('ground_truth', {})
+    sings = truth.get('properties', {}).get('singularities', [])
+    return (item.get('task_id'), status, vector.get('a'), vector.get('b'), vector.get('c'), truth.get('formula', ''), sings)
+
+def _analyze_chunk(records: List[Tuple]) -> Dict[str, list]:
+    """Аналіз частини записів (у процесі пулу); повертає результат у колонковому вигляді."""
+    columns = {name: [] for name in RESULT_COLUMNS}
+    for task_id, status, a, b, c, formula, sings in records:
+        row = _compliance(formula, b, c, sings)
+        row.update(task_id=task_id, status=status, a=a, b=b, c=c, formula=formula)
+        row['illegal_ops'] = ";".join(row['illegal_ops']) if 'illegal_ops' in row else None
+        for name in RESULT_COLUMNS:
+            columns[name].append(row.get(name))
+    return columns
+
+def _fingerprint_chunk(records: List[Tuple]) -> Tuple[List[str], List[Any], np.ndarray, List[int], np.ndarray]:
+    """Числові відбитки частини записів (у процесі пулу): (клітинки, task_id, вектори, маски, (зсув, масштаб))."""
+    cells, task_ids, vectors, masks, affine = [], [], [], [], []
+    for task_id, _, a, b, c, formula, _ in records:
+        result = fingerprint(formula)
+        if result is None:
+            continue
+        vector, mask, offset, scale = result
+        cells.append(f"{a},{b},{c}")
+        task_ids.append(task_id)
+        vectors.append(vector)
+        masks.append(mask)
+        affine.append((offset, scale))
+    return (cells, task_ids, np.array(vectors, dtype=np.float32).reshape(-1, len(PROBE_POINTS)), masks,
+            np.array(affine, dtype=float).reshape(-1, 2))
+
+def _map_chunks(func, chunks: Iterator[List[Tuple]], workers: int) -> Iterator[Any]:
+    """func над частинами в пулі процесів у порядку частин; у польоті не більше 2 * workers частин."""
+    if workers <= 1:
+        yield from map(func, chunks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def iter_records(path: str, status: str, chunk_size: int) -> Iterator[List[Tuple]]:
+    """Потокове читання JSONL частинами по chunk_size легких записів."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = (line for line in f if line.strip())
+            while True:
+                chunk = [_light_record(json.loads(line), status) for line in itertools.islice(lines, chunk_size)]
+                if not chunk:
+                    return
+                yield chunk
+    except FileNotFoundError:
+        print(f"File {path} not found.")
+
+# --- RESULT ---
+
+class ComplianceSummary:
+    """Інкрементальні агрегати для звіту: пам'ять не залежить від кількості завдань."""
+    def __init__(self):
+        self.status_counts = collections.Counter()
+        self.matrix_counts = collections.Counter()   # (a, b, c) -> кількість успішних
+        self.compliance = collections.Counter()      # under_complex / has_illegal_ops / topo_mismatch серед успішних
+        self.op_stats = collections.Counter({op: 0 for op in OPS_TO_TRACK})
+
+    def update(self, columns: Dict[str, list]):
+        for i, status in enumerate(columns['status']):
+            self.status_counts[status] += 1
+            if status != 'success':
+                continue
+            self.matrix_counts[(columns['a'][i], columns['b'][i], columns['c'][i])] += 1
+            for flag in ('under_complex', 'has_illegal_ops', 'topo_mismatch'):
+                self.compliance[flag] += bool(columns[flag][i])
+            formula = columns['formula'][i]
+            for op in OPS_TO_TRACK:
+                self.op_stats[op] += formula.count(op)
+
+    def report(self) -> str:
+        total = sum(self.status_counts.values())
+        if total == 0:
             return "Немає даних для аналізу."
 
         report = []
         report.append("=== ЗВІТ АНАЛІЗАТОРА MCM-GEN ===\n")
-        
+
         # 1. Загальна статистика
-        success_count = len(self.df[self.df['status'] == 'success'])
-        fail_count = len(self.df[self.df['status'] == 'failed'])
-        report.append(f"Всього завдань: {len(self.df)}")
+        success_count = self.status_counts['success']
+        report.append(f"Всього завдань: {total}")
         report.append(f"Успішні: {success_count}")
-        report.append(f"Завислі/Помилкові: {fail_count}")
-        
+        report.append(f"Завислі/Помилкові: {self.status_counts['failed']}")
+
         if success_count == 0:
             return "\n".join(report)
 
-        # Фільтруємо тільки успішні для глибокого аналізу
-        sdf = self.df[self.df['status'] == 'success']
-
         # 2. Матриця розподілу (Heatmap у тексті)
         report.append("\n--- Розподіл завдань по матриці (A, B, C) ---")
-        matrix_counts = sdf.groupby(['a', 'b', 'c']).size().reset_index(name='count')
+        matrix_counts = pd.DataFrame([(*key, n) for key, n in self.matrix_counts.items()], columns=['a', 'b', 'c', 'count'])
         # Виводимо топ-10 найпопулярніших класів
-        top_classes = matrix_counts.sort_values('count', ascending=False).head(10)
+        top_classes = matrix_counts.sort_values(['a', 'b', 'c']).sort_values('count', ascending=False, kind='stable').head(10)
         report.append(top_classes.to_string(index=False))
 
         # 3. Аналіз валідності (Compliance)
         report.append("\n--- Аналіз відповідності вектору складності ---")
-        
-        # Under-complexity
-        under_complex_count = sdf['under_complex'].sum()
-        report.append(f"Недостатня складність (Max Op < Target B): {under_complex_count} ({under_complex_count/len(sdf)*100:.1f}%)")
-        
-        # Illegal Ops
-        illegal_ops_count = sdf['has_illegal_ops'].sum()
-        report.append(f"Використання заборонених операторів: {illegal_ops_count} ({illegal_ops_count/len(sdf)*100:.1f}%)")
-        
-        # Topology Mismatch
-        topo_fail = sdf['topo_mismatch'].sum()
-        report.append(f"Невідповідність топології (Axis C mismatch): {topo_fail} ({topo_fail/len(sdf)*100:.1f}%)")
+        labels = [('under_complex', "Недостатня складність (Max Op < Target B)"),
+                  ('has_illegal_ops', "Використання заборонених операторів"),
+                  ('topo_mismatch', "Невідповідність топології (Axis C mismatch)")]
+        for flag, label in labels:
+            count = self.compliance[flag]
+            report.append(f"{label}: {count} ({count/success_count*100:.1f}%)")
 
         # 4. Статистика операторів
         report.append("\n--- Статистика операторів ---")
-        all_formulas = " ".join(sdf['ground_truth'].apply(lambda x: x['formula']).tolist())
-        
-        # Простий підрахунок входжень назв функцій
-        ops_to_track = ['sin', 'cos', 'tan', 'exp', 'log', 'Abs', 'floor', 'Piecewise', 'factorial', 'besselj', 'gamma', 'erf', 'zeta']
-        op_stats = {op: all_formulas.count(op) for op in ops_to_track}
-        sorted_ops = sorted(op_stats.items(), key=lambda x: x[1], reverse=True)
-        
-        for op, count in sorted_ops:
+        for op, count in sorted(self.op_stats.items(), key=lambda x: x[1], reverse=True):
             report.append(f"{op}: {count}")
 
         return "\n".join(report)
 
+class ColumnarWriter:
+    """Дописує результати частинами: Parquet (row group на частину), якщо є pyarrow, інакше CSV."""
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        if self.parquet and pq is None:
+            raise ImportError("Для Parquet потрібен pyarrow (pip install pyarrow) — або вкажіть .csv")
+        self._writer = None
+        self.rows = 0
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, columns: Dict[str, list]):
+        frame = pd.DataFrame(columns, columns=RESULT_COLUMNS)
+        if self.parquet:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            frame.to_csv(self.path, mode='a', header=self.rows == 0, index=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+def default_output(stem: str = "analysis_full") -> str:
+    return f"{stem}.parquet" if pq is not None else f"{stem}.csv"
+
+# --- ANALYZER ---
+
+class DatasetAnalyzer:
+    def __init__(self, benchmark_file: str, hanging_file: str):
+        self.benchmark_file = benchmark_file
+        self.hanging_file = hanging_file
+        self.df = pd.DataFrame()
+        self.stats = {}
+        self.summary = ComplianceSummary()
+        self.near_duplicates = {}
+
+    def iter_chunks(self, chunk_size: int = 2000) -> Iterator[List[Tuple]]:
+        yield from iter_records(self.benchmark_file, 'success', chunk_size)
+        yield from iter_records(self.hanging_file, 'failed', chunk_size)
+
+    def run(self, output: Optional[str] = None, workers: int = 1, chunk_size: int = 2000) -> str:
+        """
+        Потоковий аналіз обох файлів: частини по chunk_size записів аналізуються в пулі процесів,
+        результат кожної частини одразу дописується у колонковий файл (Parquet/CSV).
+        У пам'яті — не більше 2 * workers частин і агрегати звіту. Повертає шлях до результату.
+        """
+        output = output or default_output()
+        writer = ColumnarWriter(output)
+        self.summary = ComplianceSummary()
+        try:
+            for columns in _map_chunks(_analyze_chunk, self.iter_chunks(chunk_size), workers):
+                self._consume(columns, writer)
+        finally:
+            writer.close()
+        print(f"Проаналізовано: {writer.rows} записів -> {output}")
+        return output
+
+    def find_near_duplicates(self, workers: int = 1, chunk_size: int = 2000, tol: float = 1e-5) -> Dict[str, List[dict]]:
+        """
+        Семантичні майже-дублікати серед успішних завдань: числовий відбиток кожної формули (src.neardup)
+        рахується частинами в пулі процесів, відбитки індексуються LSH без попарного порівняння.
+        Повертає групи по клітинках (A, B, C): {"a,b,c": [{"kind": "equivalent"|"affine", "tasks": [task_id, ...]}]}.
+        """
+        index = NearDuplicateIndex(tol=tol)
+        chunks = iter_records(self.benchmark_file, 'success', chunk_size)
+        for cells, task_ids, vectors, masks, affine in _map_chunks(_fingerprint_chunk, chunks, workers):
+            index.add_many(cells, task_ids, vectors, masks, affine)
+        self.near_duplicates = index.clusters()
+        self.stats["near_duplicates"] = {"fingerprinted": len(index), "comparisons": index.stats["comparisons"]}
+        return self.near_duplicates
+
+    def _consume(self, columns: Dict[str, list], writer: ColumnarWriter):
+        writer.write(columns)
+        self.summary.update(columns)
+
+    def load_data(self):
+        """Завантажує легкі записи з обох файлів у єдиний DataFrame (для невеликих наборів)."""
+        records = [record for chunk in self.iter_chunks() for record in chunk]
+        self.df = pd.DataFrame(records, columns=['task_id', 'status', 'a', 'b', 'c', 'formula', 'singularities'])
+        print(f"Завантажено: {len(self.df)} записів.")
+
+    def analyze_compliance(self):
+        """
+        Перевіряє, чи відповідає формула заявленому вектору складності (in-memory варіант run()).
+        Результати додаються колонками до DataFrame.
+        """
+        records = self.df[['task_id', 'status', 'a', 'b', 'c', 'formula', 'singularities']].itertuples(index=False, name=None)
+        columns = _analyze_chunk(list(records))
+        self.summary = ComplianceSummary()
+        self.summary.update(columns)
+        analysis_df = pd.DataFrame(columns)[RESULT_COLUMNS[6:]]
+        self.df = pd.concat([self.df.reset_index(drop=True), analysis_df], axis=1)
+
+    def get_statistics(self):
+        """Генерує текстовий звіт."""
+        return self.summary.report()
+
     def export_csv(self, filename="analysis_report.csv"):
-        self.df.to_csv(filename, index=False)
\ No newline at end of file
+        self.df.to_csv(filename, index=False)
@@ -0,0 +1,110 @@
+import os
+import json
+import collections
+import numpy as np
+from typing import Dict, Iterable, Optional
+
+# Етапи з воркерами і їхні таймаути за замовчуванням (до накопичення статистики)
+DEFAULT_TIMEOUTS = {"metadata": 5.0, "points": 3.0}
+
+class LatencyBudget:
+    """
+    Таймаути етапів для однієї клітинки з перцентилів спостережених тривалостей.
+
+    timeout = clip(multiplier * p{percentile}, min_timeout, max_factor * default).
+    Поки зразків менше min_samples, діє таймаут за замовчуванням. Таймаути записуються як
+    зразки зі значенням самого таймауту (цензуровані), тож серія зависань піднімає бюджет до стелі.
+    """
+    def __init__(self, defaults: Optional[Dict[str, float]] = None, percentile: float = 95, multiplier: float = 3.0,
+                 min_timeout: float = 1.0, max_factor: float = 2.0, min_samples: int = 5, max_samples: int = 200):
+        self.defaults = dict(defaults or DEFAULT_TIMEOUTS)
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self.max_factor = max_factor
+        self.min_samples = min_samples
+        self.samples = collections.defaultdict(lambda: collections.deque(maxlen=max_samples))
+
+    def observe(self, stage: str, seconds: float):
+        self.samples[stage].append(float(seconds))
+
+    def observe_many(self, stage: str, values: Iterable[float]):
+        for seconds in values:
+            self.observe(stage, seconds)
+
+    def timeout(self, stage: str) -> float:
+        default = self.defaults[stage]
+        values = self.samples.get(stage)
+        if values is None or len(values) < self.min_samples:
+            return default
+        estimate = self.multiplier * float(np.percentile(values, self.percentile))
+        return round(min(max(estimate, self.min_timeout), self.max_factor * default), 3)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {stage: self.timeout(stage) for stage in self.defaults}
+
+class CircuitBreaker:
+    """
+    Запобіжник клітинки: розмикається, коли частка невдач серед останніх window кандидатів
+    (що дійшли до дорогих етапів) перевищує threshold після щонайменше min_attempts спроб.
+    """
+    def __init__(self, threshold: float = 0.8, min_attempts: int = 8, window: int = 20):
+        self.threshold = threshold
+        self.min_attempts = min_attempts
+        self.outcomes = collections.deque(maxlen=window)
+
+    def record(self, failed: bool):
+        self.outcomes.append(bool(failed))
+
+    @property
+    def failure_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return len(self.outcomes) >= self.min_attempts and self.failure_rate >= self.threshold
+
+def _tail_lines(path: str, tail_bytes: int):
+    """Повні рядки з останніх tail_bytes файлу (без повного перечитування великих файлів)."""
+    if not os.path.exists(path):
+        return
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.seek(max(0, size - tail_bytes))
+        if size > tail_bytes:
+            f.readline() # перший рядок, імовірно, обрізаний
+        for raw in f:
+            if raw.endswith(b"\n"):
+                yield raw
+
+def load_history(task_path: str, failed_path: str, tail_bytes: int = 1 << 20) -> Dict[str, dict]:
+    """
+    Тривалості етапів і результати з хвостів файлів завдань і невдач попередніх запусків:
+    {"a,b,c": {"samples": {stage: [секунди]}, "tasks": n, "failures": n}}.
+    """
+    history = collections.defaultdict(lambda: {"samples": collections.defaultdict(list), "tasks": 0, "failures": 0})
+    for path, kind in ((task_path, "tasks"), (failed_path, "failures")):
+        for raw in _tail_lines(path, tail_bytes):
+            try:
+                record = json.loads(raw)
+                vector = record["complexity_vector"]
+            except (json.JSONDecodeError, KeyError):
+                continue
+            properties = record.get("ground_truth", {}).get("properties", {})
+            # Дешеві відмови пре-скринінгу не доходили до дорогих етапів — як і в CircuitBreaker, не рахуються
+            if properties.get("stage") == "prescreen":
+                continue
+            cell = history[f"{vector['a']},{vector['b']},{vector['c']}"]
+            cell[kind] += 1
+            durations = properties.get("stage_seconds", {})
+            for stage in DEFAULT_TIMEOUTS:
+                if stage in durations:
+                    cell["samples"][stage].append(durations[stage])
+    return {key: {"samples": dict(value["samples"]), "tasks": value["tasks"], "failures": value["failures"]}
+            for key, value in history.items()}
+
+def failure_rate(history_cell: Optional[dict]) -> float:
+    if not history_cell:
+        return 0.0
+    total = history_cell["tasks"] + history_cell["failures"]
+    return history_cell["failures"] / total if total else 0.0
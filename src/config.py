@@ -18,4 +18,5 @@ class ComplexityConfig:
         
         self.available_ops = []
         for i in range(b + 1):
-            self.available_ops.extend(list(OP_SETS[i]))
\ No newline at end of file
+            # Сортування за іменем: порядок множини залежить від id класів і різниться між процесами
+            self.available_ops.extend(sorted(OP_SETS[i], key=lambda op: op.__name__))
\ No newline at end of file
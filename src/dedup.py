@@ -0,0 +1,145 @@
+import os
+import json
+import struct
+import hashlib
+import functools
+from array import array
+from typing import Iterable, Optional
+import sympy as sp
+from sympy.core.operations import AssocOp
+
+# --- CANONICAL HASHING ---
+
+def _blake64(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+@functools.lru_cache(maxsize=65536)
+def _node_digest(expr) -> bytes:
+    """
+    Структурний дайджест вузла: тип + дайджести дочірніх вузлів.
+    Для комутативних асоціативних операцій (Add, Mul, And, Or, Min, Max) аргументи сортуються,
+    тому порядок побудови дерева не впливає на ключ. Припущення символів (real=True) ігноруються.
+    """
+    if isinstance(expr, sp.Symbol):
+        return _blake64(f"S:{expr.name}".encode())
+    if isinstance(expr, sp.Integer):
+        return _blake64(f"I:{int(expr)}".encode())
+    if isinstance(expr, sp.Rational):
+        return _blake64(f"Q:{expr.p}/{expr.q}".encode())
+    if isinstance(expr, sp.Float):
+        # Округлення гасить різницю точності після str() -> parse_expr()
+        return _blake64(f"F:{float(expr):.12g}".encode())
+    if not isinstance(expr, sp.Basic) or not expr.args:
+        return _blake64(f"A:{sp.srepr(expr)}".encode())
+
+    children = [_node_digest(arg) for arg in expr.args]
+    if isinstance(expr, AssocOp):
+        children.sort()
+    return _blake64(type(expr).__name__.encode() + b"(" + b"".join(children) + b")")
+
+def expression_digest(expr: sp.Expr) -> int:
+    """64-бітний канонічний ключ виразу для дедуплікації (замість str(sp.simplify(expr)))."""
+    return int.from_bytes(_node_digest(sp.sympify(expr)), "little")
+
+def formula_digest(formula: str) -> int:
+    """Ключ для рядка формули з файлу завдань (парсинг з real=True, як у воркерах)."""
+    x = sp.Symbol('x', real=True)
+    try:
+        return expression_digest(sp.parse_expr(formula, local_dict={'x': x}))
+    except Exception:
+        return int.from_bytes(_blake64(f"RAW:{formula.strip()}".encode()), "little")
+
+# --- PERSISTENT INDEX ---
+
+class DedupIndex:
+    """
+    Сайдкар-індекс 64-бітних дайджестів для JSONL-файлу завдань (<file>.idx).
+
+    Формат: 8 байт магії, uint64 — розмір JSONL, який покриває індекс, далі масив uint64 дайджестів.
+    Завантаження читає лише індекс; якщо JSONL виріс поза індексом (дописали вручну),
+    догортається тільки хвіст, а якщо зменшився — індекс перебудовується повністю.
+    """
+    MAGIC = b"MCMIDX01"
+    HEADER = struct.Struct("<8sQ")
+
+    def __init__(self, data_path: str, index_path: Optional[str] = None):
+        self.data_path = data_path
+        self.index_path = index_path or data_path + ".idx"
+        self.digests = set()
+        self.covered = 0
+        self.load()
+
+    def __contains__(self, digest: int) -> bool:
+        return digest in self.digests
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    def _data_size(self) -> int:
+        return os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+
+    def load(self):
+        data_size = self._data_size()
+        values = array("Q")
+        covered = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                header = f.read(self.HEADER.size)
+                if len(header) == self.HEADER.size:
+                    magic, covered = self.HEADER.unpack(header)
+                    if magic == self.MAGIC and covered <= data_size:
+                        payload = f.read()
+                        values.frombytes(payload[:len(payload) - len(payload) % values.itemsize])
+                    else:
+                        covered = 0
+
+        self.digests = set(values)
+        self.covered = covered
+
+        if covered == 0:
+            self._rewrite()
+        if self.covered < data_size:
+            self._catch_up()
+
+    def _rewrite(self):
+        with open(self.index_path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.covered))
+            array("Q", self.digests).tofile(f)
+
+    def _catch_up(self):
+        """Індексує рядки JSONL, дописані після останнього оновлення індексу."""
+        new = []
+        with open(self.data_path, "rb") as f:
+            f.seek(self.covered)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break # недописаний рядок не індексуємо
+                self.covered += len(raw)
+                try:
+                    formula = json.loads(raw).get("ground_truth", {}).get("formula", "")
+                except json.JSONDecodeError:
+                    continue
+                if formula:
+                    new.append(formula_digest(formula))
+        self._append(new)
+
+    def _append(self, digests: Iterable[int]):
+        fresh = []
+        for d in digests:
+            if d not in self.digests:
+                self.digests.add(d)
+                fresh.append(d)
+        with open(self.index_path, "r+b") as f:
+            f.seek(0, os.SEEK_END)
+            array("Q", fresh).tofile(f)
+            f.seek(0)
+            f.write(self.HEADER.pack(self.MAGIC, self.covered))
+
+    def add(self, digest: int):
+        """Реєструє дайджест рядка, щойно дописаного до data_path (викликати після append_to_file)."""
+        self.add_many([digest])
+
+    def add_many(self, digests: Iterable[int]):
+        """Реєструє дайджести пакета рядків, щойно дописаного до data_path одним записом."""
+        self.covered = self._data_size()
+        self._append(digests)
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import logging
+import collections
+import numpy as np
+import sympy as sp
+from typing import Any, Callable, Dict, Iterator, Tuple
+from .evaluator import SAMPLE_RANGE, Y_BOUND, CompiledEvaluator
+from .storage import INDEX_FILE, BinaryTaskStore
+from .utils import time_limit, TimeLimitExceeded
+
+class DenseSampler:
+    """
+    Семплювання з високою роздільністю (10^5..10^7 точок) фіксованими частинами.
+
+    Пам'ять обмежена розміром частини: значення пишуться прямо у вихідні масиви x/y
+    (звичайні або np.memmap, напр. BinaryTaskStore.append_stream).
+      1. Базова рівномірна сітка з (1 - refine_fraction) * n точок обчислюється частинами
+         й пишеться на початок y; водночас рахуються оцінки інтервалів: |Δy| між сусідами,
+         а межа скінченне/замасковане значення (полюс, розрив області) — найвищий пріоритет.
+         Зберігаються лише max_intervals найкращих інтервалів.
+      2. Залишок точок розподіляється між ними пропорційно sqrt(оцінки) (рівномірно всередині інтервалу).
+      3. Базові значення переносяться на фінальні позиції з кінця (позиції лише зростають, тож
+         непрочитане не перезаписується), уточнювальні точки обчислюються частинами у проміжки.
+    Результат відсортований за x. Політика меж (_check_points) застосовується до кожної частини як маска:
+    нескінченні та |y| > y_bound значення стають NaN замість відкидання всього завдання.
+    """
+    def __init__(self, n_points: int, x_range: Tuple[float, float] = SAMPLE_RANGE, chunk_size: int = 1 << 16,
+                 refine_fraction: float = 0.25, max_intervals: int = 4096, y_bound: float = Y_BOUND,
+                 max_masked: float = 0.99):
+        self.n_points = n_points
+        self.x_range = x_range
+        self.chunk_size = chunk_size
+        self.n_refine = int(n_points * refine_fraction) if n_points >= 4 else 0
+        self.n_base = n_points - self.n_refine
+        self.step = (x_range[1] - x_range[0]) / (self.n_base - 1) if self.n_base > 1 else 0.0
+        self.max_intervals = max_intervals
+        self.y_bound = y_bound
+        self.max_masked = max_masked
+
+    def _base_x(self, start: int, stop: int) -> np.ndarray:
+        return self.x_range[0] + np.arange(start, stop) * self.step
+
+    def _evaluate(self, func: Callable, x_vals: np.ndarray) -> np.ndarray:
+        """Обчислення частини з маскою замість винятку (та сама політика меж, що й _check_points)."""
+        with np.errstate(all='ignore'):
+            try:
+                y_vals = np.array(np.broadcast_to(func(x_vals), x_vals.shape), dtype=float)
+            except (TypeError, ValueError, ZeroDivisionError, OverflowError):
+                # Частина, яку не вдалося обчислити векторно, маскується цілком
+                return np.full(x_vals.shape, np.nan)
+            y_vals[~np.isfinite(y_vals) | (np.abs(y_vals) > self.y_bound)] = np.nan
+        return y_vals
+
+    def _keep_top(self, idx, scores, new_idx, new_scores):
+        idx, scores = np.concatenate([idx, new_idx]), np.concatenate([scores, new_scores])
+        if len(idx) > self.max_intervals:
+            top = np.argpartition(scores, -self.max_intervals)[-self.max_intervals:]
+            idx, scores = idx[top], scores[top]
+        return idx, scores
+
+    def _allocate(self, idx: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Кількість уточнювальних точок на інтервал (сума рівно n_refine); інтервали — за зростанням."""
+        if self.n_refine == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        finite = np.isfinite(scores)
+        if np.any(~finite):
+            # Межа маски: вага як у найкрутішого скінченного інтервалу (але не менше 1)
+            scores = np.where(finite, scores, max(float(scores[finite].max(initial=0.0)), 1.0))
+        keep = scores > 0
+        # sqrt згладжує розподіл: полюс не забирає весь залишок, пологі ділянки теж уточнюються
+        idx, weights = idx[keep], np.sqrt(scores[keep])
+        if len(idx) == 0:
+            # Рівна функція: уточнення розподіляється рівномірно
+            idx = np.unique(np.linspace(0, self.n_base - 2, min(self.max_intervals, self.n_base - 1)).astype(np.int64))
+            weights = np.ones(len(idx))
+        order = np.argsort(idx)
+        idx, weights = idx[order], weights[order]
+        share = self.n_refine * weights / weights.sum()
+        counts = np.floor(share).astype(np.int64)
+        remainder = self.n_refine - counts.sum()
+        if remainder:
+            counts[np.argsort(counts - share)[:remainder]] += 1
+        return idx[counts > 0], counts[counts > 0]
+
+    def sample(self, func: Callable, x_out: np.ndarray, y_out: np.ndarray) -> Dict[str, float]:
+        """Заповнює x_out/y_out (довжини n_points); повертає статистику. ValueError — якщо замасковано майже все."""
+        start_time = time.perf_counter()
+        n_base, chunk = self.n_base, self.chunk_size
+        idx, scores = np.empty(0, dtype=np.int64), np.empty(0)
+        prev = None
+
+        # 1. Базова сітка -> y_out[:n_base] + найкращі інтервали
+        for start in range(0, n_base, chunk):
+            stop = min(start + chunk, n_base)
+            y_vals = self._evaluate(func, self._base_x(start, stop))
+            y_out[start:stop] = y_vals
+            joined = y_vals if prev is None else np.concatenate([[prev], y_vals])
+            if len(joined) > 1:
+                a, b = joined[:-1], joined[1:]
+                with np.errstate(invalid='ignore'):
+                    delta = np.abs(b - a)
+                boundary = np.isnan(a) != np.isnan(b)
+                delta[boundary] = np.inf
+                delta[np.isnan(delta)] = 0.0
+                first = start - (prev is not None)
+                idx, scores = self._keep_top(idx, scores, np.arange(first, first + len(delta)), delta)
+            prev = y_vals[-1]
+
+        # 2. Розподіл уточнювальних точок
+        idx, counts = self._allocate(idx, scores)
+        cumulative = np.cumsum(counts)
+
+        def inserted_before(positions):
+            k = np.searchsorted(idx, positions, side='left')
+            return np.where(k > 0, cumulative[np.maximum(k - 1, 0)], 0)
+
+        # 3а. Перенесення базових значень на фінальні позиції (з кінця)
+        for start in reversed(range(0, n_base, chunk)):
+            stop = min(start + chunk, n_base)
+            js = np.arange(start, stop)
+            y_vals = np.array(y_out[start:stop])
+            target = js + inserted_before(js)
+            x_out[target] = self._base_x(start, stop)
+            y_out[target] = y_vals
+
+        # 3б. Уточнювальні точки частинами: інтервал j отримує позиції одразу після базової точки j
+        first_slot = idx + 1 + inserted_before(idx)
+        i, offset = 0, 0       # поточний інтервал і скільки його точок уже оброблено
+        while i < len(idx):
+            take_idx, take_k = [], []
+            budget = chunk
+            while i < len(idx) and budget > 0:
+                m = int(counts[i])
+                k = min(m - offset, budget)
+                take_idx.append(i)
+                take_k.append((offset, offset + k))
+                budget -= k
+                offset += k
+                if offset == m:
+                    i, offset = i + 1, 0
+            ks = np.concatenate([np.arange(lo, hi) for lo, hi in take_k])
+            owners = np.repeat(np.array(take_idx), [hi - lo for lo, hi in take_k])
+            m_vals = counts[owners]
+            x_vals = self.x_range[0] + (idx[owners] + (ks + 1) / (m_vals + 1)) * self.step
+            slots = first_slot[owners] + ks
+            x_out[slots] = x_vals
+            y_out[slots] = self._evaluate(func, x_vals)
+
+        masked = 0
+        for start in range(0, self.n_points, chunk):
+            masked += int(np.isnan(y_out[start:start + chunk]).sum())
+        if masked > self.max_masked * self.n_points:
+            raise ValueError("Values out of bounds")
+        return {"n": self.n_points, "masked": masked, "refined": int(counts.sum()), "refine_intervals": len(idx),
+                "seconds": round(time.perf_counter() - start_time, 3)}
+
+def _iter_tasks(path: str) -> Iterator[Dict[str, Any]]:
+    """Завдання з JSONL або з індексу бінарного сховища (точки не потрібні — лише формула й вектор)."""
+    index = os.path.join(path, INDEX_FILE) if os.path.isdir(path) else path
+    with open(index, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def densify(input_path: str, output_root: str, n_points: int, timeout: float = 60.0, **sampler_kwargs) -> collections.Counter:
+    """
+    Переносить завдання (JSONL або бінарне сховище) у нове бінарне сховище з n_points точок на завдання.
+    Точки пишуться частинами прямо в memmap points.f64; статистика DenseSampler — у полі "dense" індексу.
+    Уже перенесені task_id пропускаються (можна продовжити обірваний запуск).
+    """
+    logger = logging.getLogger("MCM-Gen")
+    store = BinaryTaskStore(output_root)
+    done = {entry.get("task_id") for entry in _iter_tasks(output_root)} if len(store) else set()
+    sampler = DenseSampler(n_points, **sampler_kwargs)
+    x = sp.Symbol('x', real=True)
+    stats = collections.Counter()
+    for task in _iter_tasks(input_path):
+        if task.get("task_id") in done:
+            stats["skipped"] += 1
+            continue
+        formula = task["ground_truth"]["formula"]
+        try:
+            evaluator = CompiledEvaluator(sp.parse_expr(formula, local_dict={'x': x}))
+            with time_limit(timeout):
+                store.append_stream(task, n_points, lambda xs, ys: {"dense": sampler.sample(evaluator, xs, ys)})
+            stats["tasks"] += 1
+        except TimeLimitExceeded:
+            logger.warning(f"TIMEOUT Dense: {formula}")
+            stats["timeout"] += 1
+        except Exception as e:
+            logger.warning(f"Dense {formula}: {e}")
+            stats["failed"] += 1
+    return stats
@@ -0,0 +1,256 @@
+import math
+import logging
+import threading
+import collections
+import mpmath
+import numpy as np
+import sympy as sp
+from typing import Dict, Optional, Tuple
+from .dedup import expression_digest
+
+# scipy — у requirements.txt; без нього спецфункції рахуються поелементно через mpmath (повільно, але коректно)
+try:
+    import scipy.special as special
+except ImportError:
+    special = None
+
+# Політика семплювання, спільна для воркера точок, пре-скринінгу та валідатора
+SAMPLE_RANGE = (-3, 3)
+Y_BOUND = 5000
+
+# Спецфункції (OP_SETS[2]/[3]), для яких швидкий шлях може дати nan/inf там, де значення існує
+SPECIAL_FUNCS = (sp.gamma, sp.loggamma, sp.erf, sp.erfc, sp.besselj, sp.zeta, sp.factorial)
+# Скільки точок одного обчислення можна перерахувати через mpmath (поелементно)
+MPMATH_FALLBACK_POINTS = 256
+
+def _mp_real(value) -> float:
+    """mpmath-значення -> float; комплексне з ненульовою уявною частиною -> nan."""
+    if isinstance(value, mpmath.mpc):
+        if value.imag != 0:
+            return math.nan
+        value = value.real
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def _mp_factorial(n):
+    n = mpmath.floor(n)
+    return mpmath.factorial(n) if n >= 0 else mpmath.nan
+
+def _mp_vectorized(func):
+    return np.vectorize(lambda *args: _mp_real(func(*args)), otypes=[float])
+
+def _factorial(n):
+    """Factorial за floor(n) (крок на кожному цілому), nan для від'ємних."""
+    n = np.floor(np.asarray(n, dtype=float))
+    with np.errstate(invalid='ignore'):
+        return np.where(n >= 0, special.gamma(np.maximum(n, 0) + 1), np.nan)
+
+_fallback_warned = False
+
+def _warn_mpmath_fallback():
+    global _fallback_warned
+    if not _fallback_warned:
+        _fallback_warned = True
+        logging.getLogger("MCM-Gen").warning(
+            "scipy не встановлено: спецфункції рахуються поелементно через mpmath (повільно); pip install scipy")
+
+def _special_functions() -> Dict[str, object]:
+    """Векторизовані реалізації спецфункцій: ufunc-и scipy.special або (без scipy) mpmath поелементно."""
+    if special is not None:
+        return {'gamma': special.gamma, 'loggamma': special.gammaln, 'erf': special.erf, 'erfc': special.erfc,
+                'besselj': special.jv, 'zeta': special.zeta, 'factorial': _factorial}
+    _warn_mpmath_fallback()
+    return {'gamma': _mp_vectorized(mpmath.gamma), 'loggamma': _mp_vectorized(mpmath.loggamma),
+            'erf': _mp_vectorized(mpmath.erf), 'erfc': _mp_vectorized(mpmath.erfc),
+            'besselj': _mp_vectorized(mpmath.besselj), 'zeta': _mp_vectorized(mpmath.zeta),
+            'factorial': _mp_vectorized(_mp_factorial)}
+
+def safe_modules():
+    """Модулі для lambdify: спецфункції (scipy.special / mpmath) + numpy."""
+    return [_special_functions(), 'numpy']
+
+def has_special(expr: sp.Expr) -> bool:
+    return expr.has(*SPECIAL_FUNCS)
+
+def _fallback_points(x_vals: np.ndarray, y_vals, max_points: int) -> Optional[np.ndarray]:
+    """Індекси точок з nan/inf (None — немає або більше max_points: ймовірно, справжня особливість)."""
+    y_vals = np.asarray(y_vals)
+    if y_vals.shape != np.shape(x_vals) or np.iscomplexobj(y_vals):
+        return None
+    with np.errstate(invalid='ignore'):
+        bad = np.flatnonzero(~np.isfinite(y_vals))
+    return bad if 0 < len(bad) <= max_points else None
+
+def mpmath_fallback(func, x_vals: np.ndarray, y_vals, max_points: int = MPMATH_FALLBACK_POINTS):
+    """Перераховує скалярною mpmath-функцією лише точки, де швидкий шлях дав nan/inf (переповнення, гілки scipy)."""
+    bad = _fallback_points(x_vals, y_vals, max_points)
+    if bad is None:
+        return y_vals
+    y_vals = np.asarray(y_vals).astype(float, copy=True)
+    for i in bad:
+        try:
+            y_vals[i] = _mp_real(func(mpmath.mpf(float(x_vals[i]))))
+        except (ValueError, ZeroDivisionError, OverflowError, TypeError):
+            pass
+    return y_vals
+
+def _free_x(expr: sp.Expr) -> sp.Symbol:
+    """Символ x саме з виразу (real=True чи без припущень), щоб lambdify не залишив його вільним."""
+    for sym in expr.free_symbols:
+        if sym.name == 'x':
+            return sym
+    return sp.Symbol('x', real=True)
+
+def mpmath_function(expr: sp.Expr):
+    """Скалярна mpmath-функція виразу (з тим самим floor-factorial, що й швидкий шлях)."""
+    return sp.lambdify(_free_x(expr), expr, modules=[{'factorial': _mp_factorial}, 'mpmath'])
+
+class CompiledEvaluator:
+    """
+    Скомпільований numpy-обчислювач одного виразу.
+    Спецфункції йдуть через ufunc-и scipy.special; точки, де вони дали nan/inf, перераховуються mpmath.
+    mpmath не має дедлайну (одна точка besselj може рахуватися секундами), тож in-process обчислювачі
+    (EvaluatorCache) створюються з use_mpmath=False. Піклиться як сам вираз SymPy: у воркері функція
+    перекомпільовується ліниво при першому виклику, а mpmath-fallback увімкнено (його обмежує таймаут пулу).
+    """
+    __slots__ = ("expr", "digest", "use_mpmath", "_func", "_mp")
+
+    def __init__(self, expr: sp.Expr, digest: Optional[int] = None, use_mpmath: bool = True):
+        self.expr = expr
+        self.digest = expression_digest(expr) if digest is None else digest
+        self.use_mpmath = use_mpmath
+        self._func = None
+        self._mp = None
+
+    def __call__(self, x_vals: np.ndarray) -> np.ndarray:
+        if self._func is None:
+            self._func = sp.lambdify(_free_x(self.expr), self.expr, modules=safe_modules())
+        return self.fallback(x_vals, self._func(x_vals))
+
+    def fallback(self, x_vals: np.ndarray, y_vals):
+        """mpmath для окремих nan/inf точок — лише у виразах зі спецфункціями; компілюється при першій потребі."""
+        if not self.use_mpmath:
+            return y_vals
+        if self._mp is None:
+            self._mp = has_special(self.expr)
+        if self._mp is False:
+            return y_vals
+        if self._mp is True:
+            if _fallback_points(x_vals, y_vals, MPMATH_FALLBACK_POINTS) is None:
+                return y_vals
+            self._mp = mpmath_function(self.expr)
+        return mpmath_fallback(self._mp, x_vals, y_vals)
+
+    def __getstate__(self):
+        return (self.expr, self.digest)
+
+    def __setstate__(self, state):
+        self.expr, self.digest = state
+        self.use_mpmath = True
+        self._func = None
+        self._mp = None
+
+class EvaluatorCache:
+    """
+    LRU-кеш скомпільованих обчислювачів за канонічним ключем виразу (expression_digest)
+    разом зі спільним контекстом обчислень: значення на іменованих сітках ("sample", "validate"),
+    пораховані одним етапом (гейт, валідатор), перевикористовуються іншими (семплер).
+
+    Обчислювачі кешу — без mpmath-fallback (use_mpmath=False): значення з nan/inf у спецфункціях
+    перевіряє вже воркер точок під таймаутом.
+    stats: hits / misses / evictions обчислювачів, grid_hits / grid_misses значень на сітках.
+    Піклиться разом із накопиченими значеннями — можна передати вже наповнений кеш у воркер.
+    """
+    def __init__(self, maxsize: int = 1024, grids: Optional[Dict[str, Tuple[float, float, int]]] = None):
+        self.maxsize = maxsize
+        self.grids = dict(grids or {"sample": (*SAMPLE_RANGE, 25), "validate": (-5, 5, 50)})
+        self._entries = collections.OrderedDict()   # digest -> CompiledEvaluator
+        self._values = {}                           # digest -> {grid_name: y}
+        self._grid_cache = {}
+        self._lock = threading.Lock()
+        self.stats = collections.Counter()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def grid(self, name: str) -> np.ndarray:
+        x_vals = self._grid_cache.get(name)
+        if x_vals is None:
+            x_vals = np.linspace(*self.grids[name])
+            self._grid_cache[name] = x_vals
+        return x_vals
+
+    def register_grid(self, name: str, start: float, stop: float, n: int) -> str:
+        self.grids[name] = (start, stop, n)
+        self._grid_cache.pop(name, None)
+        return name
+
+    def get(self, expr: sp.Expr, digest: Optional[int] = None) -> CompiledEvaluator:
+        digest = expression_digest(expr) if digest is None else digest
+        with self._lock:
+            evaluator = self._entries.get(digest)
+            if evaluator is not None:
+                self._entries.move_to_end(digest)
+                self.stats["hits"] += 1
+                return evaluator
+            self.stats["misses"] += 1
+            evaluator = CompiledEvaluator(expr, digest, use_mpmath=False)
+            self._entries[digest] = evaluator
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                self._values.pop(evicted, None)
+                self.stats["evictions"] += 1
+        return evaluator
+
+    def cached_values(self, expr: sp.Expr, grid_name: str, digest: Optional[int] = None) -> Optional[np.ndarray]:
+        """Значення, вже пораховані на сітці будь-яким етапом (None, якщо ще не рахувалися)."""
+        digest = expression_digest(expr) if digest is None else digest
+        y_vals = self._values.get(digest, {}).get(grid_name)
+        if y_vals is not None:
+            self.stats["grid_hits"] += 1
+        return y_vals
+
+    def store(self, expr: sp.Expr, grid_name: str, y_vals: np.ndarray, digest: Optional[int] = None):
+        """Кладе значення, пораховані поза кешем (наприклад, пакетно), у спільний контекст."""
+        evaluator = self.get(expr, digest)
+        with self._lock:
+            if evaluator.digest in self._entries:
+                self._values.setdefault(evaluator.digest, {})[grid_name] = y_vals
+
+    def evaluate(self, expr: sp.Expr, grid_name: str, digest: Optional[int] = None) -> np.ndarray:
+        """
+        Обчислює вираз на іменованій сітці (сирий результат numpy, може бути комплексним чи скаляром).
+        Винятки обчислення прокидаються викликачу; у контекст потрапляє лише успішний результат.
+        """
+        evaluator = self.get(expr, digest)
+        values = self._values.get(evaluator.digest, {})
+        if grid_name in values:
+            self.stats["grid_hits"] += 1
+            return values[grid_name]
+        self.stats["grid_misses"] += 1
+        with np.errstate(all='ignore'):
+            y_vals = evaluator(self.grid(grid_name))
+        with self._lock:
+            if evaluator.digest in self._entries:
+                self._values.setdefault(evaluator.digest, {})[grid_name] = y_vals
+        return y_vals
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+_default_cache: Optional[EvaluatorCache] = None
+
+def get_evaluator_cache() -> EvaluatorCache:
+    """Спільний кеш процесу для валідатора, пре-скринінгу, семплера та аналізатора."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = EvaluatorCache()
+    return _default_cache
@@ -0,0 +1,243 @@
+import json
+import hashlib
+import functools
+import collections
+import numpy as np
+import sympy as sp
+from typing import Dict, Iterable, List, Optional, Tuple
+from . import ir
+from .budget import _tail_lines
+from .evaluator import CompiledEvaluator
+from .generator import C2_POLES
+
+# Коди причин невдач, з яких можна вчитися (решта — помилки середовища на кшталт "name 'zeta' is not defined")
+NUMERIC_CODES = frozenset({"non_finite", "complex_valued", "out_of_bounds"})
+# Старі записи hanging_functions.jsonl: текст помилки воркера -> код
+LEGACY_ERRORS = {"Values out of bounds or non-finite": "non_finite", "Values out of bounds": "out_of_bounds",
+                 "Timeout": "timeout"}
+
+def failure_reason(properties: Dict) -> Tuple[str, str]:
+    """(етап, код причини) запису невдачі; записи без етапу — невдачі воркера точок."""
+    error = str(properties.get("error", ""))
+    code = error if error in NUMERIC_CODES else LEGACY_ERRORS.get(error, "eval_error")
+    return properties.get("stage", "points"), code
+
+# --- SUBTREE KEYS ---
+
+def _hash(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+def _number_key(value: float) -> bytes:
+    # 0.5 і Rational(1, 2) (sqrt у старих записах) — один ключ
+    return _hash(f"N:{value:.12g}".encode())
+
+def _node_key(name: str, children: List[bytes]) -> bytes:
+    return _hash(name.encode() + b"(" + b"".join(children) + b")")
+
+@functools.lru_cache(maxsize=65536)
+def _expr_key(expr) -> bytes:
+    """Структурний ключ піддерева SymPy: як dedup._node_digest, але числа зводяться до float."""
+    if isinstance(expr, sp.Symbol):
+        return _hash(f"S:{expr.name}".encode())
+    if isinstance(expr, sp.Number):
+        try:
+            return _number_key(float(expr))
+        except TypeError:
+            pass
+    if not expr.args:
+        return _hash(f"A:{sp.srepr(expr)}".encode())
+    children = [_expr_key(arg) for arg in expr.args]
+    if isinstance(expr, (sp.Add, sp.Mul)):
+        children.sort()
+    return _node_key(type(expr).__name__, children)
+
+def expr_subtrees(expr: sp.Expr, max_nodes: int) -> List[Tuple[bytes, sp.Expr]]:
+    """Піддерева з x розміром від 2 до max_nodes вузлів: (ключ, піддерево)."""
+    found = []
+
+    def walk(node) -> Tuple[int, bool]:
+        size, has_x = 1, isinstance(node, sp.Symbol)
+        for arg in node.args:
+            child_size, child_x = walk(arg)
+            size += child_size
+            has_x = has_x or child_x
+        if has_x and 2 <= size <= max_nodes:
+            found.append((_expr_key(node), node))
+        return size, has_x
+
+    walk(expr)
+    return found
+
+_X_KEY = _hash(b"S:x")
+_TRUE_KEY = _hash(f"A:{sp.srepr(sp.true)}".encode())
+
+def ir_subtree_keys(tree: ir.ExprIR, max_nodes: int) -> List[bytes]:
+    """
+    Ключі піддерев ExprIR з x (до max_nodes вузлів) у тій самій схемі, що й _expr_key для дерева SymPy
+    (Add/Mul сплощуються й сортуються). Автоспрощення SymPy (x*x -> x**2, 2*(x+1) -> 2*x + 2) не
+    відтворюється, тож збіг — лише для структурно тих самих піддерев.
+    """
+    found = []
+    stack = []   # (ключ, розмір, є x, опкод, сплощені ключі Add/Mul)
+    for i in range(len(tree.ops) - 1, -1, -1):
+        op, const = tree.ops[i], tree.consts[i]
+        if op == ir.X:
+            item = (_X_KEY, 1, True, op, None)
+        elif op == ir.CONST:
+            item = (_number_key(const), 1, False, op, None)
+        elif op in (ir.ADD, ir.MUL):
+            parts, size, has_x = [], 1, False
+            for child in (stack.pop(), stack.pop()):
+                if child[3] == op:
+                    parts.extend(child[4])
+                    size += child[1] - 1
+                else:
+                    parts.append(child[0])
+                    size += child[1]
+                has_x = has_x or child[2]
+            item = (_node_key("Add" if op == ir.ADD else "Mul", sorted(parts)), size, has_x, op, parts)
+        else:
+            # Розмір рахується, як у expr_subtrees: разом із листками-параметрами та вузлами умов Piecewise
+            key, size, has_x, _, _ = stack.pop()
+            if op == ir.POW:
+                key, size = _node_key("Pow", [key, _number_key(const)]), size + 2
+            elif op == ir.BESSELJ:
+                key, size = _node_key("besselj", [_number_key(const), key]), size + 2
+            elif op in (ir.PIECEWISE_ZERO, ir.PIECEWISE_NEG):
+                if op == ir.PIECEWISE_ZERO:
+                    other, other_size = _number_key(0), 1
+                else:
+                    other, other_size = _node_key("Mul", sorted([_number_key(-1), key])), size + 2
+                cond = _node_key("StrictGreaterThan", [_X_KEY, _number_key(const)])
+                key = _node_key("Piecewise", [_node_key("ExprCondPair", [key, cond]),
+                                              _node_key("ExprCondPair", [other, _TRUE_KEY])])
+                size, has_x = size + other_size + 7, True
+            else:
+                key, size = _node_key(ir.UNARY[op].__name__, [key]), size + 1
+            item = (key, size, has_x, op, None)
+        stack.append(item)
+        if item[2] and 2 <= item[1] <= max_nodes:
+            found.append(item[0])
+    return found
+
+@functools.lru_cache(maxsize=1)
+def _wrapper_keys() -> frozenset:
+    """
+    Обгортки, які ExpressionGenerator додає під вісь C (x - p і 1/(x - p) для C=2, k*x і sin/cos(k*x)
+    для C=1): вони є в кожному кандидаті клітинки, тож їхня частота в невдачах нічого не означає.
+    Цілі полюси — з записів до C2_POLES.
+    """
+    x = sp.Symbol('x', real=True)
+    poles = [*range(-2, 3), *C2_POLES]
+    wrappers = [part for p in poles for part in (x - p, 1 / (x - p))]
+    wrappers += [part for k in range(1, 4) for part in (k * x, sp.sin(k * x), sp.cos(k * x))]
+    return frozenset(_expr_key(part) for part in wrappers if part != x)
+
+def _self_fatal(sub: sp.Expr) -> bool:
+    """Піддерево саме по собі не проходить межі точок на сітці семплювання (полюс, межа області, переповнення)."""
+    evaluator = CompiledEvaluator(sub, use_mpmath=False)
+
+    def evaluate(x_vals):
+        y_vals = np.asarray(evaluator(x_vals))
+        if np.iscomplexobj(y_vals):
+            y_vals = np.where(np.imag(y_vals) == 0, np.real(y_vals), np.nan)
+        return np.broadcast_to(y_vals.astype(float), x_vals.shape)
+
+    return ir.grid_verdict(evaluate) != ir.PASS
+
+class FailureKnowledge:
+    """
+    Чорний список піддерев, вивчений з hanging_functions.jsonl: ключ піддерева -> (етап, код причини).
+
+    Піддерево з числовою причиною потрапляє до списку, якщо воно є щонайменше в min_support невдачах
+    з тим самим кодом, жодного разу не трапилося серед успішних завдань і саме по собі не проходить
+    межі точок на сітці семплювання. Обгортки осі C (_wrapper_keys) не вивчаються ніколи. Таймаути
+    не вивчаються: вони залежать від бюджету, з яким сталися (повтор із більшим бюджетом — справа
+    адаптивних таймаутів і кешу метаданих), а повтор тієї самої формули вже відсікає дедуплікація невдач.
+    Кандидат, що містить таке піддерево, генератор і валідатор відкидають до будь-якого воркера.
+    hits — влучання за (етап, код), для звіту.
+    """
+    def __init__(self, min_support: int = 2, max_nodes: int = 12):
+        self.min_support = min_support
+        self.max_nodes = max_nodes
+        self.entries: Dict[bytes, Tuple[str, str]] = {}
+        self.formulas: Dict[bytes, str] = {}
+        self.hits = collections.Counter()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @classmethod
+    def from_files(cls, failed_path: str, tasks_path: Optional[str] = None, tail_bytes: int = 4 << 20,
+                   **kwargs) -> "FailureKnowledge":
+        """Невдачі читаються повністю, успішні завдання — лише хвіст tail_bytes (контрприклади)."""
+        def formulas(path, limit):
+            for raw in _tail_lines(path, limit):
+                try:
+                    truth = json.loads(raw)["ground_truth"]
+                    yield truth["formula"], truth.get("properties", {})
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+
+        knowledge = cls(**kwargs)
+        successes = (formula for formula, _ in formulas(tasks_path, tail_bytes)) if tasks_path else ()
+        knowledge.learn(formulas(failed_path, 1 << 62), successes)
+        return knowledge
+
+    def learn(self, failures: Iterable[Tuple[str, Dict]], successes: Iterable[str]):
+        x = sp.Symbol('x', real=True)
+
+        def parse(formula):
+            try:
+                return sp.parse_expr(formula, local_dict={'x': x})
+            except Exception:
+                return None
+
+        support = collections.Counter()                           # (ключ, код) -> невдач
+        stages = collections.defaultdict(collections.Counter)     # (ключ, код) -> етап -> невдач
+        examples = {}
+        for formula, properties in failures:
+            stage, code = failure_reason(properties)
+            expr = parse(formula) if code in NUMERIC_CODES else None
+            if expr is None:
+                continue
+            for key, sub in dict(expr_subtrees(expr, self.max_nodes)).items():
+                support[(key, code)] += 1
+                stages[(key, code)][stage] += 1
+                examples.setdefault(key, sub)
+        seen_ok = set()
+        for formula in successes:
+            expr = parse(formula)
+            if expr is not None:
+                seen_ok.update(key for key, _ in expr_subtrees(expr, self.max_nodes))
+
+        for (key, code), count in support.most_common():
+            if count < self.min_support or key in seen_ok or key in self.entries or key in _wrapper_keys():
+                continue
+            if not _self_fatal(examples[key]):
+                continue
+            self.entries[key] = (stages[(key, code)].most_common(1)[0][0], code)
+            self.formulas[key] = str(examples[key])
+
+    def _hit(self, keys: Iterable[bytes], codes: Optional[Iterable[str]]) -> Optional[Tuple[str, str]]:
+        for key in keys:
+            reason = self.entries.get(key)
+            if reason is not None and (codes is None or reason[1] in codes):
+                self.hits[reason] += 1
+                return reason
+        return None
+
+    def match(self, expr: sp.Expr, codes: Optional[Iterable[str]] = None) -> Optional[Tuple[str, str]]:
+        """(етап, код) першого відомого фатального піддерева виразу SymPy або None; codes — лише ці коди."""
+        if not self.entries:
+            return None
+        return self._hit((key for key, _ in expr_subtrees(expr, self.max_nodes)), codes)
+
+    def match_ir(self, tree: ir.ExprIR, codes: Optional[Iterable[str]] = None) -> Optional[Tuple[str, str]]:
+        """Те саме для сирого ExprIR (до побудови SymPy-дерева)."""
+        if not self.entries:
+            return None
+        return self._hit(ir_subtree_keys(tree, self.max_nodes), codes)
+
+    def summary(self) -> Dict[str, int]:
+        return {f"{stage}:{code}": n for (stage, code), n in self.hits.items()}
@@ -1,31 +1,64 @@
+import time
 import random
+import collections
 import sympy as sp
+from typing import Optional
 from .config import ComplexityConfig, OP_SETS
+from .simplifier import TieredSimplifier
+from . import ir
+
+# Полюси обгортки C=2 (tree / (x - p)): поза вузлами сітки семплювання linspace(-3, 3, 25), як x - 1.2
+# у ручних формулах — інакше кожен кандидат дає inf у точці полюса і гейт відкидає його як non_finite
+C2_POLES = (-1.8, -0.8, 0.2, 1.2, 2.2)
 
 class ExpressionGenerator:
-    def __init__(self, config: ComplexityConfig):
+    def __init__(self, config: ComplexityConfig, rng: Optional[random.Random] = None, simplify_mode: str = "tiered",
+                 construction: str = "constructive", max_const: int = 50, metrics=None, blacklist=None):
         self.config = config
+        # Опційно PipelineMetrics: латентність етапів simplify/verify і причини відкидання дерев
+        self.metrics = metrics
+        self.cell = f"{config.a},{config.b},{config.c}"
+        # Власний потік випадкових чисел (для паралельної генерації); за замовчуванням — глобальний random
+        self.rng = rng if rng is not None else random
+        # "tiered" — бюджетований TieredSimplifier, "full" — sp.simplify для кожного дерева (як раніше)
+        self.simplify_mode = simplify_mode
+        self.simplifier = TieredSimplifier()
+        self.last_tier = None
+        # "constructive" — дерево будується з гарантіями (цільовий оператор, x, межа констант),
+        # "rejection" — рівномірний вибір операторів з подальшим відкиданням (як раніше),
+        # "ir" — те саме, що constructive, але в масивному IR (src.ir): сирі дерева відсіюються numpy
+        # на сітці семплювання, і лише ті, що пройшли, стають деревами SymPy
+        self.construction = construction
+        self.max_const = max_const
+        self.target_ops = sorted(OP_SETS[config.b], key=lambda op: op.__name__)
+        # Скільки сирих IR-дерев можна відкинути на один generate() (вони дешеві, на відміну від SymPy-спроб)
+        self.max_raw_attempts = 500
+        # attempts — сирі дерева, accepted — прийняті вирази, fallbacks — повернення голого x,
+        # ir_rejected — IR-дерева, відкинуті до SymPy, blacklisted — дерева з відомим фатальним піддеревом
+        self.counters = collections.Counter()
+        # Опційно FailureKnowledge (src.failures): ядро дерева (до обгортки під C) з піддеревом, що вже
+        # призводило до невдач, відкидається одразу. Обгортка не перевіряється: полюс 1/(x - p) для C=2 — ціль
+        self.blacklist = blacklist
 
     def _generate_recursive(self, depth: int) -> sp.Expr:
         if depth >= self.config.max_depth:
             # Генеруємо лише малі числа, щоб уникнути гігантських коефіцієнтів
-            if random.random() < 0.8:
+            if self.rng.random() < 0.8:
                 return self.config.x
             else:
-                return sp.Integer(random.randint(1, 5))
+                return sp.Integer(self.rng.randint(1, 5))
 
         # Форсування асимптот для Axis C=2
         if self.config.c == 2 and depth == 0:
-            denom = (self.config.x - random.randint(-2, 2))
-            return self._generate_recursive(depth + 1) / (denom if denom != 0 else 1)
+            return self._generate_recursive(depth + 1) / (self.config.x - self.rng.choice(C2_POLES))
 
-        op = random.choice(self.config.available_ops)
+        op = self.rng.choice(self.config.available_ops)
         
         try:
             if op == sp.Piecewise:
                 expr = self._generate_recursive(depth + 1)
-                cond = self.config.x > random.randint(-3, 3)
-                return sp.Piecewise((expr, cond), (random.choice([0, -expr]), True))
+                cond = self.config.x > self.rng.randint(-3, 3)
+                return sp.Piecewise((expr, cond), (self.rng.choice([0, -expr]), True))
             
             if op in [sp.Add, sp.Mul]:
                 return op(self._generate_recursive(depth + 1), self._generate_recursive(depth + 1))
@@ -33,11 +66,11 @@ class ExpressionGenerator:
             if op == sp.Pow:
                 base = self._generate_recursive(depth + 1)
                 # Використовуємо float 0.5 замість Rational(1, 2), щоб уникнути sqrt()
-                exp = random.choice([2, 3, 0.5, -1]) 
+                exp = self.rng.choice([2, 3, 0.5, -1]) 
                 return sp.Pow(base, exp)
                 
             if op == sp.besselj:
-                return op(random.randint(0, 1), self._generate_recursive(depth + 1))
+                return op(self.rng.randint(0, 1), self._generate_recursive(depth + 1))
 
             if op == sp.factorial and depth > 1:
                 return self.config.x
@@ -46,14 +79,171 @@ class ExpressionGenerator:
         except Exception:
             return self.config.x
 
+    # --- CONSTRUCTIVE MODE ---
+
+    def _const_bound(self, expr: sp.Expr) -> float:
+        """Найбільша за модулем константа піддерева (оцінка того, що з'явиться після спрощення)."""
+        return max([abs(float(n)) for n in expr.atoms(sp.Number)] + [1.0])
+
+    def _ops_at(self, ops, depth: int):
+        # factorial глибше першого рівня генератор завжди замінював на x
+        return [op for op in ops if not (op == sp.factorial and depth > 1)]
+
+    def _construct(self, depth: int, need_target: bool, need_x: bool) -> sp.Expr:
+        """
+        Будує дерево із зобов'язаннями: need_target — десь нижче має стояти оператор з OP_SETS[b],
+        need_x — десь нижче має бути x. Цільовий оператор ставиться не пізніше передостаннього рівня,
+        а його аргумент завжди містить x (інакше floor(3) чи Abs(2) схлопнуться в число).
+        """
+        x = self.config.x
+        if depth >= self.config.max_depth:
+            if need_x or self.rng.random() < 0.8:
+                return x
+            return sp.Integer(self.rng.randint(1, 5))
+
+        remaining = self.config.max_depth - depth
+        targets = self._ops_at(self.target_ops, depth)
+        if need_target and targets and (remaining == 1 or self.rng.random() < 1.0 / remaining):
+            op = self.rng.choice(targets)
+        else:
+            op = self.rng.choice(self._ops_at(self.config.available_ops, depth))
+
+        if op in self.target_ops:
+            need_target = False
+            need_x = need_x or self.config.b > 0
+
+        if op == sp.Piecewise:
+            expr = self._construct(depth + 1, need_target, need_x)
+            cond = x > self.rng.randint(-3, 3)
+            return sp.Piecewise((expr, cond), (self.rng.choice([0, -expr]), True))
+
+        if op in [sp.Add, sp.Mul]:
+            # Кожне зобов'язання віддаємо випадковій гілці
+            target_left = self.rng.random() < 0.5
+            x_left = self.rng.random() < 0.5
+            left = self._construct(depth + 1, need_target and target_left, need_x and x_left)
+            right = self._construct(depth + 1, need_target and not target_left, need_x and not x_left)
+            if op == sp.Mul and self._const_bound(left) * self._const_bound(right) > self.max_const:
+                op = sp.Add
+            return op(left, right)
+
+        if op == sp.Pow:
+            base = self._construct(depth + 1, need_target, need_x)
+            bound = self._const_bound(base)
+            exps = [e for e in [2, 3, 0.5, -1] if e < 1 or bound ** e <= self.max_const]
+            return sp.Pow(base, self.rng.choice(exps))
+
+        if op == sp.besselj:
+            return op(self.rng.randint(0, 1), self._construct(depth + 1, need_target, need_x))
+
+        return op(self._construct(depth + 1, need_target, need_x))
+
+    def _construct_ir(self, depth: int, need_target: bool, need_x: bool) -> ir.ExprIR:
+        """_construct без SymPy: ті самі зобов'язання й межі констант, результат — ExprIR."""
+        if depth >= self.config.max_depth:
+            if need_x or self.rng.random() < 0.8:
+                return ir.ExprIR.leaf(ir.X)
+            return ir.ExprIR.leaf(ir.CONST, self.rng.randint(1, 5))
+
+        remaining = self.config.max_depth - depth
+        targets = self._ops_at(self.target_ops, depth)
+        if need_target and targets and (remaining == 1 or self.rng.random() < 1.0 / remaining):
+            op = self.rng.choice(targets)
+        else:
+            op = self.rng.choice(self._ops_at(self.config.available_ops, depth))
+
+        if op in self.target_ops:
+            need_target = False
+            need_x = need_x or self.config.b > 0
+
+        if op == sp.Piecewise:
+            expr = self._construct_ir(depth + 1, need_target, need_x)
+            threshold = self.rng.randint(-3, 3)
+            code = ir.PIECEWISE_ZERO if self.rng.choice([0, 1]) == 0 else ir.PIECEWISE_NEG
+            return ir.ExprIR.node(code, expr, const=threshold)
+
+        if op in [sp.Add, sp.Mul]:
+            target_left = self.rng.random() < 0.5
+            x_left = self.rng.random() < 0.5
+            left = self._construct_ir(depth + 1, need_target and target_left, need_x and x_left)
+            right = self._construct_ir(depth + 1, need_target and not target_left, need_x and not x_left)
+            if op == sp.Mul and left.const_bound() * right.const_bound() > self.max_const:
+                op = sp.Add
+            return ir.ExprIR.node(ir.OPCODES[op], left, right)
+
+        if op == sp.Pow:
+            base = self._construct_ir(depth + 1, need_target, need_x)
+            bound = base.const_bound()
+            exps = [e for e in [2, 3, 0.5, -1] if e < 1 or bound ** e <= self.max_const]
+            return ir.ExprIR.node(ir.POW, base, const=self.rng.choice(exps))
+
+        if op == sp.besselj:
+            order = self.rng.randint(0, 1)
+            return ir.ExprIR.node(ir.BESSELJ, self._construct_ir(depth + 1, need_target, need_x), const=order)
+
+        return ir.ExprIR.node(ir.OPCODES[op], self._construct_ir(depth + 1, need_target, need_x))
+
+    def _blacklisted(self, core) -> bool:
+        if self.blacklist is None:
+            return False
+        hit = self.blacklist.match_ir(core) if isinstance(core, ir.ExprIR) else self.blacklist.match(core)
+        if hit is None:
+            return False
+        self.counters["blacklisted"] += 1
+        self._reject("blacklist:{}:{}".format(*hit))
+        return True
+
+    def _wrap_ir(self, tree: ir.ExprIR) -> ir.ExprIR:
+        """Обгортка ядра під вісь C (як у _build_tree)."""
+        if self.config.c == 2:
+            # tree / (x - p)
+            pole = ir.ExprIR.node(ir.ADD, ir.ExprIR.leaf(ir.X), ir.ExprIR.leaf(ir.CONST, -self.rng.choice(C2_POLES)))
+            tree = ir.ExprIR.node(ir.MUL, tree, ir.ExprIR.node(ir.POW, pole, const=-1))
+        elif self.config.c == 1:
+            periodic_ops = [op for op in self.config.available_ops if op in (sp.sin, sp.cos)]
+            if periodic_ops:
+                op = self.rng.choice(periodic_ops)
+                scaled = ir.ExprIR.node(ir.MUL, ir.ExprIR.leaf(ir.CONST, self.rng.randint(1, 3)), ir.ExprIR.leaf(ir.X))
+                tree = tree.substitute_x(ir.ExprIR.node(ir.OPCODES[op], scaled))
+        return tree
+
+    def _next_ir_candidate(self) -> Optional[sp.Expr]:
+        """Сирі IR-дерева до першого, що пройшло ir.screen; None — вичерпано max_raw_attempts."""
+        for _ in range(self.max_raw_attempts):
+            core = self._construct_ir(0, need_target=self.config.b > 0, need_x=True)
+            if self._blacklisted(core):
+                continue
+            tree = self._wrap_ir(core)
+            reason = ir.screen(tree, self.config.b)
+            if reason == ir.PASS:
+                return tree.to_sympy(self.config.x)
+            self.counters["ir_rejected"] += 1
+            self._reject(f"ir_{reason}")
+        return None
+
+    def _build_tree(self) -> Optional[sp.Expr]:
+        if self.construction == "rejection":
+            return self._generate_recursive(0)
+
+        expr = self._construct(0, need_target=self.config.b > 0, need_x=True)
+        if self._blacklisted(expr):
+            return None
+        if self.config.c == 2:
+            # Асимптота додається обгорткою, а не займає кореневий рівень (при A=0 інакше не лишається місця для B)
+            expr = expr / (self.config.x - self.rng.choice(C2_POLES))
+        elif self.config.c == 1:
+            # Періодичність: композиція з sin/cos(k*x), якщо вони дозволені (інакше C1 перевірить лише фільтр)
+            periodic_ops = [op for op in self.config.available_ops if op in (sp.sin, sp.cos)]
+            if periodic_ops:
+                inner = self.rng.choice(periodic_ops)(self.rng.randint(1, 3) * self.config.x)
+                expr = expr.subs(self.config.x, inner)
+        return expr
+
     def _verify_complexity(self, expr: sp.Expr) -> bool:
         """Перевірка складності та валідності операторів."""
-        atoms = expr.atoms()
-        
         # 1. Заборона re, im, atan2
-        for atom in atoms:
-             if isinstance(atom, (sp.re, sp.im)) or str(atom) == 'atan2':
-                 return False
+        if expr.has(sp.re, sp.im, sp.atan2):
+            return False
 
         # 2. Фільтр ВЕЛИКИХ ЧИСЕЛ
         # Перевіряємо всі числа у виразі
@@ -65,29 +255,39 @@ class ExpressionGenerator:
         if self.config.b == 0:
             return True
 
-        target_ops = OP_SETS[self.config.b]
-        has_target = False
-        for atom in expr.atoms():
-            if atom.func in target_ops:
-                has_target = True
-                break
-        
-        return has_target
+        # atoms() без аргументів повертає лише листки (x, числа), тому шукаємо вузли за типом
+        target_ops = tuple(OP_SETS[self.config.b])
+        return any(isinstance(node, target_ops) for node in sp.preorder_traversal(expr))
 
     def generate(self) -> sp.Expr:
         for _ in range(50):
-            expr = self._generate_recursive(0)
+            if self.construction == "ir":
+                expr = self._next_ir_candidate()
+                if expr is None:
+                    break
+            else:
+                expr = self._build_tree()
+                if expr is None:
+                    continue
+            self.counters["attempts"] += 1
             
             # --- ЗМІНИ ТУТ ---
             # 1. Прибрали sp.nsimplify(expr), який робив sqrt і великі дроби
             # 2. Залишили звичайний simplify(), але обережно
+            start = time.perf_counter()
             try:
                 # simplify іноді може перетворити x**0.5 у sqrt(x), тому
                 # можна спробувати спочатку без нього, або використовувати конкретні стратегії.
                 # Але для "чистки" виразу (x+x -> 2x) він потрібен.
-                simplified = sp.simplify(expr)
+                if self.simplify_mode == "full":
+                    simplified, tier = sp.simplify(expr), "simplify"
+                else:
+                    simplified, tier = self.simplifier.simplify(expr)
             except:
+                self._reject("simplify_error")
                 continue
+            finally:
+                self._observe("simplify", start)
             
             # Якщо simplify все ж зробив sqrt (наприклад, через згортання), 
             # можна примусово замінити Rational(1, 2) на Float(0.5)
@@ -95,14 +295,45 @@ class ExpressionGenerator:
             
             # Фільтри
             if not simplified.has(self.config.x):
+                self._reject("no_x")
                 continue
             
             if simplified.has(sp.oo, sp.zoo, sp.nan):
+                self._reject("non_finite")
                 continue
             
-            if not self._verify_complexity(simplified):
+            start = time.perf_counter()
+            verified = self._verify_complexity(simplified)
+            self._observe("verify", start)
+            if not verified:
+                self._reject("complexity")
                 continue
 
+            self.last_tier = tier
+            self.counters["accepted"] += 1
             return simplified
                 
-        return self.config.x
\ No newline at end of file
+        self.last_tier = None
+        self.counters["fallbacks"] += 1
+        return self.config.x
+
+    def _observe(self, stage: str, start: float):
+        if self.metrics is not None:
+            self.metrics.observe(self.cell, stage, time.perf_counter() - start)
+
+    def _reject(self, reason: str):
+        if self.metrics is not None:
+            self.metrics.reject(self.cell, f"generator:{reason}")
+
+    def acceptance_stats(self) -> dict:
+        """Частка прийнятих дерев і кількість спроб на один прийнятий вираз."""
+        attempts, accepted = self.counters["attempts"], self.counters["accepted"]
+        return {
+            "attempts": attempts,
+            "accepted": accepted,
+            "fallbacks": self.counters["fallbacks"],
+            "ir_rejected": self.counters["ir_rejected"],
+            "blacklisted": self.counters["blacklisted"],
+            "acceptance_rate": accepted / attempts if attempts else 0.0,
+            "attempts_per_accepted": attempts / accepted if accepted else float("inf"),
+        }
\ No newline at end of file
@@ -0,0 +1,194 @@
+import numpy as np
+import sympy as sp
+from array import array
+from typing import Callable, Dict, List, Optional
+from .config import OP_SETS
+from .evaluator import SAMPLE_RANGE, Y_BOUND, safe_modules
+
+# --- OPCODES ---
+# Листки
+X, CONST = 0, 1
+# Бінарні
+ADD, MUL = 2, 3
+# Унарні з параметром у consts: показник степеня, поріг Piecewise, порядок Бесселя
+POW, PIECEWISE_ZERO, PIECEWISE_NEG, BESSELJ = 4, 5, 6, 7
+# Унарні без параметра
+SIN, COS, TAN, EXP, LOG, ABS, FLOOR, FACTORIAL, GAMMA, ERF, ZETA = range(8, 19)
+
+UNARY = {SIN: sp.sin, COS: sp.cos, TAN: sp.tan, EXP: sp.exp, LOG: sp.log, ABS: sp.Abs, FLOOR: sp.floor,
+         FACTORIAL: sp.factorial, GAMMA: sp.gamma, ERF: sp.erf, ZETA: sp.zeta}
+# Оператор SymPy -> опкод (Piecewise — PIECEWISE_ZERO; гілка -expr задається при побудові)
+OPCODES = {sp.Add: ADD, sp.Mul: MUL, sp.Pow: POW, sp.Piecewise: PIECEWISE_ZERO, sp.besselj: BESSELJ}
+OPCODES.update({func: op for op, func in UNARY.items()})
+# Рівень Axis B кожного опкоду
+LEVELS = {OPCODES[func]: level for level, ops in OP_SETS.items() for func in ops}
+LEVELS[PIECEWISE_NEG] = LEVELS[PIECEWISE_ZERO]
+SPECIAL_OPCODES = frozenset({FACTORIAL, GAMMA, ERF, ZETA, BESSELJ})
+# Опкоди, чий параметр потрапляє в числа виразу (як atoms(sp.Number) у SymPy-дереві)
+_NUMERIC = frozenset({CONST, POW, PIECEWISE_ZERO, PIECEWISE_NEG, BESSELJ})
+
+_NUMPY = {SIN: np.sin, COS: np.cos, TAN: np.tan, EXP: np.exp, LOG: np.log, ABS: np.abs, FLOOR: np.floor}
+_SPECIAL = {FACTORIAL: 'factorial', GAMMA: 'gamma', ERF: 'erf', ZETA: 'zeta'}
+
+# Сітка пре-скринінгу — та сама, що "sample" у EvaluatorCache (NumericGate)
+SCREEN_GRID = np.linspace(*SAMPLE_RANGE, 25)
+# Крок до сусідніх точок, якими відрізняють усувну особливість (x/x) від полюса чи межі області
+NEIGHBOUR_STEP = 1e-6
+
+# --- SCREEN REASONS ---
+PASS = "pass"
+NO_X = "no_x"
+COMPLEXITY = "complexity"
+OUT_OF_BOUNDS = "out_of_bounds"
+NON_FINITE = "non_finite"
+
+class ExprIR:
+    """
+    Компактне дерево-кандидат: опкоди в префіксному порядку (array('B')) і паралельний масив
+    параметрів (array('d'); для вузлів без параметра — 0). Без жодного об'єкта SymPy:
+    перевіряється й обчислюється numpy напряму, у sp.Expr перетворюється лише для тих, хто пройшов.
+    """
+    __slots__ = ("ops", "consts")
+
+    def __init__(self, ops: Optional[array] = None, consts: Optional[array] = None):
+        self.ops = ops if ops is not None else array("B")
+        self.consts = consts if consts is not None else array("d")
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    @classmethod
+    def leaf(cls, op: int, const: float = 0.0) -> "ExprIR":
+        return cls(array("B", [op]), array("d", [const]))
+
+    @classmethod
+    def node(cls, op: int, *children: "ExprIR", const: float = 0.0) -> "ExprIR":
+        ir = cls.leaf(op, const)
+        for child in children:
+            ir.ops.extend(child.ops)
+            ir.consts.extend(child.consts)
+        return ir
+
+    def has_x(self) -> bool:
+        return X in self.ops
+
+    def has_level(self, level: int) -> bool:
+        return any(LEVELS.get(op) == level for op in self.ops)
+
+    def has_special(self) -> bool:
+        return not SPECIAL_OPCODES.isdisjoint(self.ops)
+
+    def const_bound(self) -> float:
+        """Найбільше за модулем число дерева (аналог _const_bound для SymPy-дерева)."""
+        return max([abs(c) for op, c in zip(self.ops, self.consts) if op in _NUMERIC] + [1.0])
+
+    def substitute_x(self, inner: "ExprIR") -> "ExprIR":
+        """Копія дерева, де кожен x замінено на inner (композиція f(inner))."""
+        result = ExprIR()
+        for op, const in zip(self.ops, self.consts):
+            if op == X:
+                result.ops.extend(inner.ops)
+                result.consts.extend(inner.consts)
+            else:
+                result.ops.append(op)
+                result.consts.append(const)
+        return result
+
+    def evaluate(self, x_vals: np.ndarray) -> np.ndarray:
+        """Значення на сітці (стек, обхід з кінця префіксного запису); nan там, де дійсного значення немає."""
+        special = _special_functions()
+        stack: List[np.ndarray] = []
+        for i in range(len(self.ops) - 1, -1, -1):
+            op, const = self.ops[i], self.consts[i]
+            if op == X:
+                stack.append(x_vals)
+            elif op == CONST:
+                stack.append(np.full(x_vals.shape, const))
+            elif op == ADD:
+                stack.append(stack.pop() + stack.pop())
+            elif op == MUL:
+                stack.append(stack.pop() * stack.pop())
+            elif op == POW:
+                stack.append(np.power(stack.pop(), const))
+            elif op in (PIECEWISE_ZERO, PIECEWISE_NEG):
+                value = stack.pop()
+                stack.append(np.where(x_vals > const, value, 0.0 if op == PIECEWISE_ZERO else -value))
+            elif op == BESSELJ:
+                stack.append(special['besselj'](const, stack.pop()))
+            elif op in _NUMPY:
+                stack.append(_NUMPY[op](stack.pop()))
+            else:
+                stack.append(special[_SPECIAL[op]](stack.pop()))
+        return np.asarray(stack.pop(), dtype=float)
+
+    def to_sympy(self, x: sp.Symbol) -> sp.Expr:
+        """Дерево SymPy (автоспрощення SymPy спрацьовує тут, один раз для кожного кандидата)."""
+        stack: List[sp.Expr] = []
+        for i in range(len(self.ops) - 1, -1, -1):
+            op, const = self.ops[i], self.consts[i]
+            if op == X:
+                stack.append(x)
+            elif op == CONST:
+                # Цілі сталі — Integer, полюси обгортки C=2 (x - 1.2) — Float
+                stack.append(sp.Integer(int(const)) if const.is_integer() else sp.Float(const))
+            elif op in (ADD, MUL):
+                left = stack.pop()
+                stack.append((sp.Add if op == ADD else sp.Mul)(left, stack.pop()))
+            elif op == POW:
+                # Цілі показники — Integer, 0.5 — Float (як у генераторі: без sqrt)
+                stack.append(sp.Pow(stack.pop(), int(const) if const.is_integer() else const))
+            elif op in (PIECEWISE_ZERO, PIECEWISE_NEG):
+                value = stack.pop()
+                stack.append(sp.Piecewise((value, x > int(const)), (0 if op == PIECEWISE_ZERO else -value, True)))
+            elif op == BESSELJ:
+                stack.append(sp.besselj(int(const), stack.pop()))
+            else:
+                stack.append(UNARY[op](stack.pop()))
+        return stack.pop()
+
+_special_cache: Dict[str, object] = {}
+
+def _special_functions() -> Dict[str, object]:
+    """Ті самі реалізації спецфункцій, що й у CompiledEvaluator (scipy.special або mpmath)."""
+    if not _special_cache:
+        _special_cache.update(safe_modules()[0])
+    return _special_cache
+
+def screen(ir: ExprIR, b: int, x_vals: np.ndarray = SCREEN_GRID, y_bound: float = Y_BOUND) -> str:
+    """
+    Дешевий фільтр сирого дерева до SymPy. Відкидає лише те, що неминуче відкинули б пізніше:
+    немає x або цільового оператора рівня b (спрощення їх не додасть), скінченне значення поза y_bound
+    (та сама функція — той самий OUT_OF_BOUNDS у NumericGate), nan/inf на сітці, якщо й поруч
+    (±NEIGHBOUR_STEP) значення немає або воно поза межами (полюс, межа області). Усувні особливості (x/x)
+    і nan спецфункцій (їх дораховує mpmath) лишаються на розсуд NumericGate після спрощення.
+    """
+    if not ir.has_x():
+        return NO_X
+    if b > 0 and not ir.has_level(b):
+        return COMPLEXITY
+    return grid_verdict(ir.evaluate, x_vals, y_bound, check_non_finite=not ir.has_special())
+
+def grid_verdict(evaluate: Callable[[np.ndarray], np.ndarray], x_vals: np.ndarray = SCREEN_GRID,
+                 y_bound: float = Y_BOUND, check_non_finite: bool = True) -> str:
+    """
+    Числовий вердикт функції на сітці: OUT_OF_BOUNDS (скінченне значення поза y_bound), NON_FINITE
+    (nan/inf, і поруч теж немає значення або воно поза межами) або PASS. Помилка обчислення — PASS.
+    """
+    with np.errstate(all='ignore'):
+        try:
+            y_vals = evaluate(x_vals)
+        except Exception:
+            return PASS
+        finite = np.isfinite(y_vals)
+        if np.any(np.abs(y_vals[finite]) > y_bound):
+            return OUT_OF_BOUNDS
+        if finite.all() or not check_non_finite:
+            return PASS
+        bad = x_vals[~finite]
+        try:
+            near = evaluate(np.concatenate([bad - NEIGHBOUR_STEP, bad + NEIGHBOUR_STEP]))
+        except Exception:
+            return PASS
+        if np.any(~np.isfinite(near) | (np.abs(near) > y_bound)):
+            return NON_FINITE
+    return PASS
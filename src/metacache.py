@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import collections
+from typing import Any, Dict, Optional, Tuple
+
+# --- STATUSES ---
+STATUS_OK = "ok"
+STATUS_TIMEOUT = "timeout"
+STATUS_ERROR = "error"
+
+# Типи записів: метадані цілого виразу і сингулярності підтерма (доданка/множника)
+KIND_EXPR = "expr"
+KIND_SUBTERM = "subterm_singularities"
+
+def expr_kind(confirm_period: bool = False) -> str:
+    """Тип запису метаданих виразу з урахуванням опцій аналізу (з confirm_period результат інший)."""
+    return f"{KIND_EXPR}:confirm_period" if confirm_period else KIND_EXPR
+
+def _stats_kind(kind: str) -> str:
+    return kind.split(":", 1)[0]
+
+def _signed(digest: int) -> int:
+    """SQLite зберігає INTEGER як знаковий int64."""
+    return digest - (1 << 64) if digest >= (1 << 63) else digest
+
+class MetadataCache:
+    """
+    Персистентний content-addressed кеш символьних метаданих (SQLite) за expression_digest.
+
+    Зберігає результати, таймаути (разом із бюджетом, за якого вони сталися) й помилки аналізу,
+    тож відомі повільні вирази не аналізуються повторно з тим самим чи меншим бюджетом.
+    Результати з різними опціями аналізу (expr_kind) зберігаються окремо. Окремо кешуються сингулярності підтермів (tan(x), 1/(x - 1), gamma(x)),
+    які воркер метаданих перевикористовує для нових виразів з тими самими доданками/множниками.
+    З'єднання відкривається ліниво в кожному процесі (після fork старе з'єднання не використовується).
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS metadata (
+            digest INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            formula TEXT,
+            created REAL NOT NULL,
+            PRIMARY KEY (digest, kind)
+        )
+    """
+
+    def __init__(self, path: str = "metadata_cache.sqlite"):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.stats = collections.Counter()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(self.SCHEMA)
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, digest: int, kind: str = KIND_EXPR) -> Optional[Tuple[str, Any]]:
+        """Повертає (status, payload) або None."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT status, payload FROM metadata WHERE digest = ? AND kind = ?", (_signed(digest), kind)
+            ).fetchone()
+        self.stats[f"{_stats_kind(kind)}_hits" if row else f"{_stats_kind(kind)}_misses"] += 1
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def get_many(self, digests, kind: str) -> Dict[int, Any]:
+        """Пакетний пошук payload-ів зі статусом ok (для підтермів)."""
+        found = {}
+        for digest in set(digests):
+            hit = self.get(digest, kind)
+            if hit is not None and hit[0] == STATUS_OK:
+                found[digest] = hit[1]
+        return found
+
+    def put(self, digest: int, status: str, payload: Any, kind: str = KIND_EXPR, formula: str = None):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO metadata (digest, kind, status, payload, formula, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (_signed(digest), kind, status, json.dumps(payload, ensure_ascii=False), formula, time.time()),
+            )
+            conn.commit()
+        self.stats[f"{_stats_kind(kind)}_writes"] += 1
+
+    def hit_rate(self, kind: str = KIND_EXPR) -> float:
+        hits, misses = self.stats[f"{kind}_hits"], self.stats[f"{kind}_misses"]
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    def summary(self) -> str:
+        return (f"метадані: {self.hit_rate(KIND_EXPR):.0%} влучань "
+                f"({self.stats[f'{KIND_EXPR}_hits']}/{self.stats[f'{KIND_EXPR}_hits'] + self.stats[f'{KIND_EXPR}_misses']}), "
+                f"підтерми: {self.hit_rate(KIND_SUBTERM):.0%} влучань")
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import signal
+import threading
+import bisect
+import collections
+import contextlib
+from typing import Dict
+
+# Межі кошиків гістограм латентності (секунди); останній кошик — +Inf
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+# Гарячі етапи конвеєра (порядок — як у generate_cell)
+STAGES = ("generate", "simplify", "verify", "dedup", "prescreen", "topology", "metadata", "points", "export")
+
+class PipelineMetrics:
+    """
+    Метрики конвеєра по клітинках (A, B, C): лічильники подій, причини відмов і гістограми
+    латентності етапів. Об'єкт легкий і пікується: процес-генератор повертає свої метрики
+    разом із записами, головний процес зливає їх через merge().
+    """
+    def __init__(self):
+        self.counters = collections.defaultdict(collections.Counter)      # cell -> подія -> n
+        self.rejections = collections.defaultdict(collections.Counter)    # cell -> причина -> n
+        self.histograms = {}                                             # (cell, stage) -> [кошики..., +Inf]
+        self.sums = collections.Counter()                                # (cell, stage) -> сума секунд
+        self.workers = collections.Counter()                             # spawned / killed / ... (WorkerPool.stats)
+        self.started = time.time()
+
+    def count(self, cell: str, event: str, n: int = 1):
+        self.counters[cell][event] += n
+
+    def reject(self, cell: str, reason: str):
+        self.rejections[cell][reason] += 1
+
+    def observe(self, cell: str, stage: str, seconds: float):
+        key = (cell, stage)
+        buckets = self.histograms.get(key)
+        if buckets is None:
+            buckets = self.histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1)
+        buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sums[key] += seconds
+
+    @contextlib.contextmanager
+    def timer(self, cell: str, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(cell, stage, time.perf_counter() - start)
+
+    def add_worker_stats(self, before: Dict[str, int], after: Dict[str, int]):
+        """Приріст лічильників WorkerPool.stats між двома знімками."""
+        for key, value in after.items():
+            self.workers[key] += value - before.get(key, 0)
+
+    def merge(self, other: "PipelineMetrics"):
+        for cell, counts in other.counters.items():
+            self.counters[cell].update(counts)
+        for cell, counts in other.rejections.items():
+            self.rejections[cell].update(counts)
+        for key, buckets in other.histograms.items():
+            mine = self.histograms.setdefault(key, [0] * len(buckets))
+            for i, n in enumerate(buckets):
+                mine[i] += n
+        self.sums.update(other.sums)
+        self.workers.update(other.workers)
+
+    def as_dict(self) -> dict:
+        cells = collections.defaultdict(lambda: {"counters": {}, "rejections": {}, "stages": {}})
+        for cell, counts in self.counters.items():
+            cells[cell]["counters"] = dict(counts)
+        for cell, counts in self.rejections.items():
+            cells[cell]["rejections"] = dict(counts)
+        for (cell, stage), buckets in sorted(self.histograms.items()):
+            bounds = [str(le) for le in LATENCY_BUCKETS] + ["+Inf"]
+            cells[cell]["stages"][stage] = {"count": sum(buckets), "sum": round(self.sums[(cell, stage)], 6),
+                                            "buckets": dict(zip(bounds, buckets))}
+        return {"updated": time.time(), "elapsed": round(time.time() - self.started, 3),
+                "workers": dict(self.workers), "cells": dict(sorted(cells.items()))}
+
+    def to_prometheus(self, prefix: str = "mcm") -> str:
+        """Формат textfile-колектора Prometheus (кумулятивні кошики гістограм)."""
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        for (cell, stage), buckets in sorted(self.histograms.items()):
+            labels = f'cell="{cell}",stage="{stage}"'
+            total = 0
+            for le, n in zip([str(le) for le in LATENCY_BUCKETS] + ["+Inf"], buckets):
+                total += n
+                lines.append(f'{prefix}_stage_seconds_bucket{{{labels},le="{le}"}} {total}')
+            lines.append(f"{prefix}_stage_seconds_sum{{{labels}}} {self.sums[(cell, stage)]:.6f}")
+            lines.append(f"{prefix}_stage_seconds_count{{{labels}}} {total}")
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for cell, counts in sorted(self.counters.items()):
+            for event, n in sorted(counts.items()):
+                lines.append(f'{prefix}_events_total{{cell="{cell}",event="{event}"}} {n}')
+        lines.append(f"# TYPE {prefix}_rejections_total counter")
+        for cell, counts in sorted(self.rejections.items()):
+            for reason, n in sorted(counts.items()):
+                reason = reason.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+                lines.append(f'{prefix}_rejections_total{{cell="{cell}",reason="{reason}"}} {n}')
+        lines.append(f"# TYPE {prefix}_workers_total counter")
+        for event, n in sorted(self.workers.items()):
+            lines.append(f'{prefix}_workers_total{{event="{event}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+class MetricsExporter:
+    """
+    Періодично скидає метрики у файл (атомарно: tmp + os.replace).
+    Формат за розширенням: .prom — Prometheus textfile, інакше JSON.
+    """
+    def __init__(self, path: str, interval: float = 10.0):
+        self.path = path
+        self.interval = interval
+        self._last = 0.0
+
+    def maybe_write(self, metrics: PipelineMetrics):
+        if time.monotonic() - self._last >= self.interval:
+            self.write(metrics)
+
+    def write(self, metrics: PipelineMetrics):
+        if self.path.endswith(".prom"):
+            payload = metrics.to_prometheus()
+        else:
+            payload = json.dumps(metrics.as_dict(), ensure_ascii=False, indent=1)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp, self.path)
+        self._last = time.monotonic()
+
+class SamplingProfiler:
+    """
+    Семплювальний профайлер без залежностей: за таймером ITIMER_PROF (процесорний час) знімає стек
+    головного потоку і рахує однакові стеки. Результат — "collapsed stacks" (рядок "f1;f2;f3 N"),
+    сумісний з flamegraph.pl / speedscope. Лише POSIX і лише головний потік поточного процесу.
+    """
+    def __init__(self, path: str, interval: float = 0.005):
+        self.path = path
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._previous = None
+
+    def _sample(self, signum, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("SamplingProfiler потребує POSIX (setitimer) і головного потоку")
+        self._previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> int:
+        """Зупиняє профайлер, пише файл і повертає кількість семплів."""
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous or signal.SIG_DFL)
+        with open(self.path, "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        return sum(self.stacks.values())
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,147 @@
+import json
+import collections
+import numpy as np
+import sympy as sp
+from typing import Any, Dict, List, Optional, Tuple
+from .evaluator import SAMPLE_RANGE, CompiledEvaluator
+
+# Фіксовані точки зонду: випадкові (з фіксованим seed), тож не потрапляють на цілі, 0, kπ/2 тощо
+PROBE_POINTS = np.sort(np.random.default_rng(20240607).uniform(SAMPLE_RANGE[0], SAMPLE_RANGE[1], 32))
+# Мінімум скінченних значень у зонді, щоб відбиток мав сенс
+MIN_FINITE = 8
+
+def fingerprint(formula: str, probes: np.ndarray = PROBE_POINTS) -> Optional[Tuple[np.ndarray, int, float, float]]:
+    """
+    Числовий відбиток формули: значення в probes, нормовані до нульового середнього й одиничної норми
+    (знак — так, щоб найбільша за модулем компонента була додатною). Повертає (вектор float32, маска скінченних
+    точок як int, зсув, масштаб): f = масштаб * вектор + зсув. Функції, що відрізняються лише сталою
+    (доданком чи множником), мають однаковий вектор. None — не парситься/не обчислюється або замало скінченних точок.
+    """
+    x = sp.Symbol('x', real=True)
+    try:
+        evaluator = CompiledEvaluator(sp.parse_expr(formula, local_dict={'x': x}))
+        with np.errstate(all='ignore'):
+            y_vals = np.asarray(evaluator(probes))
+        if np.iscomplexobj(y_vals):
+            return None
+        y_vals = np.broadcast_to(y_vals.astype(float), probes.shape)
+    except Exception:
+        return None
+    finite = np.isfinite(y_vals)
+    if finite.sum() < MIN_FINITE:
+        return None
+    values = y_vals[finite]
+    offset = float(values.mean())
+    centered = values - offset
+    scale = float(np.linalg.norm(centered))
+    vector = np.zeros(len(probes), dtype=np.float32)
+    if scale > 1e-12 * max(1.0, abs(offset)):
+        z = centered / scale
+        if z[np.argmax(np.abs(z))] < 0:
+            z, scale = -z, -scale
+        vector[finite] = z
+    else:
+        scale = 0.0 # стала функція
+    return vector, int.from_bytes(np.packbits(finite).tobytes(), "big"), offset, scale
+
+class NearDuplicateIndex:
+    """
+    LSH-індекс відбитків (SimHash: знаки проєкцій на випадкові гіперплощини, n_bands смуг по band_bits біт).
+    Ключ кошика — (клітинка, смуга, маска, біти смуги), тож порівнюються лише відбитки однієї клітинки (A, B, C)
+    з однаковою маскою. У кошику лежать лише «лідери»: новий відбиток порівнюється з ними (max |Δ| <= tol)
+    і або зливається з групою (union-find), або стає новим лідером. Час і пам'ять — O(n) при малих кошиках.
+    """
+    def __init__(self, n_probes: int = len(PROBE_POINTS), n_bands: int = 4, band_bits: int = 32,
+                 tol: float = 1e-5, rtol: float = 1e-9, seed: int = 0):
+        self.n_bands = n_bands
+        self.band_bits = band_bits
+        self.tol = tol
+        self.rtol = rtol
+        self.planes = np.random.default_rng(seed).standard_normal((n_bands * band_bits, n_probes)).astype(np.float32)
+        self._weights = (1 << np.arange(band_bits, dtype=np.int64))
+        self._vectors = np.empty((1024, n_probes), dtype=np.float32)
+        self._affine = np.empty((1024, 2))
+        self.task_ids: List[Any] = []
+        self.cells: List[str] = []
+        self._parent: List[int] = []
+        self._buckets: Dict[tuple, List[int]] = {}
+        self.stats = collections.Counter()
+
+    def __len__(self) -> int:
+        return len(self.task_ids)
+
+    def _grow(self, n: int):
+        if n > len(self._vectors):
+            size = max(n, 2 * len(self._vectors))
+            self._vectors = np.resize(self._vectors, (size, self._vectors.shape[1]))
+            self._affine = np.resize(self._affine, (size, 2))
+
+    def _find(self, i: int) -> int:
+        parent = self._parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def add_many(self, cells: List[str], task_ids: List[Any], vectors: np.ndarray, masks: List[int],
+                 affine: np.ndarray):
+        """Додає пакет відбитків (рядки vectors; affine — стовпці (зсув, масштаб))."""
+        start = len(self.task_ids)
+        self._grow(start + len(task_ids))
+        self._vectors[start:start + len(task_ids)] = vectors
+        self._affine[start:start + len(task_ids)] = affine
+        bits = (vectors @ self.planes.T) > 0
+        keys = bits.reshape(len(task_ids), self.n_bands, self.band_bits) @ self._weights
+        for row, (cell, task_id, mask) in enumerate(zip(cells, task_ids, masks)):
+            i = start + row
+            self.task_ids.append(task_id)
+            self.cells.append(cell)
+            self._parent.append(i)
+            for band in range(self.n_bands):
+                bucket = self._buckets.setdefault((cell, band, mask, int(keys[row, band])), [])
+                for leader in bucket:
+                    self.stats["comparisons"] += 1
+                    if np.max(np.abs(self._vectors[leader] - self._vectors[i])) <= self.tol:
+                        self._parent[self._find(i)] = self._find(leader)
+                        break
+                else:
+                    bucket.append(i)
+
+    def clusters(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Групи з ≥ 2 завдань по клітинках. kind="equivalent" — значення збігаються (з точністю rtol),
+        "affine" — збігаються з точністю до сталого доданка/множника.
+        """
+        groups = collections.defaultdict(list)
+        for i in range(len(self.task_ids)):
+            groups[self._find(i)].append(i)
+        result = collections.defaultdict(list)
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            affine = self._affine[members]
+            same = np.allclose(affine, affine[0], rtol=self.rtol, atol=self.rtol)
+            result[self.cells[members[0]]].append({"kind": "equivalent" if same else "affine",
+                                                   "tasks": [self.task_ids[i] for i in members]})
+        return dict(result)
+
+def near_duplicate_report(clusters: Dict[str, List[Dict[str, Any]]], top: int = 10) -> str:
+    """Текстовий розділ звіту: кількість груп і зайвих завдань по клітинках (топ за кількістю зайвих)."""
+    lines = ["--- Майже-дублікати (числові відбитки) ---"]
+    if not clusters:
+        lines.append("Не знайдено.")
+        return "\n".join(lines)
+    rows = []
+    for cell, groups in clusters.items():
+        extra = sum(len(group["tasks"]) - 1 for group in groups)
+        equivalent = sum(group["kind"] == "equivalent" for group in groups)
+        rows.append((extra, cell, len(groups), equivalent))
+    rows.sort(key=lambda row: (-row[0], row[1]))
+    lines.append(f"Груп: {sum(row[2] for row in rows)}, зайвих завдань: {sum(row[0] for row in rows)}")
+    for extra, cell, n_groups, equivalent in rows[:top]:
+        lines.append(f"({cell}): груп {n_groups} (еквівалентних {equivalent}), зайвих завдань {extra}")
+    return "\n".join(lines)
+
+def save_clusters(path: str, clusters: Dict[str, List[Dict[str, Any]]]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(clusters, f, ensure_ascii=False, indent=1)
@@ -0,0 +1,139 @@
+import collections
+import numpy as np
+import sympy as sp
+from typing import Callable, Optional
+from .evaluator import EvaluatorCache, get_evaluator_cache
+
+# Щільна сітка для оцінки періоду: крок 0.01, періоди до половини довжини (20)
+PERIOD_GRID = (-20, 20, 4001)
+
+def _real(y_vals, x_vals) -> np.ndarray:
+    y_vals = np.asarray(y_vals)
+    if y_vals.ndim == 0:
+        y_vals = np.full_like(x_vals, y_vals, dtype=y_vals.dtype)
+    if np.iscomplexobj(y_vals):
+        y_vals = np.where(np.imag(y_vals) == 0, np.real(y_vals), np.nan)
+    return np.array(y_vals, dtype=float)
+
+def _mismatch(f: Callable, x_vals: np.ndarray, y_vals: np.ndarray, period: float) -> np.ndarray:
+    """Відносна розбіжність |f(x + T) - f(x)| / (1 + |f(x)|) у точках, де обидва значення скінченні."""
+    shifted = _real(f(x_vals + period), x_vals)
+    both = np.isfinite(y_vals) & np.isfinite(shifted)
+    return np.abs(shifted[both] - y_vals[both]) / (1.0 + np.abs(y_vals[both]))
+
+def _refine(f: Callable, x_vals: np.ndarray, y_vals: np.ndarray, lo: float, hi: float, iterations: int = 40) -> float:
+    """Золотий перетин по T: мінімізує середню (обрізану) розбіжність зсуву."""
+    def cost(period):
+        rel = _mismatch(f, x_vals, y_vals, period)
+        return float(np.mean(np.minimum(rel, 1.0) ** 2)) if rel.size else np.inf
+
+    ratio = (np.sqrt(5) - 1) / 2
+    c, d = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+    fc, fd = cost(c), cost(d)
+    for _ in range(iterations):
+        if fc <= fd:
+            hi, d, fd = d, c, fc
+            c = hi - ratio * (hi - lo)
+            fc = cost(c)
+        else:
+            lo, c, fc = c, d, fd
+            d = lo + ratio * (hi - lo)
+            fd = cost(d)
+    return (lo + hi) / 2
+
+def _autocorrelation(y_vals: np.ndarray, finite: np.ndarray):
+    """Нормована автокореляція з маскою нескінченних точок (через FFT) і кількість пар на кожному лагу."""
+    n = len(y_vals)
+    z = np.where(finite, y_vals - y_vals[finite].mean(), 0.0)
+    w = finite.astype(float)
+    nfft = 1 << int(np.ceil(np.log2(2 * n)))
+    Z, W = np.fft.rfft(z, nfft), np.fft.rfft(w, nfft)
+    num = np.fft.irfft(Z * np.conj(Z), nfft)[:n]
+    pairs = np.rint(np.fft.irfft(W * np.conj(W), nfft)[:n])
+    acf = num / np.maximum(pairs, 1.0)
+    return acf / acf[0], pairs
+
+def estimate_period(f: Callable, x_vals: np.ndarray, y_vals: Optional[np.ndarray] = None,
+                    tol: float = 1e-6, min_overlap: float = 0.3, acf_threshold: float = 0.5,
+                    max_candidates: int = 8) -> Optional[float]:
+    """
+    Найменший числово підтверджений період f на рівномірній сітці x_vals або None.
+
+    Кандидати — локальні максимуми автокореляції (і домінантна частота спектра);
+    кожен уточнюється золотим перетином і перевіряється прямим обчисленням f(x + T) на сітці
+    та на зсунутій сітці: 90% точок мають збігатися з відносною точністю tol.
+    """
+    dx = float(x_vals[1] - x_vals[0])
+    with np.errstate(all='ignore'):
+        y_vals = _real(f(x_vals) if y_vals is None else y_vals, x_vals)
+        finite = np.isfinite(y_vals)
+        if finite.mean() < min_overlap:
+            return None
+        lo, hi = np.percentile(y_vals[finite], [5, 95])
+        spread = hi - lo
+        if spread <= 1e-9 * max(1.0, abs(hi)):
+            return None # константа (або майже) не вважається періодичною
+        clipped = np.clip(y_vals, lo - spread, hi + spread)
+
+        acf, pairs = _autocorrelation(clipped, finite)
+        n = len(y_vals)
+        k = np.arange(2, n // 2)
+        peaks = k[(acf[k] > acf[k - 1]) & (acf[k] >= acf[k + 1]) & (acf[k] > acf_threshold)
+                  & (pairs[k] >= min_overlap * n)]
+        lags = list(peaks[:max_candidates])
+        spectrum = np.abs(np.fft.rfft(np.where(finite, clipped - clipped[finite].mean(), 0.0)))
+        dominant = int(np.argmax(spectrum[1:]) + 1)
+        if n / dominant < n // 2:
+            lags.append(int(round(n / dominant)))
+
+        shifted_x = x_vals + dx * (1 - (np.sqrt(5) - 1) / 2)
+        shifted_y = _real(f(shifted_x), shifted_x)
+
+        def verified(period):
+            checks = (_mismatch(f, x_vals, y_vals, period), _mismatch(f, shifted_x, shifted_y, period))
+            return all(rel.size >= min_overlap * n and np.quantile(rel, 0.9) <= tol for rel in checks)
+
+        for lag in sorted(set(lags)):
+            # Пік автокореляції зміщений на кілька кроків (скінченне вікно) -> уточнюємо в околі ±2%
+            spread_lag = max(2.0, 0.02 * lag)
+            period = _refine(f, x_vals, y_vals, max(lag - spread_lag, 1.0) * dx, (lag + spread_lag) * dx)
+            if period < 2 * dx:
+                continue # вироджений зсув: розбіжність мала просто через близькість T до 0
+            if verified(period):
+                # Для кусково-сталих функцій мінімум пологий: пробуємо "гарні" значення поруч (p/q*pi, p/q)
+                for nice in _nice_periods(period):
+                    if verified(nice):
+                        return nice
+                return period
+    return None
+
+def _nice_periods(period: float, max_denominator: int = 12, rel_tol: float = 1e-3):
+    for base in (np.pi, 1.0):
+        for q in range(1, max_denominator + 1):
+            p = round(period * q / base)
+            if p > 0 and abs(period - p * base / q) <= rel_tol * period:
+                yield p * base / q
+
+def period_to_str(period: float, max_denominator: int = 12, tol: float = 1e-6) -> str:
+    """Запис періоду як у sympy.periodicity ("2*pi", "pi/2", "1"), якщо він розпізнається."""
+    for base in (sp.pi, sp.S.One):
+        for q in range(1, max_denominator + 1):
+            p = round(period * q / float(base))
+            if p > 0 and abs(period - p * float(base) / q) <= tol * period:
+                return str(sp.Rational(p, q) * base)
+    return f"{period:.10g}"
+
+class PeriodicityEstimator:
+    """In-process оцінка періоду на спільній сітці EvaluatorCache (гейт для C=1)."""
+    def __init__(self, grid=PERIOD_GRID, tol: float = 1e-6, cache: Optional[EvaluatorCache] = None):
+        self.tol = tol
+        self.cache = cache if cache is not None else get_evaluator_cache()
+        self.grid_name = self.cache.register_grid(f"period_{grid[2]}", *grid)
+        self.x_vals = self.cache.grid(self.grid_name)
+        self.stats = collections.Counter()
+
+    def estimate(self, expr: sp.Expr) -> Optional[float]:
+        evaluator = self.cache.get(expr)
+        period = estimate_period(evaluator, self.x_vals, self.cache.evaluate(expr, self.grid_name), tol=self.tol)
+        self.stats["periodic" if period is not None else "aperiodic"] += 1
+        return period
@@ -0,0 +1,80 @@
+import time
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+def _timed(func: Callable[[], Any], wait_clock: Optional[Callable[[], float]]) -> Tuple[Any, float]:
+    """Результат і тривалість етапу без часу в черзі до воркера (wait_clock — напр. WorkerPool.waited)."""
+    waited = wait_clock() if wait_clock is not None else 0.0
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    if wait_clock is not None:
+        elapsed -= wait_clock() - waited
+    return result, max(0.0, elapsed)
+
+class InFlightWindow:
+    """
+    Обмежене вікно кандидатів клітинки, чиї етапи (metadata, points) виконуються у фоні.
+
+    submit() запускає всі етапи кандидата одразу (потоки лише чекають на WorkerPool, тож головний
+    потік тим часом генерує й перевіряє наступних); defer() ставить у чергу вже відомий результат
+    (наприклад, відмову пре-скринінгу), щоб він зафіксувався на своєму місці. pop() віддає записи
+    строго в порядку постановки, чекаючи на голову черги, тож вихід не залежить від того, який
+    воркер відповів першим. in_flight — кандидати з етапами у роботі (кожен ще може стати завданням).
+    stats: submitted / deferred / waited (голова черги ще не готова, коли її забирають).
+    wait_clock — лічильник очікування на вільного воркера потоком (WorkerPool.waited): він віднімається
+    від тривалостей етапів, щоб черга не потрапляла в бюджети таймаутів і stage_seconds.
+    """
+    def __init__(self, size: int = 2, wait_clock: Optional[Callable[[], float]] = None):
+        self.size = max(1, size)
+        self.wait_clock = wait_clock
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._entries = collections.deque()   # (item, {етап: Future} | None)
+        self.in_flight = 0
+        self.stats = collections.Counter()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def full(self) -> bool:
+        return len(self._entries) >= self.size
+
+    def submit(self, item: Any, stages: Dict[str, Callable[[], Any]]):
+        if self._executor is None:
+            # Потік на кожен етап кожного кандидата у вікні: етапи одного кандидата не чекають один на одного
+            self._executor = ThreadPoolExecutor(max_workers=self.size * max(1, len(stages)),
+                                                thread_name_prefix="cell-stage")
+        futures = {name: self._executor.submit(_timed, func, self.wait_clock) for name, func in stages.items()}
+        self._entries.append((item, futures))
+        self.in_flight += 1
+        self.stats["submitted"] += 1
+
+    def defer(self, item: Any):
+        self._entries.append((item, None))
+        self.stats["deferred"] += 1
+
+    def pop(self) -> Tuple[Any, Optional[Dict[str, Tuple[Any, float]]]]:
+        """Голова черги: (item, {етап: (результат, секунди)}) або (item, None) для defer()."""
+        item, futures = self._entries.popleft()
+        if futures is None:
+            return item, None
+        self.in_flight -= 1
+        if not all(future.done() for future in futures.values()):
+            self.stats["waited"] += 1
+        return item, {name: future.result() for name, future in futures.items()}
+
+    def close(self):
+        """Чекає на етапи, що ще у роботі (їх обмежують таймаути WorkerPool), і відкидає їхні результати."""
+        self._entries.clear()
+        self.in_flight = 0
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,73 @@
+import numpy as np
+import sympy as sp
+from typing import List, Optional, Tuple
+
+# --- PATHS ---
+PATH_NONE = "no_denominator"        # знаменник не залежить від x
+PATH_ISOLATION = "poly_isolation"   # раціональні коефіцієнти: ізоляція дійсних коренів (Штурм)
+PATH_NUMERIC = "poly_numeric"       # float-коефіцієнти: np.roots по вектору коефіцієнтів
+PATH_GENERAL = "general"            # трансцендентний знаменник/чисельник: solve / singularities
+
+# Функції без власних полюсів на дійсній осі: для них полюси частки = нулі знаменника
+_ENTIRE_FUNCS = (sp.sin, sp.cos, sp.exp, sp.erf, sp.sinh, sp.cosh, sp.Abs, sp.floor)
+
+def _is_entire(expr: sp.Expr, x: sp.Symbol) -> bool:
+    """Чи не має вираз власних полюсів на R (поліноми від sin/cos/exp/erf/...)."""
+    if not expr.has(x):
+        return True
+    if expr.is_Symbol:
+        return True
+    if isinstance(expr, (sp.Add, sp.Mul)):
+        return all(_is_entire(arg, x) for arg in expr.args)
+    if isinstance(expr, sp.Pow):
+        return bool(expr.exp.is_Integer and expr.exp >= 0) and _is_entire(expr.base, x)
+    if isinstance(expr, sp.besselj):
+        return expr.args[0].is_Integer and _is_entire(expr.args[1], x)
+    if isinstance(expr, _ENTIRE_FUNCS):
+        return all(_is_entire(arg, x) for arg in expr.args)
+    return False
+
+def polynomial_denominator(expr: sp.Expr, x: sp.Symbol) -> Tuple[Optional[sp.Poly], str]:
+    """
+    Повертає (Poly знаменника, шлях), якщо полюси виразу — це саме нулі поліноміального знаменника.
+    Poly = None разом з PATH_NONE (знаменника немає) або PATH_GENERAL (потрібен загальний аналіз).
+    """
+    num, den = sp.fraction(sp.together(expr))
+    if not den.has(x):
+        return None, (PATH_NONE if _is_entire(num, x) else PATH_GENERAL)
+    if not den.is_polynomial(x) or not _is_entire(num, x):
+        return None, PATH_GENERAL
+    poly = sp.Poly(den, x)
+    path = PATH_ISOLATION if poly.domain.is_Exact else PATH_NUMERIC
+    return poly, path
+
+def _numeric_real_roots(poly: sp.Poly, tol: float = 1e-9) -> List[float]:
+    coeffs = np.array([complex(c) for c in poly.all_coeffs()])
+    roots = np.roots(coeffs)
+    real = sorted({round(float(r.real), 12) for r in roots if abs(r.imag) <= tol * max(1.0, abs(r))})
+    return real
+
+def real_poles(expr: sp.Expr, x: sp.Symbol) -> Tuple[Optional[List[sp.Expr]], str]:
+    """
+    Дійсні полюси виразу і шлях, яким їх знайдено.
+    Для PATH_GENERAL повертає None — викликач сам вирішує, чим рахувати (solve / singularities).
+    """
+    poly, path = polynomial_denominator(expr, x)
+    if path == PATH_NONE:
+        return [], path
+    if path == PATH_ISOLATION:
+        return list(dict.fromkeys(poly.real_roots())), path
+    if path == PATH_NUMERIC:
+        return [sp.Float(r) for r in _numeric_real_roots(poly)], path
+    return None, path
+
+def has_real_pole(expr: sp.Expr, x: sp.Symbol) -> Tuple[Optional[bool], str]:
+    """Лише факт наявності дійсного полюса (для валідатора C=2): Штурм замість обчислення коренів."""
+    poly, path = polynomial_denominator(expr, x)
+    if path == PATH_NONE:
+        return False, path
+    if path == PATH_ISOLATION:
+        return bool(poly.count_roots() > 0), path
+    if path == PATH_NUMERIC:
+        return len(_numeric_real_roots(poly)) > 0, path
+    return None, path
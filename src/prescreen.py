@@ -0,0 +1,81 @@
+import warnings
+import collections
+import numpy as np
+import sympy as sp
+from typing import Optional, Tuple
+from .evaluator import SAMPLE_RANGE, Y_BOUND, EvaluatorCache, get_evaluator_cache, has_special
+from .utils import time_limit, TimeLimitExceeded
+
+# --- REASON CODES ---
+PASS = "pass"
+NON_FINITE = "non_finite"
+COMPLEX = "complex_valued"
+OUT_OF_BOUNDS = "out_of_bounds"
+EVAL_ERROR = "eval_error"
+GUARD_TIMEOUT = "guard_timeout"   # не встигли перевірити -> рішення за воркером
+TOO_LARGE = "too_large"           # вираз завеликий для in-process перевірки -> рішення за воркером
+SPECIAL_NON_FINITE = "special_non_finite"   # nan/inf у виразі зі спецфункціями: mpmath-перерахунок -> у воркері
+
+# Коди, після яких кандидат пропускається далі (гейт не може нічого стверджувати)
+UNDECIDED = {PASS, GUARD_TIMEOUT, TOO_LARGE, SPECIAL_NON_FINITE}
+
+class NumericGate:
+    """
+    Швидкий in-process пре-скринінг: обчислює кандидата на тій самій сітці, що й _points_task,
+    і відкидає його з кодом причини ще до запуску воркерів метаданих і точок.
+    Значення потрапляють у спільний EvaluatorCache, тож семплер їх перевикористовує.
+    """
+    def __init__(self, n_points: int = 25, max_ops: int = 400, guard_seconds: float = 0.5,
+                 cache: Optional[EvaluatorCache] = None):
+        self.max_ops = max_ops
+        self.guard_seconds = guard_seconds
+        self.cache = cache if cache is not None else get_evaluator_cache()
+        self.grid_name = "sample"
+        if self.cache.grids["sample"] != (*SAMPLE_RANGE, n_points):
+            self.grid_name = self.cache.register_grid(f"sample_{n_points}", *SAMPLE_RANGE, n_points)
+        self.x_vals = self.cache.grid(self.grid_name)
+        self.stats = collections.Counter()
+
+    def screen(self, expr: sp.Expr, x: sp.Symbol) -> Tuple[bool, str]:
+        """Повертає (пропустити_далі, код_причини)."""
+        reason = self._classify(expr, x)
+        self.stats[reason] += 1
+        return reason in UNDECIDED, reason
+
+    def _classify(self, expr: sp.Expr, x: sp.Symbol) -> str:
+        if sp.count_ops(expr) > self.max_ops:
+            return TOO_LARGE
+        try:
+            with time_limit(self.guard_seconds):
+                f = self.cache.get(expr)
+                with np.errstate(all='ignore'):
+                    y_vals = self.cache.evaluate(expr, self.grid_name)
+                    if np.iscomplexobj(y_vals) and np.any(np.imag(y_vals) != 0):
+                        return COMPLEX
+                    y_vals = self._as_real(y_vals, self.x_vals)
+                    if not np.all(np.isfinite(y_vals)):
+                        # Різниця між "справжньою" нескінченністю і комплексним значенням (x**0.5 при x < 0)
+                        if self._is_complex(f):
+                            return COMPLEX
+                        return SPECIAL_NON_FINITE if has_special(expr) else NON_FINITE
+                    if np.any(np.abs(y_vals) > Y_BOUND):
+                        return OUT_OF_BOUNDS
+        except TimeLimitExceeded:
+            return GUARD_TIMEOUT
+        except Exception:
+            return EVAL_ERROR
+        return PASS
+
+    @staticmethod
+    def _as_real(y_vals, x_vals):
+        if np.isscalar(y_vals): y_vals = np.full_like(x_vals, y_vals)
+        return np.array(np.real(y_vals), dtype=float)
+
+    def _is_complex(self, f) -> bool:
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                y_c = np.asarray(f(self.x_vals.astype(complex)), dtype=complex)
+        except Exception:
+            return False
+        return bool(np.any(np.isfinite(y_c) & (np.abs(y_c.imag) > 1e-12)))
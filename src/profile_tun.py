@@ -1,17 +1,23 @@
 import cProfile
 import pstats
+import numpy as np
 from main import generate_benchmark_suite
 
-def profile_generator():
+def profile_generator(tasks_per_class: int = 1, top: int = 20):
+    """
+    Детермінований профіль (cProfile) невеликого запуску: по tasks_per_class завдань на клас.
+    Запуск з кореня репозиторію: python -m src.profile_tun
+    (семплювальний профайлер без накладних витрат cProfile: python main.py --profile profile.collapsed)
+    """
+    plan = np.full((4, 4, 4), tasks_per_class)
     profiler = cProfile.Profile()
     profiler.enable()
-    
-    # Запускаємо невеликий тест (наприклад, по 1 завданню на клас)
-    generate_benchmark_suite(tasks_per_class=1)
-    
+
+    generate_benchmark_suite(plan=plan, seed=0)
+
     profiler.disable()
     stats = pstats.Stats(profiler).sort_stats('cumtime')
-    stats.print_stats(20) # Виведемо топ-20 найповільніших функцій
+    stats.print_stats(top) # Виведемо топ найповільніших функцій
 
 if __name__ == "__main__":
-    profile_generator()
\ No newline at end of file
+    profile_generator()
@@ -1,54 +1,111 @@
 import numpy as np
 import sympy as sp
 import uuid
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from sympy.calculus.util import continuous_domain, singularities, periodicity
-from src.utils import run_with_timeout
+from sympy.printing.numpy import NumPyPrinter
+from src.utils import get_worker_pool
+from src.dedup import expression_digest
+from src.metacache import STATUS_OK, STATUS_TIMEOUT, STATUS_ERROR, KIND_SUBTERM, expr_kind
+from src.poles import PATH_GENERAL, PATH_NONE, real_poles
+from src.storage import points_payload
+from src.periodicity import PERIOD_GRID, estimate_period, period_to_str
+from src.evaluator import (SAMPLE_RANGE, Y_BOUND, CompiledEvaluator, EvaluatorCache, get_evaluator_cache, has_special,
+                           safe_modules)
 
 # --- WORKER FUNCTIONS ---
 
-def _meta_task(expr_str):
+def _singularities_list(e, x):
     """
-    Приймає рядок формули (щоб уникнути проблем піклінгу складних об'єктів),
-    парсить його з real=True і аналізує.
+    Сингулярності одного (під)виразу у вигляді списку рядків і шлях, яким їх знайдено.
+    Раціональні вирази та частки з поліноміальним знаменником ідуть швидким шляхом (src.poles);
+    singularities / solve — лише для трансцендентних знаменників.
     """
-    x = sp.Symbol('x', real=True)
-    try:
-        e = sp.parse_expr(str(expr_str), local_dict={'x': x})
-    except:
-        return {"error": "parse_error"}
-
-    meta = {"singularities": [], "is_periodic": False, "domain": "R"}
-    
-    # Periodicity
+    path = PATH_GENERAL
     try:
-        period = periodicity(e, x)
-        meta["is_periodic"] = period is not None
-        if meta["is_periodic"]: meta["period_value"] = str(period)
-    except: pass 
+        roots, path = real_poles(e, x)
+        if roots is not None:
+            return [str(r) for r in roots], path
 
-    # Singularities
-    try:
         sings = singularities(e, x)
         
         # SymPy часто повертає EmptySet, що добре
         if sings is sp.S.EmptySet:
-            meta["singularities"] = []
+            return [], path
         elif isinstance(sings, sp.FiniteSet):
-            meta["singularities"] = [str(s) for s in sings]
+            return [str(s) for s in sings], path
         else:
             # Для поліномів іноді буває дивна поведінка, спробуємо solve знаменника
             numer, denom = sp.fraction(sp.together(e))
             if denom != 1:
                 roots = sp.solve(denom, x)
                 if roots:
-                    meta["singularities"] = [str(r) for r in roots]
-                else:
-                    meta["singularities"] = []
-            else:
-                 meta["singularities"] = []
+                    return [str(r) for r in roots], path
+            return [], path
     except: 
-        meta["singularities"] = ["analysis_error"]
+        return ["analysis_error"], path
+
+def _meta_task(expr_str, known_subterms=None, confirm_period=False):
+    """
+    Приймає рядок формули (щоб уникнути проблем піклінгу складних об'єктів),
+    парсить його з real=True і аналізує.
+    known_subterms — {digest: singularities} для доданків/множників, уже відомих з кешу метаданих;
+    пораховані заново підтерми повертаються в meta["_subterms"] для збереження в кеші (None — без кешу:
+    сингулярності рахуються тим самим шляхом, але підтерми не повертаються).
+    confirm_period — додатково підтверджувати числовий період символьним periodicity().
+    """
+    x = sp.Symbol('x', real=True)
+    try:
+        e = sp.parse_expr(str(expr_str), local_dict={'x': x})
+    except:
+        return {"error": "parse_error"}
+
+    meta = {"singularities": [], "is_periodic": False, "domain": "R"}
+    paths = set()
+    
+    # Periodicity: числова оцінка; sympy.periodicity — лише опційне підтвердження (повільне)
+    try:
+        x_grid = np.linspace(*PERIOD_GRID)
+        period = estimate_period(CompiledEvaluator(e), x_grid)
+        meta["is_periodic"] = period is not None
+        if meta["is_periodic"]:
+            meta["period_value"] = period_to_str(period)
+            meta["period_source"] = "numeric"
+    except: pass
+    if confirm_period:
+        try:
+            symbolic = periodicity(e, x)
+            if symbolic is not None:
+                meta["is_periodic"] = True
+                meta["period_value"] = str(symbolic)
+                meta["period_source"] = "symbolic"
+        except: pass
+
+    # Singularities: для суми/добутку — об'єднання сингулярностей доданків/множників (з кешем підтермів чи без)
+    if isinstance(e, (sp.Add, sp.Mul)):
+        wants_subterms = known_subterms is not None
+        known_subterms = known_subterms or {}
+        computed = {}
+        merged = []
+        for arg in e.args:
+            if not arg.has(x):
+                continue
+            digest = expression_digest(arg)
+            sub = known_subterms.get(digest)
+            if sub is None:
+                sub, path = _singularities_list(arg, x)
+                computed[digest] = sub
+            else:
+                path = "cache"
+            paths.add(path)
+            merged.extend(s for s in sub if s not in merged)
+        meta["singularities"] = ["analysis_error"] if "analysis_error" in merged else merged
+        if wants_subterms:
+            meta["_subterms"] = computed
+    else:
+        meta["singularities"], path = _singularities_list(e, x)
+        paths.add(path)
+    meta["singularities_path"] = "+".join(sorted(paths)) or PATH_NONE
 
     # Domain
     try:
@@ -59,59 +116,224 @@ def _meta_task(expr_str):
     
     return meta
 
-def _points_task(expr_str, n):
-    x_sym = sp.Symbol('x', real=True)
-    try:
-        e = sp.parse_expr(str(expr_str), local_dict={'x': x_sym})
-    except:
-        raise ValueError("Parse error in worker")
-
-    x_vals = np.linspace(-3, 3, n)
-    
-    safe_modules = [
-        {'factorial': lambda n: np.clip(np.array(n, dtype=float), 0, 12)}, 
-        'numpy'
-    ]
-    
-    f = sp.lambdify(x_sym, e, modules=safe_modules)
+def _check_points(x_vals, y_vals):
+    """Політика меж для значень на сітці (спільна для воркера і значень із кешу обчислювачів)."""
     with np.errstate(all='ignore'):
-        y_vals = f(x_vals)
-        if np.isscalar(y_vals): y_vals = np.full_like(x_vals, y_vals)
+        if np.isscalar(y_vals) or np.ndim(y_vals) == 0: y_vals = np.full_like(x_vals, y_vals)
         y_vals = np.array(y_vals, dtype=float)
-        
-        if not np.all(np.isfinite(y_vals)) or np.any(np.abs(y_vals) > 5000):
+
+        if not np.all(np.isfinite(y_vals)) or np.any(np.abs(y_vals) > Y_BOUND):
             raise ValueError("Values out of bounds")
-            
+
         return x_vals, y_vals
 
+def _points_task(expr_str, n, evaluator=None):
+    x_vals = np.linspace(*SAMPLE_RANGE, n)
+    if evaluator is None:
+        x_sym = sp.Symbol('x', real=True)
+        try:
+            e = sp.parse_expr(str(expr_str), local_dict={'x': x_sym})
+        except:
+            raise ValueError("Parse error in worker")
+        evaluator = CompiledEvaluator(e)
+
+    with np.errstate(all='ignore'):
+        y_vals = evaluator(x_vals)
+    return _check_points(x_vals, y_vals)
+
 # --- MAIN CLASSES ---
 
 class DatasetSampler:
+    # Персистентний кеш метаданих (MetadataCache); None — завжди рахувати у воркері
+    metadata_cache = None
+    # Символьне підтвердження періоду (sympy.periodicity) поверх числової оцінки
+    confirm_period = False
     
     @staticmethod
     def calculate_metadata_safe(expr: sp.Expr, timeout: int = 5) -> Tuple[bool, Dict, str]:
-        # Передаємо рядок, а не об'єкт SymPy
-        success, result = run_with_timeout(_meta_task, (str(expr),), timeout)
-        if success:
-            return True, result, ""
-        else:
+        cache = DatasetSampler.metadata_cache
+        if cache is None:
+            # Передаємо рядок, а не об'єкт SymPy
+            success, result = get_worker_pool().run(_meta_task, (str(expr), None, DatasetSampler.confirm_period), timeout)
+            if success:
+                return True, result, ""
+            else:
+                return False, {"domain": "timeout"}, result
+
+        digest = expression_digest(expr)
+        kind = expr_kind(DatasetSampler.confirm_period)
+        hit = cache.get(digest, kind)
+        if hit is not None:
+            status, payload = hit
+            if status == STATUS_OK:
+                return True, dict(payload), ""
+            # Відомий помилковий вираз — повторно не аналізуємо; таймаут — лише якщо бюджет не більший за той,
+            # з яким він стався (записи без бюджету — з часів до адаптивних таймаутів, їх пробуємо ще раз)
+            if status != STATUS_TIMEOUT or timeout <= payload.get("timeout", 0):
+                return False, {"domain": "timeout"}, payload.get("error", status)
+
+        subterm_digests = [expression_digest(arg) for arg in expr.args] if isinstance(expr, (sp.Add, sp.Mul)) else []
+        known = cache.get_many(subterm_digests, KIND_SUBTERM)
+        success, result = get_worker_pool().run(_meta_task, (str(expr), known, DatasetSampler.confirm_period), timeout)
+        if not success:
+            status = STATUS_TIMEOUT if result == "Timeout" else STATUS_ERROR
+            cache.put(digest, status, {"error": result, "timeout": timeout}, kind=kind, formula=str(expr))
             return False, {"domain": "timeout"}, result
 
+        for sub_digest, sub_sings in result.pop("_subterms", {}).items():
+            cache.put(sub_digest, STATUS_OK, sub_sings, kind=KIND_SUBTERM)
+        cache.put(digest, STATUS_OK, result, kind=kind, formula=str(expr))
+        return True, result, ""
+
     @staticmethod
     def calculate_points_safe(expr: sp.Expr, n_points=25, timeout: int = 3) -> Tuple[bool, Tuple[np.ndarray, np.ndarray], str]:
-        success, result = run_with_timeout(_points_task, (str(expr), n_points), timeout)
+        cache = get_evaluator_cache()
+        # Значення на тій самій сітці вже пораховані in-process (пре-скринінг) — воркер не потрібен
+        if cache.grids["sample"] == (*SAMPLE_RANGE, n_points):
+            y_cached = cache.cached_values(expr, "sample")
+            # nan/inf спецфункцій in-process не перераховувалися через mpmath — це робить воркер під таймаутом
+            if y_cached is not None and has_special(expr) and not np.all(np.isfinite(y_cached)):
+                y_cached = None
+            if y_cached is not None:
+                try:
+                    return True, _check_points(cache.grid("sample"), y_cached), ""
+                except ValueError as e:
+                    return False, (None, None), str(e)
+
+        success, result = get_worker_pool().run(_points_task, (str(expr), n_points, cache.get(expr)), timeout)
         if success:
             return True, result, ""
         else:
             return False, (None, None), result
 
+    @staticmethod
+    def get_data(expr: sp.Expr, n_points=25, timeout: int = 5) -> Tuple[np.ndarray, np.ndarray, Dict]:
+        """Точки і метадані одного виразу (обидва етапи з таймаутами); ValueError, якщо етап не вдався."""
+        meta_success, metadata, meta_err = DatasetSampler.calculate_metadata_safe(expr, timeout=timeout)
+        if not meta_success:
+            raise ValueError(f"metadata: {meta_err}")
+        points_success, (x_vals, y_vals), points_err = DatasetSampler.calculate_points_safe(expr, n_points, timeout=timeout)
+        if not points_success:
+            raise ValueError(f"points: {points_err}")
+        return x_vals, y_vals, metadata
+
+    @staticmethod
+    def calculate_points_batch(exprs: List[sp.Expr], n_points=25) -> List[Tuple[bool, Tuple[np.ndarray, np.ndarray], str]]:
+        """
+        In-process пакетний варіант calculate_points_safe (той самий контракт для кожного виразу).
+        Без воркерів і таймаутів: для виразів, що вже пройшли пре-скринінг або з довіреного корпусу.
+        """
+        cache = get_evaluator_cache()
+        grid_name = "sample"
+        if cache.grids["sample"] != (*SAMPLE_RANGE, n_points):
+            grid_name = cache.register_grid(f"sample_{n_points}", *SAMPLE_RANGE, n_points)
+        batch = BatchEvaluator(cache).evaluate(exprs, grid_name)
+        results = []
+        for i in range(len(exprs)):
+            if batch.ok[i]:
+                results.append((True, (batch.x_vals, batch.y[i]), ""))
+            else:
+                results.append((False, (None, None), batch.errors[i] or "Values out of bounds"))
+        return results
+
+class BatchResult:
+    """
+    Результат пакетного обчислення: y — масив (n_expr, n_grid) з NaN там, де значення немає;
+    finite / in_bounds — поелементні маски; ok — вираз повністю проходить політику меж;
+    complex_valued — вираз дає комплексні значення на сітці; errors — текст помилки або None.
+    """
+    __slots__ = ("x_vals", "y", "finite", "in_bounds", "ok", "complex_valued", "errors")
+
+    def __init__(self, x_vals, y, complex_valued, errors):
+        self.x_vals = x_vals
+        self.y = y
+        self.complex_valued = complex_valued
+        self.errors = errors
+        with np.errstate(invalid='ignore'):
+            self.finite = np.isfinite(y)
+            self.in_bounds = self.finite & (np.abs(y) <= Y_BOUND)
+        self.ok = self.in_bounds.all(axis=1) & ~complex_valued
+
+class BatchEvaluator:
+    """
+    Пакетне обчислення багатьох виразів на спільній сітці: один згенерований модуль на весь пакет
+    (одна компіляція замість окремого lambdify на кожного кандидата) і векторизовані проходи для масок.
+    Кожен вираз у згенерованій функції обгорнутий у власний try, тож помилка одного
+    (наприклад, TypeError у нестандартній функції) не зриває весь пакет.
+    Результати кладуться в EvaluatorCache, тож гейт, валідатор і семплер їх перевикористовують.
+    """
+    def __init__(self, cache: Optional[EvaluatorCache] = None):
+        self.cache = cache if cache is not None else get_evaluator_cache()
+        self._x = sp.Symbol('x', real=True)
+        modules = safe_modules()
+        # Той самий простір імен і принтер, що їх будує lambdify для цих модулів
+        self._namespace = dict(sp.lambdify(self._x, self._x, modules=modules).__globals__)
+        self._printer = NumPyPrinter({
+            'fully_qualified_modules': False, 'inline': True, 'allow_unknown_functions': True,
+            'user_functions': {name: name for name in modules[0]},
+        })
+
+    def evaluate(self, exprs: List[sp.Expr], grid_name: str = "sample") -> BatchResult:
+        x_vals = self.cache.grid(grid_name)
+        y = np.full((len(exprs), len(x_vals)), np.nan)
+        complex_valued = np.zeros(len(exprs), dtype=bool)
+        errors = [None] * len(exprs)
+
+        pending = []
+        for i, expr in enumerate(exprs):
+            cached = self.cache.cached_values(expr, grid_name)
+            if cached is None:
+                pending.append(i)
+            else:
+                self._fill(i, cached, y, complex_valued, x_vals)
+
+        if pending:
+            batch_fn = self._compile([exprs[i] for i in pending])
+            with np.errstate(all='ignore'):
+                results = batch_fn(x_vals)
+            for i, raw in zip(pending, results):
+                if isinstance(raw, Exception):
+                    errors[i] = str(raw)
+                    continue
+                raw = self.cache.get(exprs[i]).fallback(x_vals, raw)
+                self._fill(i, raw, y, complex_valued, x_vals)
+                self.cache.store(exprs[i], grid_name, raw)
+
+        return BatchResult(x_vals, y, complex_valued, errors)
+
+    def _compile(self, exprs: List[sp.Expr]):
+        lines = ["def _batch(x):", f"    out = [None] * {len(exprs)}"]
+        for i, expr in enumerate(exprs):
+            # Вирази можуть містити x з різними припущеннями — зводимо до одного символу
+            expr = expr.subs({s: self._x for s in expr.free_symbols if s.name == 'x'})
+            try:
+                code = self._printer.doprint(expr)
+            except Exception as e:
+                code = f"_raise({str(e)!r})"
+            lines.append(f"    try: out[{i}] = {code}")
+            lines.append(f"    except Exception as e: out[{i}] = e")
+        lines.append("    return out")
+        namespace = dict(self._namespace, _raise=_raise_value_error)
+        exec("\n".join(lines), namespace)
+        return namespace["_batch"]
+
+    @staticmethod
+    def _fill(i, raw, y, complex_valued, x_vals):
+        raw = np.asarray(raw)
+        if np.iscomplexobj(raw):
+            complex_valued[i] = bool(np.any(np.imag(raw) != 0))
+            raw = np.real(raw)
+        y[i] = np.broadcast_to(raw.astype(float), x_vals.shape)
+
+def _raise_value_error(message):
+    raise ValueError(message)
+
 class TaskExporter:
     @staticmethod
-    def create_task(expr: sp.Expr, x: np.ndarray, y: np.ndarray, config: Any, metadata: Dict) -> Dict[str, Any]:
-        task_id = str(uuid.uuid4())[:8]
-        points_data = []
-        if x is not None and y is not None:
-             points_data = [{"x": round(float(xi), 3), "y": round(float(yi), 4)} for xi, yi in zip(x, y)]
+    def create_task(expr: sp.Expr, x: np.ndarray, y: np.ndarray, config: Any, metadata: Dict, task_id: str = None) -> Dict[str, Any]:
+        if task_id is None:
+            task_id = str(uuid.uuid4())[:8]
+        points_data = points_payload(x, y)
 
         return {
             "task_id": f"MCM_{config.a}{config.b}{config.c}_{task_id}",
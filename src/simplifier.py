@@ -0,0 +1,93 @@
+import time
+import collections
+import sympy as sp
+from typing import Tuple
+from .utils import time_limit, TimeLimitExceeded
+
+# --- TIERS ---
+TIER_CHEAP = "cheap"                    # expand / cancel / powsimp / together по піддеревах
+TIER_FULL = "simplify"                  # повний sp.simplify у межах бюджету
+TIER_FULL_TIMEOUT = "simplify_timeout"  # бюджет вичерпано, лишився результат дешевого рівня
+
+class TieredSimplifier:
+    """
+    Бюджетоване спрощення для ExpressionGenerator.
+
+    1. Дешеві канонікалізатори застосовуються знизу вгору; спрощені піддерева мемоїзуються
+       (LRU) і перевикористовуються між спробами генерації.
+    2. Повний sp.simplify запускається лише тоді, коли результат ще "зводиться"
+       (містить функції, для яких simplify має правила: trig/exp/log/спеціальні/Abs/Piecewise)
+       і не перевищує max_full_ops; час обмежено full_budget секундами.
+
+    stats містить кількість результатів і сумарний час для кожного рівня.
+    """
+    def __init__(self, full_budget: float = 2.0, max_full_ops: int = 40, expand_max_ops: int = 60,
+                 cache_size: int = 4096):
+        self.full_budget = full_budget
+        self.max_full_ops = max_full_ops
+        self.expand_max_ops = expand_max_ops
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self.stats = collections.defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        self.cache_hits = 0
+
+    def simplify(self, expr: sp.Expr) -> Tuple[sp.Expr, str]:
+        """Повертає (спрощений_вираз, рівень)."""
+        start = time.perf_counter()
+        result = self._cheap(expr)
+        tier = TIER_CHEAP
+
+        if self._is_reducible(result):
+            try:
+                with time_limit(self.full_budget):
+                    full = sp.simplify(result)
+                if sp.count_ops(full) <= sp.count_ops(result):
+                    result = full
+                tier = TIER_FULL
+            except TimeLimitExceeded:
+                tier = TIER_FULL_TIMEOUT
+
+        entry = self.stats[tier]
+        entry["count"] += 1
+        entry["seconds"] += time.perf_counter() - start
+        return result, tier
+
+    # --- CHEAP TIER ---
+
+    def _remember(self, expr, result):
+        self._cache[expr] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _cheap(self, expr):
+        if not isinstance(expr, sp.Basic) or expr.is_Atom:
+            return expr
+        cached = self._cache.get(expr)
+        if cached is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(expr)
+            return cached
+
+        args = tuple(self._cheap(arg) for arg in expr.args)
+        rebuilt = expr.func(*args) if args != expr.args else expr
+
+        if isinstance(rebuilt, (sp.Add, sp.Mul, sp.Pow)):
+            candidates = [rebuilt, sp.cancel(rebuilt), sp.powsimp(rebuilt), sp.together(rebuilt)]
+            if sp.count_ops(rebuilt) <= self.expand_max_ops:
+                candidates.append(sp.expand(rebuilt))
+            rebuilt = min(candidates, key=sp.count_ops)
+
+        self._remember(expr, rebuilt)
+        return rebuilt
+
+    def _is_reducible(self, expr) -> bool:
+        functions = expr.atoms(sp.Function)
+        if not functions:
+            # Раціональні/поліноміальні вирази після cancel вже канонічні
+            return False
+        # Одна функція від уже спрощеного аргументу нічого не дасть simplify;
+        # шанс є при взаємодії кількох функцій (trigsimp, exp*exp, log+log) або вкладеності (exp(log(x)))
+        nested = any(arg.has(sp.Function) for f in functions for arg in f.args)
+        if len(functions) < 2 and not nested:
+            return False
+        return sp.count_ops(expr) <= self.max_full_ops
@@ -0,0 +1,228 @@
+import os
+import json
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Файли сховища всередині каталогу
+POINTS_FILE = "points.f64"      # суцільний масив float64: для кожного завдання x[0..n), потім y[0..n)
+INDEX_FILE = "index.jsonl"      # один рядок на завдання: метадані + offset/n у POINTS_FILE
+
+DTYPE = np.dtype("<f8")
+
+def append_lines(path: str, lines: List[str]):
+    """Дописує пакет рядків JSONL одним записом (fsync — щоб чекпоінт не випередив дані)."""
+    if not lines:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+def repair_jsonl(path: str) -> int:
+    """Відрізає недописаний останній рядок (обірваний запис); повертає кількість відрізаних байтів."""
+    if not os.path.exists(path):
+        return 0
+    size = os.path.getsize(path)
+    with open(path, "rb+") as f:
+        pos = size
+        while pos > 0:
+            step = min(65536, pos)
+            f.seek(pos - step)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                pos = pos - step + newline + 1
+                break
+            pos -= step
+        if pos < size:
+            f.truncate(pos)
+    return size - pos
+
+def points_payload(x: np.ndarray, y: np.ndarray) -> list:
+    """Точки у форматі prompt_data JSONL (з тим самим округленням, що й TaskExporter)."""
+    if x is None or y is None:
+        return []
+    return [{"x": round(float(xi), 3), "y": round(float(yi), 4)} for xi, yi in zip(x, y)]
+
+class BinaryTaskStore:
+    """
+    Бінарне сховище завдань: точки — у суцільному файлі float64 (без округлення),
+    метадані (task_id, complexity_vector, ground_truth) — у легкому JSONL-індексі з offset/n.
+
+    Рядок індексу пишеться після точок і є "комітом" завдання: при відкритті хвіст points.f64,
+    на який не посилається жоден повний рядок індексу (обірваний запис), відрізається.
+    Індекс сумісний з DedupIndex (ground_truth.formula у кожному рядку).
+    """
+    def __init__(self, root: str):
+        self.root = root
+        self.points_path = os.path.join(root, POINTS_FILE)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        os.makedirs(root, exist_ok=True)
+        self.count, self.end = self._recover()
+
+    def _recover(self) -> Tuple[int, int]:
+        """Повертає (кількість завдань, кінець даних у числах) і обрізає недописані хвости."""
+        count, end, valid_bytes = 0, 0, 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break
+                    try:
+                        entry = json.loads(raw)
+                    except json.JSONDecodeError:
+                        break
+                    count += 1
+                    end = entry["offset"] + 2 * entry["n"]
+                    valid_bytes += len(raw)
+            if valid_bytes < os.path.getsize(self.index_path):
+                with open(self.index_path, "r+b") as f:
+                    f.truncate(valid_bytes)
+        if os.path.exists(self.points_path) and os.path.getsize(self.points_path) > end * DTYPE.itemsize:
+            with open(self.points_path, "r+b") as f:
+                f.truncate(end * DTYPE.itemsize)
+        return count, end
+
+    def append(self, task: Dict[str, Any], x: np.ndarray, y: np.ndarray):
+        """Дописує завдання: task — запис TaskExporter (prompt_data ігнорується), x/y — повні масиви."""
+        self.append_many([(task, x, y)])
+
+    def append_many(self, items: List[Tuple[Dict[str, Any], np.ndarray, np.ndarray]]):
+        """Пакетний запис: один write точок, потім один write рядків індексу."""
+        chunks, lines = [], []
+        end = self.end
+        for task, x, y in items:
+            x = np.ascontiguousarray(x, dtype=DTYPE)
+            y = np.ascontiguousarray(y, dtype=DTYPE)
+            chunks += [x.tobytes(), y.tobytes()]
+            entry = {key: value for key, value in task.items() if key != "prompt_data"}
+            entry["offset"], entry["n"] = end, len(x)
+            lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+            end += 2 * len(x)
+        with open(self.points_path, "ab") as f:
+            f.write(b"".join(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+        append_lines(self.index_path, lines)
+        self.end = end
+        self.count += len(items)
+
+    def append_stream(self, task: Dict[str, Any], n: int, fill) -> Any:
+        """
+        Дописує завдання з n точками без буфера в пам'яті: fill(x_view, y_view) пише прямо в memmap
+        points.f64 (напр. DenseSampler.sample) і повертає extra — його вміст додається в рядок індексу.
+        Якщо fill падає, зарезервований хвіст відрізається, індекс не змінюється.
+        """
+        start = self.end
+        with open(self.points_path, "ab") as f:
+            f.truncate((start + 2 * n) * DTYPE.itemsize)
+        try:
+            view = np.memmap(self.points_path, dtype=DTYPE, mode="r+", offset=start * DTYPE.itemsize, shape=(2 * n,))
+            extra = fill(view[:n], view[n:])
+            view.flush()
+            del view
+        except BaseException:
+            with open(self.points_path, "r+b") as f:
+                f.truncate(start * DTYPE.itemsize)
+            raise
+        with open(self.points_path, "rb+") as f:
+            os.fsync(f.fileno())
+        entry = {key: value for key, value in task.items() if key != "prompt_data"}
+        entry["offset"], entry["n"] = start, n
+        if extra:
+            entry.update(extra)
+        append_lines(self.index_path, [json.dumps(entry, ensure_ascii=False) + "\n"])
+        self.end = start + 2 * n
+        self.count += 1
+        return extra
+
+    def __len__(self) -> int:
+        return self.count
+
+class BinaryTaskReader:
+    """
+    Читач сховища: точки відображаються через np.memmap, тож x/y кожного завдання —
+    zero-copy view без парсингу JSON і без копіювання.
+    """
+    def __init__(self, root: str):
+        self.root = root
+        with open(os.path.join(root, INDEX_FILE), "r", encoding="utf-8") as f:
+            self.entries = [json.loads(line) for line in f if line.endswith("\n")]
+        points_path = os.path.join(root, POINTS_FILE)
+        size = os.path.getsize(points_path) // DTYPE.itemsize if os.path.exists(points_path) else 0
+        self.points = np.memmap(points_path, dtype=DTYPE, mode="r", shape=(size,)) if size else np.empty(0, DTYPE)
+        self._by_id = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, i: int) -> Tuple[Dict[str, Any], np.ndarray, np.ndarray]:
+        entry = self.entries[i]
+        start, n = entry["offset"], entry["n"]
+        return entry, self.points[start:start + n], self.points[start + n:start + 2 * n]
+
+    def __iter__(self) -> Iterator[Tuple[Dict[str, Any], np.ndarray, np.ndarray]]:
+        for i in range(len(self.entries)):
+            yield self[i]
+
+    def find(self, task_id: str) -> Optional[Tuple[Dict[str, Any], np.ndarray, np.ndarray]]:
+        if self._by_id is None:
+            self._by_id = {entry["task_id"]: i for i, entry in enumerate(self.entries)}
+        i = self._by_id.get(task_id)
+        return None if i is None else self[i]
+
+def export_jsonl(root: str, output_path: str) -> int:
+    """Відтворює звичайний JSONL для промптів LLM (точки з округленням prompt_data)."""
+    reader = BinaryTaskReader(root)
+    with open(output_path, "w", encoding="utf-8") as f:
+        for entry, x, y in reader:
+            task = {key: value for key, value in entry.items() if key not in ("offset", "n")}
+            task["prompt_data"] = {"points": points_payload(x, y)}
+            # Порядок ключів як у TaskExporter.create_task
+            ordered = {key: task[key] for key in ("task_id", "complexity_vector", "prompt_data", "ground_truth") if key in task}
+            f.write(json.dumps(ordered, ensure_ascii=False) + "\n")
+    return len(reader)
+
+def import_jsonl(jsonl_path: str, root: str) -> int:
+    """Переносить наявний JSONL у бінарне сховище (точки беруться з prompt_data, вже округлені)."""
+    store = BinaryTaskStore(root)
+    added = 0
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            task = json.loads(line)
+            points = task.get("prompt_data", {}).get("points", [])
+            store.append(task, [p["x"] for p in points], [p["y"] for p in points])
+            added += 1
+    return added
+
+# --- SINKS ---
+
+class JsonlTaskSink:
+    """Поточний формат: одне завдання з точками на рядок JSONL."""
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path   # файл, за яким будується DedupIndex
+        repair_jsonl(path)
+
+    def write(self, task: Dict[str, Any], x: np.ndarray, y: np.ndarray):
+        self.write_many([(task, x, y)])
+
+    def write_many(self, items: List[Tuple[Dict[str, Any], np.ndarray, np.ndarray]]):
+        lines = [json.dumps(dict(task, prompt_data={"points": points_payload(x, y)}), ensure_ascii=False) + "\n"
+                 for task, x, y in items]
+        append_lines(self.path, lines)
+
+class BinaryTaskSink:
+    """Бінарне сховище: точки в points.f64, метадані в index.jsonl."""
+    def __init__(self, root: str):
+        self.store = BinaryTaskStore(root)
+        self.path = root
+        self.index_path = self.store.index_path
+
+    def write(self, task: Dict[str, Any], x: np.ndarray, y: np.ndarray):
+        self.store.append(task, x, y)
+
+    def write_many(self, items: List[Tuple[Dict[str, Any], np.ndarray, np.ndarray]]):
+        self.store.append_many(items)
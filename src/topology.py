@@ -0,0 +1,157 @@
+import time
+import collections
+import numpy as np
+import sympy as sp
+from typing import List, Optional
+from .evaluator import SAMPLE_RANGE, EvaluatorCache, get_evaluator_cache
+
+# --- FEATURE KINDS ---
+POLE = "pole"    # |y| необмежено росте при звуженні інтервалу
+JUMP = "jump"    # стрибок, що не зменшується при звуженні інтервалу
+EDGE = "edge"    # межа області визначення / усувна точка (nan, inf без росту)
+
+class TopologyReport:
+    """Результат числового аналізу виразу на інтервалі семплювання."""
+    __slots__ = ("poles", "jumps", "edges", "nonfinite_fraction", "growth_orders", "extrema", "seconds")
+
+    def __init__(self):
+        self.poles: List[float] = []
+        self.jumps: List[float] = []
+        self.edges: List[float] = []
+        self.nonfinite_fraction = 0.0
+        self.growth_orders = 0.0    # log10(max|y| / медіана|y|)
+        self.extrema = 0            # кількість локальних екстремумів на грубій сітці
+        self.seconds = 0.0
+
+    @property
+    def is_regular(self) -> bool:
+        return not (self.poles or self.jumps or self.edges) and self.nonfinite_fraction == 0
+
+    @property
+    def is_singular(self) -> bool:
+        return bool(self.poles or self.jumps)
+
+    def is_complex(self, growth_orders: float = 3.0, extrema: int = 8) -> bool:
+        """C=3: швидке зростання, сильні коливання або поєднання різних особливостей."""
+        kinds = sum(bool(features) for features in (self.poles, self.jumps, self.edges))
+        return self.growth_orders >= growth_orders or self.extrema >= extrema or kinds >= 2
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class DiscontinuityDetector:
+    """
+    Векторизований числовий детектор полюсів, стрибків і неcкінченних ділянок (перший етап Axis C).
+
+    1. Вираз обчислюється на грубій сітці інтервалу семплювання (через спільний EvaluatorCache).
+    2. Підозрілі інтервали — з нескінченним кінцем або з приростом, що помітно більший за сусідні.
+    3. Кожен підозрілий інтервал одночасно (векторно) ділиться навпіл refine_levels разів,
+       лишаючи половину з більшим приростом.
+    4. За останні window рівнів порівнюються висота (менший скінченний |y| на кінцях) і приріст |Δy|:
+       висота росте в blowup_ratio разів -> полюс; приріст не зменшується -> стрибок;
+       один кінець нескінченний без росту -> межа області; інакше функція неперервна.
+    """
+    def __init__(self, n_points: int = 241, refine_levels: int = 16, window: int = 4,
+                 blowup_ratio: float = 2.0, jump_ratio: float = 0.25, neighbour_ratio: float = 1.2,
+                 max_candidates: int = 64, cache: Optional[EvaluatorCache] = None):
+        self.refine_levels = refine_levels
+        self.window = window
+        self.blowup_ratio = blowup_ratio
+        self.jump_ratio = jump_ratio
+        self.neighbour_ratio = neighbour_ratio
+        self.max_candidates = max_candidates
+        self.cache = cache if cache is not None else get_evaluator_cache()
+        self.grid_name = self.cache.register_grid(f"topology_{n_points}", *SAMPLE_RANGE, n_points)
+        self.x_vals = self.cache.grid(self.grid_name)
+        self.stats = collections.Counter()
+
+    @staticmethod
+    def _real(y_vals, x_vals) -> np.ndarray:
+        """Комплексні значення (поза областю визначення) -> nan."""
+        y_vals = np.asarray(y_vals)
+        if y_vals.ndim == 0:
+            y_vals = np.full_like(x_vals, y_vals, dtype=y_vals.dtype)
+        if np.iscomplexobj(y_vals):
+            y_vals = np.where(np.imag(y_vals) == 0, np.real(y_vals), np.nan)
+        return np.array(y_vals, dtype=float)
+
+    def analyze(self, expr: sp.Expr) -> TopologyReport:
+        start = time.perf_counter()
+        report = TopologyReport()
+        evaluator = self.cache.get(expr)
+        x_vals = self.x_vals
+        with np.errstate(all='ignore'):
+            y_vals = self._real(self.cache.evaluate(expr, self.grid_name), x_vals)
+
+            finite = np.isfinite(y_vals)
+            report.nonfinite_fraction = float(1.0 - finite.mean())
+            if finite.any():
+                abs_y = np.abs(y_vals[finite])
+                report.growth_orders = float(np.log10((abs_y.max() + 1e-12) / (np.median(abs_y) + 1e-3)))
+                steps = np.sign(np.diff(y_vals[finite]))
+                steps = steps[steps != 0]
+                report.extrema = int(np.count_nonzero(steps[1:] != steps[:-1]))
+
+            candidates = self._candidates(y_vals, finite)
+            if candidates.size:
+                self._refine(evaluator, x_vals[candidates], y_vals[candidates],
+                             x_vals[candidates + 1], y_vals[candidates + 1], report)
+
+        report.seconds = time.perf_counter() - start
+        self.stats["analyzed"] += 1
+        self.stats["seconds"] += report.seconds
+        return report
+
+    def _candidates(self, y_vals: np.ndarray, finite: np.ndarray) -> np.ndarray:
+        """Індекси лівих кінців підозрілих інтервалів (не більше max_candidates)."""
+        delta = np.abs(np.diff(y_vals))
+        bad_end = ~(finite[:-1] & finite[1:])
+        # Пропускаємо інтервали всередині суцільної нескінченної ділянки
+        bad_end &= finite[:-1] | finite[1:]
+        delta = np.where(np.isfinite(delta), delta, 0.0)
+        padded = np.concatenate(([np.nan], delta, [np.nan]))
+        neighbours = np.fmin(padded[:-2], padded[2:])
+        scale = np.median(delta) + 1e-12
+        ratio = delta / (neighbours + 1e-9 * scale)
+        steep = (ratio > self.neighbour_ratio) & (delta > scale)
+        order = np.argsort(-ratio)
+        picked = [i for i in order[:self.max_candidates] if steep[i]]
+        return np.array(sorted(set(picked) | set(np.flatnonzero(bad_end))), dtype=int)
+
+    def _refine(self, f, a, ya, b, yb, report: TopologyReport):
+        history_height, history_jump = [], []
+        for _ in range(self.refine_levels):
+            m = (a + b) / 2
+            ym = self._real(f(m), m)
+            d_left = np.abs(ym - ya)
+            d_right = np.abs(yb - ym)
+            d_left = np.where(np.isfinite(d_left), d_left, np.inf)
+            d_right = np.where(np.isfinite(d_right), d_right, np.inf)
+            go_left = d_left >= d_right
+            b, yb = np.where(go_left, m, b), np.where(go_left, ym, yb)
+            a, ya = np.where(go_left, a, m), np.where(go_left, ya, ym)
+            history_height.append(np.fmin(np.where(np.isfinite(ya), np.abs(ya), np.nan),
+                                          np.where(np.isfinite(yb), np.abs(yb), np.nan)))
+            history_jump.append(np.abs(yb - ya))
+
+        w = min(self.window, self.refine_levels - 1)
+        height_ratio = history_height[-1] / (history_height[-1 - w] + 1e-300)
+        jump_ratio = history_jump[-1] / (history_jump[-1 - w] + 1e-300)
+        both_finite = np.isfinite(ya) & np.isfinite(yb)
+        any_finite = np.isfinite(ya) | np.isfinite(yb)
+        blowup = any_finite & (height_ratio > self.blowup_ratio)
+
+        span = float(self.x_vals[-1] - self.x_vals[0])
+        location = (a + b) / 2
+        for i in range(len(location)):
+            if blowup[i]:
+                kind = report.poles
+            elif both_finite[i] and jump_ratio[i] > self.jump_ratio:
+                kind = report.jumps
+            elif not both_finite[i]:
+                kind = report.edges
+            else:
+                continue
+            point = round(float(location[i]), 6) + 0.0
+            if not any(abs(point - known) < 1e-3 * span for known in kind):
+                kind.append(point)
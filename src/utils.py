@@ -1,10 +1,18 @@
 import logging
+import time
 import sys
 import json
 import os
+import pickle
 import multiprocessing
+import threading
+import queue as queue_module
+import importlib
+import atexit
+import signal
+import contextlib
 import sympy as sp
-from typing import Set, Dict, Any
+from typing import Set, Dict, Any, Optional, Tuple
 
 def setup_logging():
     logger = logging.getLogger("MCM-Gen")
@@ -61,6 +69,31 @@ def append_to_file(filepath: str, data: Dict[str, Any]):
 
 # --- TIMEOUT INFRASTRUCTURE ---
 
+class TimeLimitExceeded(Exception):
+    pass
+
+@contextlib.contextmanager
+def time_limit(seconds: float):
+    """
+    Жорсткий in-process дедлайн через SIGALRM (лише POSIX і лише в головному потоці).
+    В інших випадках нічого не обмежує — викликач має мати власний захист (розмір виразу тощо).
+    Вкладені виклики не підтримуються: внутрішній скасовує зовнішній таймер.
+    """
+    if seconds <= 0 or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _handler(signum, frame):
+        raise TimeLimitExceeded()
+
+    previous = signal.signal(signal.SIGALRM, _handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
 def _worker(func, args, queue):
     """Допоміжний воркер для запуску функції в окремому процесі."""
     try:
@@ -89,4 +122,200 @@ def run_with_timeout(func, args=(), timeout=5):
     if not queue.empty():
         return queue.get()
     
-    return False, "Unknown Error (Worker died)"
\ No newline at end of file
+    return False, "Unknown Error (Worker died)"
+
+# --- PERSISTENT WORKER POOL ---
+
+# Модулі, які воркер імпортує одразу після старту (під spawn/forkserver це найдорожча частина запуску)
+WARM_MODULES = ("numpy", "sympy", "sympy.calculus.util", "src.sampler")
+
+def _pool_worker_loop(conn, warm_modules):
+    """Цикл постійного воркера: прогріває імпорти і виконує задачі з каналу до отримання None."""
+    for name in warm_modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        func, args = message
+        try:
+            conn.send((True, func(*args)))
+        except Exception as e:
+            conn.send((False, str(e)))
+
+class _PoolWorker:
+    """Один процес пулу разом із його кінцем каналу."""
+    def __init__(self, ctx, warm_modules):
+        self.conn, child_conn = ctx.Pipe(duplex=True)
+        self.process = ctx.Process(target=_pool_worker_loop, args=(child_conn, warm_modules), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks_done = 0
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Чекає сигналу про завершення прогріву імпортів."""
+        if self.ready:
+            return True
+        if self.conn.poll(timeout):
+            try:
+                self.ready = self.conn.recv()[0] == "ready"
+            except (EOFError, OSError):
+                self.ready = False
+        return self.ready
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        self.kill()
+
+class WorkerPool:
+    """
+    Пул постійних процесів з уже імпортованими sympy/numpy.
+    Кожна задача має власний дедлайн: воркер, що завис, вбивається і замінюється новим,
+    решта пулу продовжує роботу. Контракт run() такий самий, як у run_with_timeout: (success, result).
+    Безпечний для виклику з кількох потоків одночасно.
+    """
+    def __init__(self, size: int = 1, start_method: Optional[str] = None,
+                 warm_modules: Tuple[str, ...] = WARM_MODULES, max_tasks_per_worker: int = 200,
+                 startup_timeout: float = 60):
+        self.size = max(1, size)
+        self.ctx = multiprocessing.get_context(start_method)
+        self.warm_modules = warm_modules
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.startup_timeout = startup_timeout
+        self.stats = {"spawned": 0, "killed": 0, "recycled": 0, "tasks": 0, "timeouts": 0, "crashes": 0}
+        self._lock = threading.Lock()
+        self._idle = queue_module.Queue()
+        self._workers = []
+        self._closed = False
+        # Час, який кожен потік чекав на вільного воркера: це черга, а не тривалість задачі
+        self._local = threading.local()
+        # Після fork дочірній процес успадковує об'єкт пулу, але не його воркерів
+        self.owner_pid = os.getpid()
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _PoolWorker:
+        worker = _PoolWorker(self.ctx, self.warm_modules)
+        with self._lock:
+            self._workers.append(worker)
+            self.stats["spawned"] += 1
+        return worker
+
+    def _discard(self, worker: _PoolWorker, reason: str):
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            self.stats[reason] += 1
+        worker.kill()
+
+    def wait_ready(self):
+        """Блокує, доки всі воркери не прогріють імпорти (зручно для бенчмарків та старту генерації)."""
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            worker.wait_ready(self.startup_timeout)
+
+    def waited(self) -> float:
+        """Сумарний час, який поточний потік чекав у run() на вільного воркера (разом із прогрівом), с."""
+        return getattr(self._local, "waited", 0.0)
+
+    def run(self, func, args=(), timeout=5) -> Tuple[bool, Any]:
+        """Виконує func(*args) у вільному воркері з обмеженням часу."""
+        if self._closed:
+            raise RuntimeError("WorkerPool is closed")
+
+        start = time.perf_counter()
+        worker = self._idle.get()
+        # Прогрів не входить у бюджет задачі
+        if not worker.wait_ready(self.startup_timeout):
+            self._discard(worker, "crashes")
+            worker = self._spawn()
+            worker.wait_ready(self.startup_timeout)
+        self._local.waited = self.waited() + time.perf_counter() - start
+
+        with self._lock:
+            self.stats["tasks"] += 1
+        try:
+            try:
+                worker.conn.send((func, args))
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                # send() серіалізує повідомлення до запису в канал: воркер нічого не отримав і лишається вільним
+                self._idle.put(worker)
+                return False, str(e)
+            if not worker.conn.poll(timeout):
+                self._discard(worker, "killed")
+                with self._lock:
+                    self.stats["timeouts"] += 1
+                self._idle.put(self._spawn())
+                return False, "Timeout"
+            result = worker.conn.recv()
+        except (EOFError, OSError, BrokenPipeError):
+            self._discard(worker, "crashes")
+            self._idle.put(self._spawn())
+            return False, "Unknown Error (Worker died)"
+
+        worker.tasks_done += 1
+        if worker.tasks_done >= self.max_tasks_per_worker:
+            # Періодична заміна, щоб кеш SymPy у воркері не ріс безмежно
+            self._discard(worker, "recycled")
+            worker = self._spawn()
+        self._idle.put(worker)
+        return result
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_default_pool: Optional[WorkerPool] = None
+_default_pool_lock = threading.Lock()
+
+def get_worker_pool(size: int = 1) -> WorkerPool:
+    """Повертає спільний пул процесу (створюється при першому виклику)."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None or _default_pool._closed or _default_pool.owner_pid != os.getpid():
+            _default_pool = WorkerPool(size=size)
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+def shutdown_worker_pool():
+    """Зупиняє спільний пул (наприклад, у кінці generate_benchmark_suite)."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is not None and _default_pool.owner_pid == os.getpid():
+            _default_pool.close()
+            _default_pool = None
@@ -1,27 +1,88 @@
 import sympy as sp
 import numpy as np
+import collections
 from .config import ComplexityConfig
+from typing import List, Optional
+from .evaluator import get_evaluator_cache
+from .sampler import BatchEvaluator
+from .poles import has_real_pole
+from .topology import DiscontinuityDetector, TopologyReport
+from .periodicity import PeriodicityEstimator
 
 class TopologyFilter:
     """Топологічна валідація згідно з Axis C[cite: 132]."""
-    def __init__(self, config: ComplexityConfig):
+    def __init__(self, config: ComplexityConfig, cache=None, blacklist=None):
         self.config = config
+        # Опційно FailureKnowledge (src.failures); для C=2 не застосовується: полюси там і є ціллю
+        self.blacklist = blacklist if config.c != 2 else None
+        self.blacklist_hits = collections.Counter()   # (етап, код) -> кількість
+        self.last_rejection = None
+        self.cache = cache if cache is not None else get_evaluator_cache()
+        self.detector = DiscontinuityDetector(cache=self.cache)
+        self.periodicity = PeriodicityEstimator(cache=self.cache)
+        self.pole_paths = collections.Counter()   # шлях пошуку полюсів (src.poles) -> кількість
 
     def check(self, expr: sp.Expr) -> bool:
-        if self.config.c == 0: return self._is_regular(expr)
-        if self.config.c == 2: return self._has_asymptotes(expr) # [cite: 100]
-        # Додаткові перевірки C1 та C3 додаються тут
+        self.last_rejection = "topology"
+        if self.blacklist is not None:
+            hit = self.blacklist.match(expr)
+            if hit is not None:
+                self.blacklist_hits[hit] += 1
+                self.last_rejection = "blacklist:{}:{}".format(*hit)
+                return False
+        if self.config.c == 1: return self._is_periodic(expr)
+        report = self.topology(expr)
+        if report is None: return False
+        if self.config.c == 0: return report.is_regular and self._is_regular(expr)
+        if self.config.c == 2: return report.is_singular and self._has_asymptotes(expr, report) # [cite: 100]
+        if self.config.c == 3: return report.is_complex()
         return True
 
+    def prefill(self, exprs: List[sp.Expr]):
+        """Одним пакетом обчислює раунд кандидатів на сітках, потрібних check для цього C."""
+        batch = BatchEvaluator(self.cache)
+        if self.config.c == 1:
+            batch.evaluate(exprs, self.periodicity.grid_name)
+            return
+        batch.evaluate(exprs, self.detector.grid_name)
+        if self.config.c == 0:
+            batch.evaluate(exprs, "validate")
+
+    def check_batch(self, exprs: List[sp.Expr]) -> List[bool]:
+        """Перевірка раунду кандидатів: числові перевірки йдуть одним пакетом через BatchEvaluator."""
+        self.prefill(exprs)
+        return [self.check(expr) for expr in exprs]
+
+    def topology(self, expr: sp.Expr) -> Optional[TopologyReport]:
+        """Числовий аналіз особливостей на інтервалі семплювання (None, якщо вираз не обчислюється)."""
+        try:
+            return self.detector.analyze(expr)
+        except Exception:
+            self.detector.stats["eval_error"] += 1
+            return None
+
+    def _is_periodic(self, expr: sp.Expr) -> bool:
+        """Числова періодичність (C1): автокореляція + перевірка f(x + T) = f(x)."""
+        try:
+            return self.periodicity.estimate(expr) is not None
+        except Exception:
+            self.periodicity.stats["eval_error"] += 1
+            return False
+
     def _is_regular(self, expr: sp.Expr) -> bool:
         """Перевірка на гладкість (C0)[cite: 94]."""
-        f = sp.lambdify(self.config.x, expr, 'numpy')
-        test_vals = np.linspace(-5, 5, 50)
         try:
-            return np.all(np.isfinite(f(test_vals)))
+            return bool(np.all(np.isfinite(self.cache.evaluate(expr, "validate"))))
         except: return False
 
-    def _has_asymptotes(self, expr: sp.Expr) -> bool:
-        """Пошук полюсів (C2)[cite: 101]."""
-        _, den = sp.fraction(expr)
-        return den != 1 and len(sp.solve(den, self.config.x)) > 0
\ No newline at end of file
+    def _has_asymptotes(self, expr: sp.Expr, report: TopologyReport) -> bool:
+        """
+        Символьне підтвердження особливостей, знайдених числово (C2)[cite: 101].
+        Стрибки не потребують підтвердження; полюси звіряються зі знаменником швидким шляхом,
+        а для трансцендентних знаменників довіряємо числовому росту |y| (без sp.solve).
+        """
+        if report.jumps:
+            return True
+        found, path = has_real_pole(expr, self.config.x)
+        self.pole_paths[path] += 1
+        return True if found is None else found
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import collections
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from .dedup import formula_digest
+from .storage import INDEX_FILE, BinaryTaskReader, JsonlTaskSink, BinaryTaskSink
+from .writer import BufferedTaskWriter, count_cells
+
+# --- JOB STATUSES ---
+JOB_PENDING = "pending"
+JOB_LEASED = "leased"
+JOB_DONE = "done"
+
+# Файли шарда вузла (всередині <shards>/<node_id>/)
+SHARD_TASKS = "benchmark_tasks.jsonl"
+SHARD_STORE = "benchmark_tasks.store"
+SHARD_FAILED = "hanging_functions.jsonl"
+
+class WorkQueue:
+    """
+    Спільна черга задач (клітинки (A, B, C) або частини їхньої квоти) на SQLite з орендою.
+
+    Вузол бере задачу в оренду на ttl секунд і продовжує її (renew), поки працює;
+    оренда, що прострочилася (вузол помер), повертається в роботу наступним lease().
+    Заповнення (populate) ідемпотентне: кілька вузлів можуть стартувати з тим самим планом
+    (одна черга — один розподілений запуск; для нового плану — новий файл черги).
+    З'єднання відкривається ліниво в кожному процесі, як у MetadataCache.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            a INTEGER NOT NULL, b INTEGER NOT NULL, c INTEGER NOT NULL, chunk INTEGER NOT NULL,
+            quota INTEGER NOT NULL, done INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            owner TEXT,
+            lease_until REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            finished REAL,
+            UNIQUE (a, b, c, chunk)
+        )
+    """
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.clock = clock
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.stats = collections.Counter()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            # isolation_level=None: транзакції керуються явно (BEGIN IMMEDIATE у lease)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(self.SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def populate(self, jobs: List[Tuple[int, int, int, int, int, int]]) -> int:
+        """Додає задачі (a, b, c, chunk, quota, done), яких ще немає; повертає кількість нових."""
+        with self._lock:
+            conn = self._connection()
+            before = conn.total_changes
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (a, b, c, chunk, quota, done, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(*job, JOB_PENDING) for job in jobs],
+            )
+            conn.execute("COMMIT")
+            return conn.total_changes - before
+
+    def lease(self, owner: str, ttl: float) -> Optional[Tuple[int, Tuple[int, int, int, int, int, int]]]:
+        """Бере першу вільну або прострочену задачу; повертає (job_id, job) або None, якщо роботи немає."""
+        now = self.clock()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id, a, b, c, chunk, quota, done, status FROM jobs "
+                    "WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY id LIMIT 1",
+                    (JOB_PENDING, JOB_LEASED, now),
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE jobs SET status = ?, owner = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                                 (JOB_LEASED, owner, now + ttl, row[0]))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        self.stats["reclaimed" if row[7] == JOB_LEASED else "leased"] += 1
+        return row[0], tuple(row[1:7])
+
+    def _update(self, sql: str, args: tuple) -> bool:
+        with self._lock:
+            return self._connection().execute(sql, args).rowcount == 1
+
+    def renew(self, job_id: int, owner: str, ttl: float) -> bool:
+        """Продовжує оренду; False — оренду вже забрав інший вузол."""
+        return self._update("UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = ?",
+                            (self.clock() + ttl, job_id, owner, JOB_LEASED))
+
+    def complete(self, job_id: int, owner: str) -> bool:
+        done = self._update("UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND owner = ? AND status = ?",
+                            (JOB_DONE, self.clock(), job_id, owner, JOB_LEASED))
+        self.stats["completed" if done else "lost"] += 1
+        return done
+
+    def release(self, job_id: int, owner: str) -> bool:
+        """Повертає задачу в чергу (помилка вузла без очікування на прострочення оренди)."""
+        return self._update("UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL WHERE id = ? AND owner = ? AND status = ?",
+                            (JOB_PENDING, job_id, owner, JOB_LEASED))
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+class LeaseKeeper:
+    """Фоновий потік, що продовжує оренду кожні ttl/3 секунд, поки вузол обробляє задачу."""
+    def __init__(self, queue: WorkQueue, job_id: int, owner: str, ttl: float):
+        self.queue, self.job_id, self.owner, self.ttl = queue, job_id, owner, ttl
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 3):
+            if not self.queue.renew(self.job_id, self.owner, self.ttl):
+                self.lost = True
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+class SharedOutput:
+    """
+    Знімок злитого виходу лише для читання: лічильники клітинок (для залишку квоти, як Checkpoint)
+    і дайджести формул (як DedupIndex). Вузли не пишуть сайдкарів спільного виходу — це робить лише злиття.
+    """
+    def __init__(self, index_path: str, failed_path: Optional[str] = None):
+        self.cells, _ = count_cells(index_path)
+        self.digests = set(_formula_digests(index_path))
+        self.failed = set(_formula_digests(failed_path)) if failed_path else set()
+
+    def count(self, a: int, b: int, c: int) -> int:
+        return self.cells[f"{a},{b},{c}"]
+
+def _formula_digests(path: str) -> Iterator[int]:
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n") or not line.strip():
+                continue
+            try:
+                formula = json.loads(line).get("ground_truth", {}).get("formula", "")
+            except json.JSONDecodeError:
+                continue
+            if formula:
+                yield formula_digest(formula)
+
+# --- SHARDS ---
+
+def iter_shard(shard_dir: str, kind: str = "tasks") -> Iterator[Tuple[Dict[str, Any], Any, Any]]:
+    """
+    Записи шарда вузла: (task, x, y). kind="tasks" — завдання (JSONL або бінарне сховище),
+    kind="failed" — невдалі (x, y = None). Недописаний останній рядок (вузол убито під час запису) пропускається.
+    """
+    if kind == "tasks" and os.path.isdir(os.path.join(shard_dir, SHARD_STORE)):
+        root = os.path.join(shard_dir, SHARD_STORE)
+        if os.path.exists(os.path.join(root, INDEX_FILE)):
+            for entry, x, y in BinaryTaskReader(root):
+                # Порядок ключів як у TaskExporter.create_task (prompt_data заповнює sink)
+                task = {"task_id": entry["task_id"], "complexity_vector": entry["complexity_vector"], "prompt_data": {}}
+                task.update((key, value) for key, value in entry.items() if key not in ("offset", "n"))
+                yield task, x, y
+        return
+    path = os.path.join(shard_dir, SHARD_TASKS if kind == "tasks" else SHARD_FAILED)
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n") or not line.strip():
+                continue
+            task = json.loads(line)
+            if kind != "tasks":
+                yield task, None, None
+                continue
+            points = task.get("prompt_data", {}).get("points", [])
+            yield task, [p["x"] for p in points], [p["y"] for p in points]
+
+def merge_shards(shards_root: str, sink, failed_path: str) -> collections.Counter:
+    """
+    Ідемпотентно зливає шарди всіх вузлів у спільний вихід: ключ дедуплікації — formula_digest
+    (той самий, що в DedupIndex), тож повторне злиття або задача, виконана двома вузлами
+    (прострочена оренда), не дають дублікатів. Шарди обробляються в порядку імен вузлів.
+    """
+    stats = collections.Counter()
+    nodes = sorted(name for name in os.listdir(shards_root) if os.path.isdir(os.path.join(shards_root, name))) \
+        if os.path.isdir(shards_root) else []
+    with BufferedTaskWriter(sink, failed_path) as writer:
+        for node in nodes:
+            shard_dir = os.path.join(shards_root, node)
+            for kind in ("tasks", "failed"):
+                for task, x, y in iter_shard(shard_dir, kind):
+                    digest = formula_digest(task["ground_truth"]["formula"])
+                    if digest in writer:
+                        stats["duplicates"] += 1
+                        continue
+                    if kind == "tasks":
+                        writer.write_task(digest, task, x, y)
+                    else:
+                        writer.write_failed(digest, task)
+                    stats[kind] += 1
+    stats["nodes"] = len(nodes)
+    return stats
+
+def shard_sink(shard_dir: str, storage: str = "jsonl"):
+    os.makedirs(shard_dir, exist_ok=True)
+    if storage == "binary":
+        return BinaryTaskSink(os.path.join(shard_dir, SHARD_STORE))
+    return JsonlTaskSink(os.path.join(shard_dir, SHARD_TASKS))
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import collections
+from typing import Any, Dict, List, Optional, Tuple
+from .dedup import DedupIndex
+from .storage import append_lines, repair_jsonl
+
+def _cell_key(vector: Dict[str, int]) -> str:
+    return f"{vector['a']},{vector['b']},{vector['c']}"
+
+def count_cells(path: str, start: int = 0) -> Tuple[collections.Counter, int]:
+    """Кількість завдань по клітинках у JSONL (від байта start); повертає (лічильники, кінець)."""
+    counts = collections.Counter()
+    end = start
+    if not os.path.exists(path):
+        return counts, 0
+    with open(path, "rb") as f:
+        f.seek(start)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            end += len(raw)
+            try:
+                counts[_cell_key(json.loads(raw)["complexity_vector"])] += 1
+            except (json.JSONDecodeError, KeyError):
+                continue
+    return counts, end
+
+class Checkpoint:
+    """
+    Невеликий JSON-чекпоінт поруч із файлом завдань: кількість завдань по клітинках (A,B,C)
+    і розмір файлу, який ці лічильники покривають. Пишеться атомарно (tmp + os.replace).
+    Якщо файл виріс поза чекпоінтом — дораховується лише хвіст; якщо зменшився — повний перерахунок.
+    """
+    def __init__(self, data_path: str, path: Optional[str] = None):
+        self.data_path = data_path
+        self.path = path or data_path + ".ckpt"
+        self.cells = collections.Counter()
+        self.covered = 0
+        self.load()
+
+    def load(self):
+        size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        state = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                state = {}
+        covered = state.get("covered", 0)
+        if not state or covered > size:
+            self.cells, self.covered = count_cells(self.data_path)
+        else:
+            tail, self.covered = count_cells(self.data_path, covered)
+            self.cells = collections.Counter(state.get("cells", {})) + tail
+        if self.covered != covered:
+            self.save()
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"covered": self.covered, "cells": dict(sorted(self.cells.items())), "updated": time.time()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def count(self, a: int, b: int, c: int) -> int:
+        return self.cells[f"{a},{b},{c}"]
+
+class BufferedTaskWriter:
+    """
+    Буферизований запис завдань і невдач для головного процесу.
+
+    Записи накопичуються в пам'яті й скидаються пакетом, коли буфер перевищує max_records записів
+    або max_bytes (оцінка за точками), або минуло max_seconds від попереднього скидання.
+    Порядок скидання: дані (один write + fsync) -> індекси дедуплікації -> атомарний чекпоінт,
+    тож обірваний запуск лишає щонайбільше недописаний хвіст, який відрізається при наступному відкритті.
+    Дайджести в буфері вже враховуються в `digest in writer` (дедуплікація між клітинками).
+    """
+    def __init__(self, sink, failed_path: str, max_records: int = 200, max_bytes: int = 4 << 20,
+                 max_seconds: float = 5.0):
+        self.sink = sink
+        self.failed_path = failed_path
+        repair_jsonl(failed_path)
+        self.seen = DedupIndex(sink.index_path)
+        self.failed = DedupIndex(failed_path)
+        self.checkpoint = Checkpoint(sink.index_path)
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self._tasks: List[Tuple[Dict[str, Any], Any, Any]] = []
+        self._task_digests: List[int] = []
+        self._failed: List[str] = []
+        self._failed_digests: List[int] = []
+        self._pending = set()
+        self._pending_cells = collections.Counter()
+        self._bytes = 0
+        self._last_flush = time.monotonic()
+        self.stats = collections.Counter()
+
+    def __contains__(self, digest: int) -> bool:
+        return digest in self._pending or digest in self.seen or digest in self.failed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_task(self, digest: int, task: Dict[str, Any], x, y):
+        self._tasks.append((task, x, y))
+        self._task_digests.append(digest)
+        self._pending.add(digest)
+        self._pending_cells[_cell_key(task["complexity_vector"])] += 1
+        self._bytes += 32 * len(x) + 512
+        self._maybe_flush()
+
+    def write_failed(self, digest: int, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self._failed.append(line)
+        self._failed_digests.append(digest)
+        self._pending.add(digest)
+        self._bytes += len(line)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if (len(self._tasks) + len(self._failed) >= self.max_records or self._bytes >= self.max_bytes
+                or time.monotonic() - self._last_flush >= self.max_seconds):
+            self.flush()
+
+    def flush(self):
+        if not self._tasks and not self._failed:
+            return
+        if self._tasks:
+            self.sink.write_many(self._tasks)
+            self.seen.add_many(self._task_digests)
+            self.checkpoint.cells.update(self._pending_cells)
+            self.checkpoint.covered = os.path.getsize(self.sink.index_path)
+            self.checkpoint.save()
+        if self._failed:
+            append_lines(self.failed_path, self._failed)
+            self.failed.add_many(self._failed_digests)
+        self.stats["flushes"] += 1
+        self.stats["tasks"] += len(self._tasks)
+        self.stats["failed"] += len(self._failed)
+        self._tasks, self._task_digests, self._failed, self._failed_digests = [], [], [], []
+        self._pending.clear()
+        self._pending_cells.clear()
+        self._bytes = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,44 @@
+import json
+import pandas as pd
+from src.analyzer import DatasetAnalyzer
+
+def _write(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        for formula, (a, b, c), sings in rows:
+            f.write(json.dumps({"task_id": formula, "complexity_vector": {"a": a, "b": b, "c": c},
+                                "prompt_data": {"points": [{"x": 0.0, "y": 0.0}]},
+                                "ground_truth": {"formula": formula, "properties": {"singularities": sings}}}) + "\n")
+
+def test_streaming_matches_in_memory(tmp_path):
+    """Потоковий аналіз частинами дає ті самі рядки й звіт, що й in-memory шлях."""
+    bench, hanging = tmp_path / "tasks.jsonl", tmp_path / "hanging.jsonl"
+    _write(bench, [("sin(x) + x", (0, 1, 0), []), ("x**2", (0, 3, 0), []), ("1/(x - 1)", (1, 0, 2), []),
+                   ("gamma(x)", (0, 1, 0), ["0"]), ("x +* 1", (0, 0, 0), [])])
+    _write(hanging, [("exp(exp(x))", (2, 1, 0), [])])
+
+    streamed = DatasetAnalyzer(str(bench), str(hanging))
+    output = streamed.run(output=str(tmp_path / "result.csv"), chunk_size=2)
+    result = pd.read_csv(output)
+    assert len(result) == 6
+    assert result['status'].tolist() == ['success'] * 5 + ['failed']
+    assert result.loc[1, 'under_complex'] and result.loc[3, 'has_illegal_ops'] and result.loc[2, 'topo_mismatch']
+    assert result.loc[4, 'parse_error']
+
+    in_memory = DatasetAnalyzer(str(bench), str(hanging))
+    in_memory.load_data()
+    in_memory.analyze_compliance()
+    assert in_memory.get_statistics() == streamed.get_statistics()
+    assert "Всього завдань: 6" in streamed.get_statistics()
+
+def test_near_duplicates_by_cell(tmp_path):
+    bench, hanging = tmp_path / "tasks.jsonl", tmp_path / "hanging.jsonl"
+    _write(bench, [("x*(x + 1)", (0, 0, 0), []), ("x**2 + x", (0, 0, 0), []), ("x**2 + x + 3", (0, 0, 0), []),
+                   ("x**2 - x", (0, 0, 0), []), ("sin(x)", (0, 1, 0), []), ("-2*sin(x)", (0, 1, 0), []),
+                   ("x**2 + x", (1, 0, 0), []), ("x*(x + 1)", (1, 0, 0), []), ("log(x - 10)", (0, 1, 0), [])])
+    _write(hanging, [])
+    clusters = DatasetAnalyzer(str(bench), str(hanging)).find_near_duplicates(chunk_size=3)
+    groups = {cell: sorted((group["kind"], sorted(group["tasks"])) for group in found) for cell, found in clusters.items()}
+    # Клітинки групуються окремо; log(x - 10) не має скінченних значень і не індексується
+    assert groups == {"0,0,0": [("affine", ["x*(x + 1)", "x**2 + x", "x**2 + x + 3"])],
+                      "0,1,0": [("affine", ["-2*sin(x)", "sin(x)"])],
+                      "1,0,0": [("equivalent", ["x*(x + 1)", "x**2 + x"])]}
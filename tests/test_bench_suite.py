@@ -0,0 +1,16 @@
+import json
+from benchmarks.bench_suite import compare, load_corpus
+
+def test_compare_flags_regressions_by_direction():
+    baseline = {"results": {"generator/0,0,0": {"exprs_per_s": 100.0}, "metadata": {"p95_ms": 10.0, "failures": 0}}}
+    current = {"results": {"generator/0,0,0": {"exprs_per_s": 60.0}, "metadata": {"p95_ms": 12.0, "failures": 3}}}
+    assert compare(baseline, current, threshold=0.3) == ["generator/0,0,0.exprs_per_s: 60.0 < 100.0 (-40%)"]
+    current["results"]["metadata"]["p95_ms"] = 20.0
+    assert len(compare(baseline, current, threshold=0.5)) == 1
+
+def test_corpus_is_fixed_by_seed(tmp_path):
+    path = tmp_path / "tasks.jsonl"
+    path.write_text("".join(json.dumps({"complexity_vector": {"a": 0, "b": 0, "c": i % 4},
+                                        "ground_truth": {"formula": f"x + {i}"}}) + "\n" for i in range(30)), encoding="utf-8")
+    assert load_corpus(str(path), 5, seed=1) == load_corpus(str(path), 5, seed=1)
+    assert len(load_corpus(str(path), 50, seed=1)) == 30 and load_corpus(str(tmp_path / "none.jsonl"), 5, 1) == []
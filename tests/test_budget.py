@@ -0,0 +1,36 @@
+import json
+from src.budget import LatencyBudget, CircuitBreaker, load_history, failure_rate
+
+def _record(c, properties):
+    return json.dumps({"complexity_vector": {"a": 0, "b": 0, "c": c},
+                       "ground_truth": {"formula": "x", "properties": properties}}) + "\n"
+
+def test_latency_budget_percentiles_and_clamps():
+    budget = LatencyBudget(min_samples=3)
+    assert budget.timeout("metadata") == 5.0          # до статистики — за замовчуванням
+    budget.observe_many("metadata", [0.01, 0.02, 0.03])
+    assert budget.timeout("metadata") == 1.0          # швидка клітинка: нижня межа
+    budget.observe_many("points", [2.5, 2.9, 3.0])
+    assert 3.0 < budget.timeout("points") <= 6.0      # повільна: більше за старий, але не вище стелі
+
+def test_circuit_breaker_opens_on_failure_rate():
+    breaker = CircuitBreaker(threshold=0.75, min_attempts=4, window=8)
+    for failed in (True, True, True):
+        breaker.record(failed)
+    assert not breaker.is_open                        # замало спроб
+    breaker.record(False)
+    assert breaker.is_open and breaker.failure_rate == 0.75
+
+def test_history_from_records(tmp_path):
+    tasks, failed = tmp_path / "tasks.jsonl", tmp_path / "failed.jsonl"
+    tasks.write_text(_record(0, {"stage_seconds": {"metadata": 0.2, "points": 0.01}}), encoding="utf-8")
+    failed.write_text(_record(0, {"stage": "metadata", "stage_seconds": {"metadata": 5.0}})
+                      + _record(1, {"stage": "prescreen"}) + _record(2, {"stage": "points"}) * 3, encoding="utf-8")
+    history = load_history(str(tasks), str(failed))
+    assert history["0,0,0"]["samples"] == {"metadata": [0.2, 5.0], "points": [0.01]}
+    assert failure_rate(history["0,0,0"]) == 0.5 and failure_rate(history["0,0,2"]) == 1.0
+    # Відмови пре-скринінгу не доходили до дорогих етапів і на чергу клітинок не впливають
+    assert failure_rate(history.get("0,0,1")) == 0.0 and failure_rate(history.get("1,1,1")) == 0.0
+    # Лише хвіст великого файлу: обрізаний перший рядок пропускається
+    tail = load_history(str(tasks), str(failed), tail_bytes=2 * len(_record(2, {"stage": "points"})) - 1)
+    assert tail["0,0,2"]["failures"] == 1 and tail["0,0,0"]["failures"] == 0
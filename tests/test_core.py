@@ -9,7 +9,8 @@ def test_expression_contains_x():
     config = ComplexityConfig(1, 1, 0)
     gen = ExpressionGenerator(config)
     expr = gen.generate()
-    assert expr.has(sp.Symbol('x')), f"Вираз {expr} не містить змінну x"
+    # Генератор працює з дійсним символом config.x (Symbol('x', real=True) != Symbol('x'))
+    assert expr.has(config.x), f"Вираз {expr} не містить змінну x"
 
 def test_sampler_output_format():
     """Перевірка, що семплер видає рівно n точок і вони є дійсними."""
@@ -26,4 +27,23 @@ def test_sampler_output_format():
 def test_config_mapping(a, b, c):
     """Перевірка, що конфіг правильно мапить рівні на глибину."""
     config = ComplexityConfig(a, b, c)
-    assert config.max_depth > 0
\ No newline at end of file
+    assert config.max_depth > 0
+
+def test_generator_seeded_rng_is_reproducible():
+    """Однаковий seed потоку RNG дає однаковий вираз (основа детермінованої паралельної генерації)."""
+    import random
+    config = ComplexityConfig(1, 1, 0)
+    first = ExpressionGenerator(config, rng=random.Random(7)).generate()
+    second = ExpressionGenerator(config, rng=random.Random(7)).generate()
+    assert first == second
+
+@pytest.mark.parametrize("a,b,c", [(0,3,2), (1,2,0), (2,1,1)])
+def test_constructive_mode_guarantees_target_operator(a, b, c):
+    """Конструктивний режим не скочується до голого x і завжди містить оператор рівня B."""
+    import random
+    from src.config import OP_SETS
+    gen = ExpressionGenerator(ComplexityConfig(a, b, c), rng=random.Random(3))
+    for _ in range(5):
+        expr = gen.generate()
+        assert any(isinstance(node, tuple(OP_SETS[b])) for node in sp.preorder_traversal(expr))
+    assert gen.counters["fallbacks"] == 0
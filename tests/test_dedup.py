@@ -0,0 +1,31 @@
+import json
+import sympy as sp
+from src.dedup import expression_digest, formula_digest, DedupIndex
+
+def test_digest_is_structural():
+    """Ключ не залежить від порядку аргументів і припущень символу, але розрізняє різні вирази."""
+    x = sp.Symbol('x', real=True)
+    e1 = sp.Add(sp.sin(x), x**2, evaluate=False)
+    e2 = sp.Add(x**2, sp.sin(x), evaluate=False)
+    assert expression_digest(e1) == expression_digest(e2)
+    assert formula_digest("x**2 + sin(x)") == expression_digest(e1)
+    assert expression_digest(x**2) != expression_digest(x**3)
+
+def test_index_persists_and_catches_up(tmp_path):
+    data = tmp_path / "tasks.jsonl"
+    data.write_text(json.dumps({"ground_truth": {"formula": "x**3"}}) + "\n", encoding="utf-8")
+    index = DedupIndex(str(data))
+    assert formula_digest("x**3") in index
+
+    # Запис через генератор: рядок + add()
+    with open(data, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"ground_truth": {"formula": "sin(x)"}}) + "\n")
+    index.add(formula_digest("sin(x)"))
+    # Ручне дописування поза індексом
+    with open(data, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"ground_truth": {"formula": "exp(x)"}}) + "\n")
+
+    reloaded = DedupIndex(str(data))
+    assert len(reloaded) == 3
+    assert formula_digest("exp(x)") in reloaded
+    assert reloaded.covered == data.stat().st_size
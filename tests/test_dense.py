@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+import sympy as sp
+from src.dense import DenseSampler, densify
+from src.evaluator import CompiledEvaluator
+from src.storage import BinaryTaskReader, BinaryTaskStore
+
+x = sp.Symbol('x', real=True)
+
+def _evaluator(formula):
+    return CompiledEvaluator(sp.parse_expr(formula, local_dict={'x': x}))
+
+def test_dense_sampler_refines_near_pole_and_masks():
+    n = 20000
+    xs, ys = np.empty(n), np.empty(n)
+    stats = DenseSampler(n, chunk_size=1000).sample(_evaluator("1/(x - 0.3)"), xs, ys)
+    assert np.all(np.diff(xs) > 0) and xs[0] == -3 and xs[-1] == 3
+    assert stats["refined"] == n // 4 and 0 < stats["masked"] == np.isnan(ys).sum()
+    # Біля полюса щільність значно вища за базову (~0.3 точки на 0.0001)
+    assert np.sum(np.abs(xs - 0.3) < 0.01) > 10 * np.sum(np.abs(xs - 1.3) < 0.01)
+    finite = ~np.isnan(ys)
+    assert np.allclose(ys[finite], 1 / (xs[finite] - 0.3))
+    with pytest.raises(ValueError):
+        DenseSampler(1000).sample(_evaluator("log(-x**2 - 1)"), np.empty(1000), np.empty(1000))
+
+def test_append_stream_and_densify(tmp_path):
+    store = BinaryTaskStore(str(tmp_path / "s"))
+    with pytest.raises(RuntimeError):
+        store.append_stream({"task_id": "bad"}, 100, lambda xs, ys: (_ for _ in ()).throw(RuntimeError()))
+    assert len(store) == 0 and (tmp_path / "s" / "points.f64").stat().st_size == 0
+
+    source = tmp_path / "tasks.jsonl"
+    source.write_text('{"task_id": "T1", "complexity_vector": {"a": 0, "b": 1, "c": 1}, "prompt_data": {"points": []},'
+                      ' "ground_truth": {"formula": "tan(x)"}}\n', encoding="utf-8")
+    assert densify(str(source), str(tmp_path / "d"), 5000, chunk_size=512)["tasks"] == 1
+    assert densify(str(source), str(tmp_path / "d"), 5000)["skipped"] == 1
+    entry, xs, ys = BinaryTaskReader(str(tmp_path / "d"))[0]
+    assert entry["n"] == 5000 and entry["dense"]["masked"] == np.isnan(ys).sum() and np.all(np.diff(xs) > 0)
@@ -0,0 +1,84 @@
+import pickle
+import numpy as np
+import sympy as sp
+from src.evaluator import EvaluatorCache
+
+def test_cache_counters_and_eviction():
+    x = sp.Symbol('x', real=True)
+    cache = EvaluatorCache(maxsize=2)
+    cache.get(x**2)
+    cache.get(x**2)
+    cache.get(sp.sin(x))
+    cache.get(sp.cos(x))
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 3
+    assert cache.stats["evictions"] == 1
+    assert len(cache) == 2
+
+def test_grid_values_are_shared_and_picklable():
+    """Значення, пораховані одним етапом, доступні іншим і переживають передачу у воркер."""
+    x = sp.Symbol('x', real=True)
+    cache = EvaluatorCache()
+    y = cache.evaluate(x**2 + 1, "sample")
+    # Той самий вираз без припущень символу має той самий ключ
+    assert cache.cached_values(sp.Symbol('x')**2 + 1, "sample") is y
+
+    shipped = pickle.loads(pickle.dumps(cache))
+    assert np.allclose(shipped.cached_values(x**2 + 1, "sample"), y)
+    assert np.allclose(shipped.get(x**3)(np.array([2.0])), [8.0])
+
+def test_batch_evaluator_masks_and_isolated_errors():
+    """Пакет повертає маски по кожному виразу; помилка одного виразу не зриває решту."""
+    from src.sampler import BatchEvaluator
+    x = sp.Symbol('x', real=True)
+    cache = EvaluatorCache()
+    exprs = [x**2, 1 / (x - 1), x**0.5, sp.exp(sp.exp(x)), sp.Integer(3) + 0 * x]
+    result = BatchEvaluator(cache).evaluate(exprs, "sample")
+    assert result.y.shape == (5, 25)
+    assert list(result.ok) == [True, False, False, False, True]
+    assert not result.finite[2].all()
+    assert not result.finite[1].all() and result.finite[3].all() and not result.in_bounds[3].all()
+    # Значення потрапили в спільний контекст
+    assert cache.cached_values(x**2, "sample") is not None
+
+def test_special_function_backend_and_mpmath_fallback(monkeypatch):
+    """Спецфункції обчислюються векторно (scipy.special або mpmath без scipy); nan-точки дораховує mpmath."""
+    import src.evaluator as evaluator
+    from src.evaluator import CompiledEvaluator, mpmath_fallback, mpmath_function
+    from src.sampler import BatchEvaluator
+    x = sp.Symbol('x', real=True)
+    expr = sp.gamma(x + 4) * sp.erf(x) + sp.besselj(1, x) + sp.zeta(x + 5) + sp.factorial(x + 3)
+    xs = np.linspace(-2.5, 2.5, 11)
+    y = CompiledEvaluator(expr)(xs)
+    assert np.isfinite(y).all()
+    # factorial — ступінчастий, за floor(n)
+    reference = expr.replace(sp.factorial, lambda n: sp.factorial(sp.floor(n)))
+    assert np.isclose(y[0], float(reference.subs(x, -2.5).evalf()))
+    assert np.allclose(BatchEvaluator(EvaluatorCache()).evaluate([expr], "sample").y[0],
+                       CompiledEvaluator(expr)(np.linspace(-3, 3, 25)))
+
+    broken = y.copy()
+    broken[[2, 7]] = [np.nan, np.inf]
+    assert np.allclose(mpmath_fallback(mpmath_function(expr), xs, broken), y)
+
+    monkeypatch.setattr(evaluator, "special", None)
+    assert np.allclose(CompiledEvaluator(expr)(xs), y)
+
+def test_in_process_evaluators_skip_slow_mpmath_fallback():
+    """mpmath без дедлайну — лише у воркері: одна точка besselj(1, zeta(...)) рахується секундами."""
+    import time
+    from src.config import ComplexityConfig
+    from src.prescreen import NumericGate
+    from src.validator import TopologyFilter
+    config = ComplexityConfig(3, 3, 3)
+    expr = sp.besselj(1, sp.zeta(sp.tan(sp.exp(sp.exp(config.x)))))
+    cache = EvaluatorCache()
+    assert not cache.get(expr).use_mpmath and pickle.loads(pickle.dumps(cache.get(expr))).use_mpmath
+
+    start = time.perf_counter()
+    passed, reason = NumericGate(cache=cache).screen(expr, config.x)
+    validator = TopologyFilter(config, cache=cache)
+    validator.prefill([expr])
+    validator.check(expr)
+    assert passed and reason in ("pass", "special_non_finite")
+    assert time.perf_counter() - start < 2
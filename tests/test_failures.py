@@ -0,0 +1,70 @@
+import os
+import json
+import random
+import sympy as sp
+from src import ir
+from src.config import ComplexityConfig
+from src.failures import FailureKnowledge, failure_reason, ir_subtree_keys, expr_subtrees
+from src.generator import ExpressionGenerator
+from src.validator import TopologyFilter
+
+def _record(formula, **properties):
+    return {"ground_truth": {"formula": formula, "properties": properties}}
+
+def _knowledge(tmp_path):
+    failed = [_record("log(x) + 3", error="Values out of bounds or non-finite"),        # старий формат
+              _record("2*log(x)", error="non_finite", stage="prescreen"),
+              _record("cos(x) + 1/x", error="non_finite", stage="prescreen"),
+              _record("cos(x) + log(x)", error="name 'zeta' is not defined"),         # не числова причина
+              _record("exp(exp(x))*x", error="Timeout", stage="metadata", timeout=2.0),
+              _record("exp(exp(x))*x", error="Timeout", stage="metadata", timeout=2.0)]   # таймаут не вчиться
+    tasks = [_record("cos(x)*x")]
+    for name, records in (("failed.jsonl", failed), ("tasks.jsonl", tasks)):
+        (tmp_path / name).write_text("".join(json.dumps(r) + "\n" for r in records))
+    return FailureKnowledge.from_files(str(tmp_path / "failed.jsonl"), str(tmp_path / "tasks.jsonl"))
+
+def test_learns_only_supported_self_fatal_subtrees(tmp_path):
+    assert failure_reason({"error": "Timeout"}) == ("points", "timeout")
+    knowledge = _knowledge(tmp_path)
+    x = sp.Symbol('x', real=True)
+    assert sorted(knowledge.formulas.values()) == ["log(x)"]
+    assert knowledge.match(sp.sin(x) * sp.log(x)) == ("points", "non_finite")
+    assert knowledge.match(sp.cos(x) + 1 / x) is None                      # одна невдача — замало
+    assert knowledge.match(sp.log(x), codes={"timeout"}) is None
+    assert knowledge.match(sp.exp(sp.exp(x)) * x) is None
+    assert knowledge.summary() == {"points:non_finite": 1}
+
+def test_shipped_log_spares_c_wrappers_and_timeout_subtrees():
+    failed_log = os.path.join(os.path.dirname(os.path.dirname(__file__)), "hanging_functions.jsonl")
+    knowledge = FailureKnowledge.from_files(failed_log)
+    x = sp.Symbol('x', real=True)
+    for k in range(-2, 3):
+        assert knowledge.match(1 / (x - k)) is None
+        assert knowledge.match(sp.sin(x) / (x - k)) is None
+    # x - 1 є в невдачах за таймаутом, але таймаути не вивчаються
+    assert knowledge.match(sp.sin(x - 1)) is None and knowledge.match((x - 1) * sp.exp(x)) is None
+    for c, expr in ((0, sp.sin(x - 1)), (2, sp.sin(x) / (x - 1)), (2, (x - 1) * sp.exp(x))):
+        validator = TopologyFilter(ComplexityConfig(1, 1, c), blacklist=knowledge)
+        validator.check(expr)
+        assert not validator.last_rejection.startswith("blacklist")
+
+def test_ir_keys_match_sympy_subtrees():
+    X = ir.ExprIR.leaf(ir.X)
+    tree = ir.ExprIR.node(ir.PIECEWISE_NEG, ir.ExprIR.node(ir.ADD, ir.ExprIR.node(ir.POW, X, const=0.5),
+                                                             ir.ExprIR.node(ir.LOG, X)), const=1)
+    x = sp.Symbol('x', real=True)
+    sympy_keys = {key for key, _ in expr_subtrees(tree.to_sympy(x), 20)}
+    assert set(ir_subtree_keys(tree, 20)) <= sympy_keys
+    # sqrt(x) з файлу і x**0.5 з генератора — той самий ключ
+    assert expr_subtrees(sp.sqrt(x) + 1, 3)[0][0] == ir_subtree_keys(ir.ExprIR.node(ir.POW, X, const=0.5), 3)[0]
+
+def test_generator_and_validator_consult_blacklist(tmp_path):
+    knowledge = _knowledge(tmp_path)
+    config = ComplexityConfig(1, 1, 0)
+    gen = ExpressionGenerator(config, rng=random.Random(3), construction="ir", blacklist=knowledge)
+    for _ in range(20):
+        gen.generate()
+    assert gen.counters["blacklisted"] > 0 and gen.counters["fallbacks"] == 0
+    validator = TopologyFilter(config, blacklist=knowledge)
+    assert not validator.check(sp.log(config.x) + config.x)
+    assert validator.last_rejection == "blacklist:points:non_finite"
@@ -0,0 +1,61 @@
+import random
+import numpy as np
+import pytest
+import sympy as sp
+from src import ir
+from src.config import ComplexityConfig, OP_SETS
+from src.evaluator import CompiledEvaluator
+from src.generator import ExpressionGenerator
+from src.poles import has_real_pole
+from src.topology import DiscontinuityDetector
+
+X = ir.ExprIR.leaf(ir.X)
+
+def _const(value):
+    return ir.ExprIR.leaf(ir.CONST, value)
+
+def test_ir_evaluates_like_sympy():
+    # Piecewise((sin(x)**2 + 3, x > 1), (-(sin(x)**2 + 3), True)) * gamma(x)
+    inner = ir.ExprIR.node(ir.ADD, ir.ExprIR.node(ir.POW, ir.ExprIR.node(ir.SIN, X), const=2), _const(3))
+    tree = ir.ExprIR.node(ir.MUL, ir.ExprIR.node(ir.PIECEWISE_NEG, inner, const=1), ir.ExprIR.node(ir.GAMMA, X))
+    x = sp.Symbol('x', real=True)
+    expr = tree.to_sympy(x)
+    assert expr == sp.Piecewise((sp.sin(x)**2 + 3, x > 1), (-(sp.sin(x)**2 + 3), True)) * sp.gamma(x)
+    grid = np.linspace(0.1, 3, 17)
+    assert np.allclose(tree.evaluate(grid), CompiledEvaluator(expr)(grid))
+    assert tree.has_level(3) and tree.has_special() and tree.const_bound() == 3.0
+
+def test_screen_reasons():
+    pole = ir.ExprIR.node(ir.POW, ir.ExprIR.node(ir.ADD, X, _const(-1)), const=-1)     # 1/(x - 1)
+    removable = ir.ExprIR.node(ir.MUL, X, ir.ExprIR.node(ir.POW, X, const=-1))          # x * x**-1
+    assert ir.screen(pole, 0) == ir.NON_FINITE
+    assert ir.screen(removable, 0) == ir.PASS                                            # x/x — вирішить SymPy
+    assert ir.screen(ir.ExprIR.node(ir.EXP, ir.ExprIR.node(ir.MUL, _const(5), X)), 1) == ir.OUT_OF_BOUNDS
+    assert ir.screen(ir.ExprIR.node(ir.SIN, _const(2)), 1) == ir.NO_X
+    assert ir.screen(ir.ExprIR.node(ir.SIN, X), 2) == ir.COMPLEXITY
+
+@pytest.mark.parametrize("a,b,c", [(1, 3, 0), (2, 2, 1), (3, 1, 0)])
+def test_ir_mode_keeps_constructive_guarantees(a, b, c):
+    gen = ExpressionGenerator(ComplexityConfig(a, b, c), rng=random.Random(5), construction="ir")
+    for _ in range(5):
+        expr = gen.generate()
+        assert any(isinstance(node, tuple(OP_SETS[b])) for node in sp.preorder_traversal(expr))
+    assert gen.counters["fallbacks"] == 0
+
+def test_ir_mode_keeps_c2_wrapper_pole():
+    # Полюс 1/(x - p) — поза вузлами сітки пре-скринінгу, тож ні скринінг, ні гейт його не відсіюють
+    gen = ExpressionGenerator(ComplexityConfig(0, 0, 2), rng=random.Random(1), construction="ir")
+    assert all(has_real_pole(gen.generate(), gen.config.x)[0] for _ in range(5))
+    gen = ExpressionGenerator(ComplexityConfig(1, 1, 2), rng=random.Random(1), construction="ir")
+    detector = DiscontinuityDetector()
+    verdicts = [detector.analyze(gen.generate()).is_singular for _ in range(8)]
+    assert sum(verdicts) >= 6 and gen.counters["fallbacks"] == 0     # sin(x)/x — усувна, як і в constructive
+
+def test_c2_cell_yields_tasks_end_to_end():
+    from main import _init_cell_worker, generate_cell
+    _init_cell_worker(set(), set(), {})
+    for a, b in ((0, 0), (1, 1)):
+        records = generate_cell((a, b, 2, 0, 2, 0), seed=7)
+        tasks = [record for kind, _, record, _ in records if kind == "task"]
+        assert len(tasks) == 2
+        assert all(has_real_pole(sp.sympify(t["ground_truth"]["formula"]), sp.Symbol('x'))[0] for t in tasks)
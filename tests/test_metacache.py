@@ -0,0 +1,47 @@
+import sympy as sp
+from src.metacache import MetadataCache, STATUS_OK, STATUS_TIMEOUT, KIND_SUBTERM, expr_kind
+from src.sampler import DatasetSampler, _meta_task
+from src.dedup import expression_digest
+
+def test_metadata_cache_reuses_results_and_subterms(tmp_path):
+    x = sp.Symbol('x', real=True)
+    cache = MetadataCache(str(tmp_path / "meta.sqlite"))
+    DatasetSampler.metadata_cache = cache
+    try:
+        expr = sp.tan(x) + 1 / (x - 1)
+        ok, meta, _ = DatasetSampler.calculate_metadata_safe(expr, timeout=20)
+        assert ok and "1" in meta["singularities"]
+        # Підтерм 1/(x - 1) збережено окремо
+        assert cache.get(expression_digest(1 / (x - 1)), KIND_SUBTERM) == (STATUS_OK, ["1"])
+
+        ok_again, meta_again, _ = DatasetSampler.calculate_metadata_safe(expr, timeout=20)
+        assert ok_again and meta_again == meta
+        assert cache.stats["expr_hits"] == 1
+
+        # Таймаути теж кешуються: повторний виклик з тим самим чи меншим бюджетом не запускає воркер
+        slow = sp.gamma(x) * sp.zeta(x)
+        cache.put(expression_digest(slow), STATUS_TIMEOUT, {"error": "Timeout", "timeout": 5})
+        assert DatasetSampler.calculate_metadata_safe(slow, timeout=5) == (False, {"domain": "timeout"}, "Timeout")
+        # Більший бюджет — нова спроба (і новий запис)
+        cache.put(expression_digest(expr), STATUS_TIMEOUT, {"error": "Timeout", "timeout": 1})
+        ok_retry, meta_retry, _ = DatasetSampler.calculate_metadata_safe(expr, timeout=20)
+        assert ok_retry and meta_retry["singularities"] == meta["singularities"]
+        assert cache.get(expression_digest(expr))[0] == STATUS_OK
+
+        # З confirm_period — окремий запис: результат без підтвердження не віддається
+        DatasetSampler.confirm_period = True
+        hits = cache.stats["expr_hits"]
+        ok, _, _ = DatasetSampler.calculate_metadata_safe(expr, timeout=20)
+        assert ok and cache.stats["expr_hits"] == hits
+        assert cache.get(expression_digest(expr), expr_kind(True))[0] == STATUS_OK
+    finally:
+        DatasetSampler.metadata_cache = None
+        DatasetSampler.confirm_period = False
+        cache.close()
+
+def test_meta_task_same_singularities_with_and_without_cache():
+    formula = "tan(x) + 1/(x - 1)"
+    without = _meta_task(formula)
+    with_cache = _meta_task(formula, {}, False)
+    assert "_subterms" not in without and with_cache.pop("_subterms")
+    assert without == with_cache
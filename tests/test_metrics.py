@@ -0,0 +1,29 @@
+import json
+import pickle
+from src.metrics import PipelineMetrics, MetricsExporter
+
+def test_metrics_merge_and_export(tmp_path):
+    first, second = PipelineMetrics(), PipelineMetrics()
+    first.observe("0,0,0", "metadata", 0.02)
+    first.count("0,0,0", "tasks")
+    second.observe("0,0,0", "metadata", 7.0)
+    second.reject("0,0,0", "prescreen:non_finite")
+    second.add_worker_stats({"spawned": 1, "killed": 0}, {"spawned": 3, "killed": 2})
+    with second.timer("1,1,1", "generate"):
+        pass
+    first.merge(pickle.loads(pickle.dumps(second)))    # метрики повертаються з процесів-генераторів
+
+    snapshot = first.as_dict()
+    stage = snapshot["cells"]["0,0,0"]["stages"]["metadata"]
+    assert stage["count"] == 2 and stage["buckets"]["0.05"] == 1 and stage["buckets"]["30.0"] == 1
+    assert snapshot["cells"]["0,0,0"]["rejections"] == {"prescreen:non_finite": 1}
+    assert snapshot["workers"] == {"spawned": 2, "killed": 2}
+
+    json_path, prom_path = str(tmp_path / "m.json"), str(tmp_path / "m.prom")
+    MetricsExporter(json_path).write(first)
+    MetricsExporter(prom_path).write(first)
+    assert json.load(open(json_path, encoding="utf-8"))["cells"]["1,1,1"]["stages"]["generate"]["count"] == 1
+    prom = open(prom_path, encoding="utf-8").read()
+    assert 'mcm_stage_seconds_bucket{cell="0,0,0",stage="metadata",le="+Inf"} 2' in prom
+    assert 'mcm_events_total{cell="0,0,0",event="tasks"} 1' in prom
+    assert 'mcm_workers_total{event="killed"} 2' in prom
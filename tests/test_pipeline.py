@@ -0,0 +1,47 @@
+import time
+from src.pipeline import InFlightWindow
+from src.utils import WorkerPool
+
+def test_window_commits_in_submission_order():
+    with InFlightWindow(size=3) as window:
+        # Перший кандидат відповідає останнім, етапи одного кандидата йдуть одночасно
+        window.submit("slow", {"metadata": lambda: time.sleep(0.2) or "m", "points": lambda: time.sleep(0.2) or "p"})
+        window.defer("prescreen")
+        window.submit("fast", {"metadata": lambda: "m", "points": lambda: "p"})
+        assert window.full and window.in_flight == 2
+
+        start = time.perf_counter()
+        item, results = window.pop()
+        assert item == "slow" and results["metadata"][0] == "m" and results["points"][0] == "p"
+        assert time.perf_counter() - start < 0.35
+        assert window.pop() == ("prescreen", None)
+        assert window.pop()[0] == "fast"
+        assert not window and window.in_flight == 0
+        assert window.stats == {"submitted": 2, "deferred": 1, "waited": 1}
+
+def test_blocked_points_do_not_delay_metadata():
+    with WorkerPool(size=2) as pool, InFlightWindow(size=1, wait_clock=pool.waited) as window:
+        pool.wait_ready()
+        start = time.perf_counter()
+        finished = {}
+
+        def stage(name, seconds):
+            def run():
+                result = pool.run(time.sleep, (seconds,), timeout=5)
+                finished[name] = time.perf_counter() - start
+                return result
+            return run
+
+        window.submit("candidate", {"metadata": stage("metadata", 0.05), "points": stage("points", 0.8)})
+        _, results = window.pop()
+        assert finished["metadata"] < 0.5 < finished["points"]
+        assert results["metadata"][1] < 0.5
+
+def test_queue_wait_is_not_stage_latency():
+    # Один воркер на два етапи: другий чекає в черзі, але його тривалість — лише виконання
+    with WorkerPool(size=1) as pool, InFlightWindow(size=1, wait_clock=pool.waited) as window:
+        pool.wait_ready()
+        window.submit("candidate", {"metadata": lambda: pool.run(time.sleep, (0.5,), timeout=5),
+                                    "points": lambda: pool.run(time.sleep, (0.5,), timeout=5)})
+        _, results = window.pop()
+        assert all(0.4 < seconds < 0.8 for _, seconds in results.values())
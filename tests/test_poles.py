@@ -0,0 +1,18 @@
+import sympy as sp
+from src.poles import real_poles, has_real_pole, PATH_ISOLATION, PATH_NUMERIC, PATH_GENERAL, PATH_NONE
+
+def test_poles_fast_path_matches_solve():
+    x = sp.Symbol('x', real=True)
+    roots, path = real_poles(sp.sin(x) / (x**2 - 3*x + 2) + x, x)
+    assert path == PATH_ISOLATION
+    assert roots == [1, 2]
+
+    roots, path = real_poles(1 / (x**2 - sp.Float(2.0)), x)
+    assert path == PATH_NUMERIC
+    assert [round(float(r), 6) for r in roots] == [-1.414214, 1.414214]
+
+    assert has_real_pole(1 / (x**2 + 1), x) == (False, PATH_ISOLATION)
+    assert has_real_pole(sp.exp(x) + x**2, x) == (False, PATH_NONE)
+    # Трансцендентний знаменник і log у чисельнику — загальний шлях
+    assert real_poles(1 / sp.sin(x), x) == (None, PATH_GENERAL)
+    assert has_real_pole(sp.log(x) / (x - 1), x) == (None, PATH_GENERAL)
@@ -0,0 +1,25 @@
+import time
+from src.utils import WorkerPool
+
+def test_pool_replaces_hanging_worker():
+    """Завислий воркер вбивається і замінюється, контракт (success, result) зберігається."""
+    with WorkerPool(size=1) as pool:
+        assert pool.run(abs, (-3,), timeout=5) == (True, 3)
+        assert pool.run(time.sleep, (10,), timeout=0.5) == (False, "Timeout")
+        assert pool.run(abs, (-4,), timeout=5) == (True, 4)
+        assert pool.stats["killed"] == 1
+        assert pool.stats["spawned"] == 2
+
+def test_pool_reports_worker_errors():
+    with WorkerPool(size=1) as pool:
+        success, err = pool.run(int, ("not a number",), timeout=5)
+        assert not success and "invalid literal" in err
+
+def test_unpicklable_task_returns_worker_to_pool():
+    """Помилка серіалізації задачі не забирає воркера: пул не блокується після size таких викликів."""
+    with WorkerPool(size=1) as pool:
+        for _ in range(3):
+            success, err = pool.run(lambda: 1, timeout=5)
+            assert not success and err
+        assert pool.run(abs, (-5,), timeout=1) == (True, 5)
+        assert pool.stats["spawned"] == 1
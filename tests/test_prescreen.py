@@ -0,0 +1,31 @@
+import sympy as sp
+from src.prescreen import NumericGate, PASS, COMPLEX, NON_FINITE, OUT_OF_BOUNDS
+
+def test_gate_reason_codes():
+    """Гейт відтворює політику _points_task і повертає код причини відмови."""
+    x = sp.Symbol('x', real=True)
+    gate = NumericGate()
+    assert gate.screen(x**3 + sp.sin(x), x) == (True, PASS)
+    assert gate.screen(x**0.5, x) == (False, COMPLEX)
+    assert gate.screen(1 / (x - 1), x) == (False, NON_FINITE)
+    assert gate.screen(sp.exp(sp.exp(x)), x) == (False, OUT_OF_BOUNDS)
+    assert gate.stats[PASS] == 1
+
+def test_cell_prefill_skips_too_large_candidates(monkeypatch):
+    """Передзаповнення раунду не компілює вирази, які гейт і так не перевіряє in-process."""
+    import main
+    from src.prescreen import TOO_LARGE
+    from src.sampler import BatchEvaluator
+    prefilled, gates = [], []
+
+    def gate():
+        gates.append(NumericGate(max_ops=0))
+        return gates[-1]
+
+    evaluate = BatchEvaluator.evaluate
+    monkeypatch.setattr(main, "NumericGate", gate)
+    monkeypatch.setattr(BatchEvaluator, "evaluate", lambda self, exprs, grid_name="sample":
+                        prefilled.extend(exprs) or evaluate(self, exprs, grid_name))
+    main._init_cell_worker(set(), set(), {})
+    main.generate_cell((1, 1, 0, 0, 1, 0), seed=3)
+    assert gates[0].stats[TOO_LARGE] > 0 and prefilled == []
@@ -0,0 +1,18 @@
+import sympy as sp
+from src.simplifier import TieredSimplifier, TIER_CHEAP, TIER_FULL
+
+def test_rational_stays_on_cheap_tier():
+    """Раціональні вирази не ескалуються до повного simplify."""
+    x = sp.Symbol('x', real=True)
+    simplifier = TieredSimplifier()
+    result, tier = simplifier.simplify((x**2 - 1) / (x - 1) + x)
+    assert tier == TIER_CHEAP
+    assert sp.simplify(result - (2*x + 1)) == 0
+
+def test_trig_identity_escalates():
+    x = sp.Symbol('x', real=True)
+    simplifier = TieredSimplifier()
+    result, tier = simplifier.simplify(sp.sin(x)**2 + sp.cos(x)**2 + x)
+    assert tier == TIER_FULL
+    assert result == x + 1
+    assert simplifier.stats[TIER_FULL]["count"] == 1
@@ -0,0 +1,31 @@
+import json
+import numpy as np
+import sympy as sp
+from src.config import ComplexityConfig
+from src.sampler import TaskExporter
+from src.storage import BinaryTaskStore, BinaryTaskReader, export_jsonl, POINTS_FILE
+
+def test_binary_store_roundtrip_and_recovery(tmp_path):
+    x = sp.Symbol('x', real=True)
+    config = ComplexityConfig(0, 1, 0)
+    x_vals = np.linspace(-3, 3, 25)
+    root = str(tmp_path / "store")
+    store = BinaryTaskStore(root)
+    tasks = []
+    for i, expr in enumerate([sp.sin(x), x**2 + 1]):
+        y_vals = np.asarray(sp.lambdify(x, expr)(x_vals), dtype=float)
+        store.append(TaskExporter.create_task(expr, None, None, config, {}, task_id=str(i)), x_vals, y_vals)
+        tasks.append(TaskExporter.create_task(expr, x_vals, y_vals, config, {}, task_id=str(i)))
+
+    # Обірваний запис: точки дописано, рядок індексу — ні
+    with open(tmp_path / "store" / POINTS_FILE, "ab") as f:
+        f.write(np.ones(10).tobytes())
+    assert len(BinaryTaskStore(root)) == 2
+
+    reader = BinaryTaskReader(root)
+    entry, xs, ys = reader.find("MCM_010_1")
+    assert isinstance(xs.base, np.memmap) and np.array_equal(ys, x_vals**2 + 1)
+
+    export_jsonl(root, str(tmp_path / "out.jsonl"))
+    with open(tmp_path / "out.jsonl", encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == tasks
@@ -0,0 +1,38 @@
+import sympy as sp
+from src.config import ComplexityConfig
+from src.evaluator import EvaluatorCache
+from src.topology import DiscontinuityDetector
+from src.validator import TopologyFilter
+
+def test_detector_finds_poles_jumps_and_edges():
+    x = sp.Symbol('x', real=True)
+    detector = DiscontinuityDetector(cache=EvaluatorCache())
+    report = detector.analyze(sp.tan(x))
+    assert report.poles == [-1.570796, 1.570796] and not report.jumps
+    # Стрибок на тлі крутого лінійного росту
+    assert detector.analyze(100*x + sp.floor(x)).jumps == [-2.0, -1.0, 0.0, 1.0, 2.0, 3.0]
+    assert detector.analyze(sp.log(x)).edges == [0.0]
+    assert detector.analyze(sp.exp(x**2) + sp.Abs(x)).is_regular
+    assert detector.analyze(sp.sin(10*x)).is_complex()
+
+def test_filter_classifies_axis_c():
+    x = sp.Symbol('x', real=True)
+    singular = TopologyFilter(ComplexityConfig(0, 0, 2), cache=EvaluatorCache())
+    assert singular.check(x + 1 / (x - sp.Rational(1, 3)))
+    assert not singular.check(1 / (x**2 + 1))
+    regular = TopologyFilter(ComplexityConfig(0, 2, 0), cache=EvaluatorCache())
+    assert not regular.check(sp.floor(x))
+    assert regular.check(x**3 + x)
+
+def test_numeric_periodicity_gates_c1():
+    """Період знаходиться там, де sympy.periodicity здається, і записується в метадані."""
+    from src.periodicity import PeriodicityEstimator, period_to_str
+    from src.sampler import _meta_task
+    x = sp.Symbol('x', real=True)
+    estimator = PeriodicityEstimator(cache=EvaluatorCache())
+    assert period_to_str(estimator.estimate(sp.sin(x)**sp.Float(0.5) + sp.cos(2*x))) == "2*pi"
+    assert period_to_str(estimator.estimate(sp.floor(x) - x)) == "1"
+    assert estimator.estimate(x * sp.sin(x)) is None
+    assert not TopologyFilter(ComplexityConfig(0, 1, 1), cache=EvaluatorCache()).check(x + sp.sin(x))
+    meta = _meta_task("exp(sin(3*x))")
+    assert meta["is_periodic"] and meta["period_value"] == "2*pi/3"
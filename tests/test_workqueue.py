@@ -0,0 +1,95 @@
+import json
+import multiprocessing
+from src.storage import JsonlTaskSink
+from src.workqueue import WorkQueue, merge_shards, shard_sink, SHARD_FAILED
+from src.writer import BufferedTaskWriter
+from src.dedup import formula_digest
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def _task(formula, c=0):
+    return {"task_id": formula, "complexity_vector": {"a": 0, "b": 0, "c": c}, "prompt_data": {},
+            "ground_truth": {"formula": formula, "properties": {}}}
+
+def test_lease_expiry_and_reclaim(tmp_path):
+    clock = FakeClock()
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), clock=clock)
+    jobs = [(0, 0, 0, 0, 2, 0), (0, 0, 1, 0, 2, 0)]
+    assert queue.populate(jobs) == 2 and queue.populate(jobs) == 0   # повторне заповнення ігнорується
+    first, _ = queue.lease("n1", ttl=10)
+    second, _ = queue.lease("n2", ttl=10)
+    assert queue.lease("n3", ttl=10) is None and first != second
+    clock.now += 5
+    assert queue.renew(first, "n1", ttl=10)
+    clock.now += 8                                     # оренда n2 прострочена, n1 — ні
+    reclaimed, job = queue.lease("n3", ttl=10)
+    assert reclaimed == second and job == jobs[1] and queue.stats["reclaimed"] == 1
+    assert not queue.complete(second, "n2")            # старий власник уже не може завершити
+    assert queue.complete(second, "n3") and queue.complete(first, "n1")
+    assert queue.summary() == {"done": 2}
+
+def _drain(path, owner, out):
+    queue = WorkQueue(path)
+    done = []
+    while (leased := queue.lease(owner, ttl=30)) is not None:
+        job_id, _ = leased
+        if queue.complete(job_id, owner):
+            done.append(job_id)
+    out.put(done)
+
+def test_local_processes_complete_each_job_once(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    WorkQueue(path).populate([(a, b, 0, chunk, 1, 0) for a in range(4) for b in range(4) for chunk in range(3)])
+    ctx = multiprocessing.get_context()
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_drain, args=(path, f"node{i}", out)) for i in range(3)]
+    for proc in procs:
+        proc.start()
+    done = [job for _ in procs for job in out.get(timeout=60)]
+    for proc in procs:
+        proc.join()
+    assert sorted(done) == list(range(1, 49))
+
+def test_merge_is_idempotent(tmp_path):
+    shards = tmp_path / "shards"
+    for node, formulas in (("n1", ["x", "sin(x)"]), ("n2", ["sin(x)", "exp(x)"])):  # sin(x): задачу виконали двічі
+        with BufferedTaskWriter(shard_sink(str(shards / node)), str(shards / node / SHARD_FAILED)) as writer:
+            for formula in formulas:
+                writer.write_task(formula_digest(formula), _task(formula), [0.0, 1.0], [0.0, 1.0])
+            writer.write_failed(formula_digest("tan(x)"), _task("tan(x)"))
+    # Недописаний рядок вузла, який убили під час запису
+    with open(shards / "n2" / "benchmark_tasks.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"task_id": "torn"')
+
+    output, failed = str(tmp_path / "out.jsonl"), str(tmp_path / "failed.jsonl")
+    stats = merge_shards(str(shards), JsonlTaskSink(output), failed)
+    assert stats["tasks"] == 3 and stats["failed"] == 1 and stats["duplicates"] == 2 and stats["nodes"] == 2
+    again = merge_shards(str(shards), JsonlTaskSink(output), failed)
+    assert again["tasks"] == 0 and again["failed"] == 0
+    rows = [json.loads(line) for line in open(output, encoding="utf-8")]
+    assert [row["ground_truth"]["formula"] for row in rows] == ["x", "sin(x)", "exp(x)"]
+    assert rows[0]["prompt_data"]["points"][1] == {"x": 1.0, "y": 1.0}
+
+def test_node_discards_chunk_of_reclaimed_job(tmp_path, monkeypatch):
+    import sqlite3
+    import numpy as np
+    import main
+    from src.workqueue import iter_shard
+    monkeypatch.chdir(tmp_path)
+    queue_path = str(tmp_path / "queue.sqlite")
+
+    def reclaimed_job(args):
+        # Інший вузол забрав задачу між останнім продовженням оренди і записом результату
+        with sqlite3.connect(queue_path) as conn:
+            conn.execute("UPDATE jobs SET owner = 'n2'")
+        return [("task", formula_digest("x"), _task("x"), (np.zeros(2), np.zeros(2)))], main.PipelineMetrics()
+
+    monkeypatch.setattr(main, "_run_job", reclaimed_job)
+    assert main.generate_node(queue_path, str(tmp_path / "shards"), node_id="n1", plan=np.ones((1, 1, 1), int)) == 0
+    assert list(iter_shard(str(tmp_path / "shards" / "n1"))) == []
+    assert WorkQueue(queue_path).summary() == {"leased": 1}
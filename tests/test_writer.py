@@ -0,0 +1,32 @@
+import json
+import numpy as np
+from main import plan_jobs
+from src.storage import JsonlTaskSink
+from src.writer import BufferedTaskWriter, Checkpoint
+
+def _task(i, a=0, b=0, c=0):
+    return {"task_id": f"T{i}", "complexity_vector": {"a": a, "b": b, "c": c},
+            "prompt_data": {"points": []}, "ground_truth": {"formula": f"x + {i}"}}
+
+def test_buffered_writer_recovers_and_resumes(tmp_path):
+    out, failed = str(tmp_path / "tasks.jsonl"), str(tmp_path / "failed.jsonl")
+    x = np.linspace(-3, 3, 5)
+    with BufferedTaskWriter(JsonlTaskSink(out), failed, max_records=3, max_seconds=60) as writer:
+        for i in range(4):
+            writer.write_task(1000 + i, _task(i, c=i % 2), x, x)
+        writer.write_failed(7, _task(99))
+        assert 1003 in writer and writer.stats["flushes"] == 1
+    assert writer.stats["tasks"] == 4 and writer.stats["failed"] == 1
+
+    # Обірваний запуск: недописаний рядок після останнього скидання
+    with open(out, "a", encoding="utf-8") as f:
+        f.write(json.dumps(_task(50))[:40])
+    resumed = BufferedTaskWriter(JsonlTaskSink(out), failed)
+    with open(out, encoding="utf-8") as f:
+        assert len([json.loads(line) for line in f]) == 4
+    assert resumed.checkpoint.count(0, 0, 0) == 2 and resumed.checkpoint.count(0, 0, 1) == 2
+    assert Checkpoint(out).cells == resumed.checkpoint.cells
+
+    plan = np.zeros((1, 1, 2), dtype=int)
+    plan[0, 0, 0], plan[0, 0, 1] = 5, 2
+    assert plan_jobs(plan, existing=resumed.checkpoint) == [(0, 0, 0, 0, 3, 2)]